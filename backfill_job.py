@@ -0,0 +1,194 @@
+"""
+后台回补任务模块
+在独立线程中边抓取边写入，调用方（如 Streamlit 页面）随时读取进度或取消任务，
+不会在整个回补期间阻塞
+"""
+
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime
+from typing import ContextManager, Optional
+
+from constants import (
+    BACKFILL_CONCURRENCY, BACKFILL_RATE, WRITE_BATCH_SIZE,
+    OUTCOME_OK, OUTCOME_MISSING, OUTCOME_FAILED
+)
+from scraper import ScraperManager
+from storage import BaseRateStorage, BatchWriter
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+JOB_FAILED = "failed"
+
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+
+class BackfillJob:
+    """
+    后台回补任务
+    
+    计划日期、抓取和写入都在后台线程中进行；每个日期完成后更新进度，
+    snapshot() 返回进度的一致快照。取消后尚未开始的日期不再抓取，
+    已抓取的数据在退出前写入存储。
+    """
+    
+    def __init__(self, scraper: ScraperManager, storage: BaseRateStorage,
+                 start_date: str, end_date: str,
+                 business_days_only: bool = True,
+                 missing_only: bool = True,
+                 concurrency: int = BACKFILL_CONCURRENCY,
+                 rate: float = BACKFILL_RATE,
+                 batch_size: int = WRITE_BATCH_SIZE,
+                 write_lock: Optional[ContextManager] = None):
+        """
+        Args:
+            storage: 任务独占的存储实例；存储对象不是线程安全的，
+                不要传入其他线程（如页面）同时在读取的实例
+            write_lock: 写入存储时持有的锁，多个任务共享同一数据文件时传入同一把锁
+        """
+        self.id = uuid.uuid4().hex[:8]
+        self.scraper = scraper
+        self.storage = storage
+        self.start_date = start_date
+        self.end_date = end_date
+        self.business_days_only = business_days_only
+        self.missing_only = missing_only
+        self.concurrency = concurrency
+        self.rate = rate
+        self.batch_size = batch_size
+        self.write_lock = write_lock
+        self.created_at = datetime.now()
+        
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"backfill-{self.id}", daemon=True)
+        self._writer: Optional[BatchWriter] = None
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        
+        self.state = JOB_PENDING
+        self.total = 0
+        self.counts = {OUTCOME_OK: 0, OUTCOME_MISSING: 0, OUTCOME_FAILED: 0}
+        self.current_date: Optional[str] = None
+        self.error: Optional[str] = None
+    
+    def start(self) -> "BackfillJob":
+        """启动后台线程"""
+        with self._lock:
+            self.state = JOB_RUNNING
+            self._started_at = time.monotonic()
+        self._thread.start()
+        return self
+    
+    def cancel(self):
+        """请求取消，正在进行的请求完成后停止"""
+        self._cancel.set()
+    
+    def join(self, timeout: Optional[float] = None):
+        """等待任务结束"""
+        self._thread.join(timeout)
+    
+    @property
+    def running(self) -> bool:
+        return self.state in (JOB_PENDING, JOB_RUNNING)
+    
+    def snapshot(self) -> dict:
+        """
+        当前进度
+        
+        Returns:
+            dict: state, total, done, ok, missing, failed, written, current_date,
+                elapsed (秒), eta (预计剩余秒数，无法估计时为 None), error,
+                flow (Historico 数据源的流量控制状态，见 AdaptiveController.snapshot)
+        """
+        controller = self.scraper.historico_source.controller
+        flow = controller.snapshot() if controller else None
+        with self._lock:
+            done = sum(self.counts.values())
+            end = self._finished_at or time.monotonic()
+            elapsed = end - self._started_at if self._started_at else 0.0
+            eta = None
+            if self.state == JOB_RUNNING and done and self.total:
+                eta = elapsed / done * (self.total - done)
+            
+            return {
+                'id': self.id,
+                'start_date': self.start_date,
+                'end_date': self.end_date,
+                'state': self.state,
+                'total': self.total,
+                'done': done,
+                'ok': self.counts[OUTCOME_OK],
+                'missing': self.counts[OUTCOME_MISSING],
+                'failed': self.counts[OUTCOME_FAILED],
+                'written': self._writer.written if self._writer else 0,
+                'current_date': self.current_date,
+                'elapsed': elapsed,
+                'eta': eta,
+                'error': self.error,
+                'flow': flow,
+            }
+    
+    def _on_outcome(self, date_str: str, status: str, result):
+        with self._lock:
+            self.counts[status] += 1
+            self.current_date = date_str
+        # 抓取成功的日期先产出并写入，再在写入循环中停止
+        if self._cancel.is_set() and status != OUTCOME_OK:
+            raise JobCancelled()
+    
+    def _finish(self, state: str, error: Optional[str] = None):
+        with self._lock:
+            self.state = state
+            self.error = error
+            self._finished_at = time.monotonic()
+    
+    def _run(self):
+        try:
+            if self.missing_only:
+                dates = self.storage.find_missing_dates(
+                    self.start_date, self.end_date,
+                    business_days_only=self.business_days_only,
+                    calendar=self.scraper.calendar
+                )
+            else:
+                dates = self.scraper.plan_dates(self.start_date, self.end_date, self.business_days_only)
+            with self._lock:
+                self.total = len(dates)
+            if self._cancel.is_set():
+                raise JobCancelled()
+            logger.info(f"回补任务 {self.id} 开始: {self.start_date} 到 {self.end_date}，共 {len(dates)} 天")
+            
+            results = self.scraper.iter_dates(
+                dates,
+                concurrency=self.concurrency,
+                rate=self.rate,
+                on_outcome=self._on_outcome
+            )
+            self._writer = BatchWriter(self.storage, batch_size=self.batch_size, lock=self.write_lock)
+            try:
+                with self._writer:
+                    for record in results:
+                        self._writer.add(record)
+                        if self._cancel.is_set():
+                            raise JobCancelled()
+            finally:
+                results.close()
+        except JobCancelled:
+            logger.info(f"回补任务 {self.id} 已取消")
+            self._finish(JOB_CANCELLED)
+        except Exception as e:
+            logger.error(f"回补任务 {self.id} 失败: {e}")
+            self._finish(JOB_FAILED, str(e))
+        else:
+            logger.info(f"回补任务 {self.id} 完成")
+            self._finish(JOB_COMPLETED)
@@ -0,0 +1,173 @@
+"""
+回补检查点日志模块
+每个日期抓取完成后立即追加一行 JSON 记录结果，回补中断后可以从日志续跑，
+已完成的日期不再重新请求，已抓取到的汇率也不会丢失
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from constants import BACKFILL_JOURNAL, OUTCOME_OK, OUTCOME_MISSING, OUTCOME_FAILED
+
+logger = logging.getLogger(__name__)
+
+
+class BackfillJournal:
+    """
+    回补检查点日志 (JSON Lines)
+    
+    第一行记录本次回补的参数，之后每行是一个日期的结果：
+    {"date": ..., "status": "ok" | "missing" | "failed", "rate_sell": ..., "source": ...}
+    同一日期出现多次时以最后一行为准。每行写入后立即刷新，进程被终止时
+    最多丢失正在写入的一行，读取时会跳过不完整的行。
+    """
+    
+    STATUSES = (OUTCOME_OK, OUTCOME_MISSING, OUTCOME_FAILED)
+    
+    def __init__(self, path: str = BACKFILL_JOURNAL):
+        self.path = path
+        self._entries: Dict[str, dict] = {}
+        self._file = None
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _header(start_date: str, end_date: str, business_days_only: bool) -> dict:
+        return {'start': start_date, 'end': end_date, 'business_days_only': business_days_only}
+    
+    def start(self, start_date: str, end_date: str, business_days_only: bool = True):
+        """开始新的回补，覆盖已有的日志"""
+        self.close()
+        self._entries = {}
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        header = self._header(start_date, end_date, business_days_only)
+        header['created_at'] = datetime.now().isoformat()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write(header)
+    
+    def resume(self, start_date: str, end_date: str, business_days_only: bool = True) -> bool:
+        """
+        读取已有日志并继续追加
+        
+        Returns:
+            bool: 日志存在且与本次回补参数一致；否则返回 False，由调用方重新开始
+        """
+        self.close()
+        self._entries = {}
+        
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return False
+        
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, ValueError):
+            logger.warning(f"回补日志缺少文件头，无法续跑: {self.path}")
+            return False
+        expected = self._header(start_date, end_date, business_days_only)
+        if any(header.get(key) != value for key, value in expected.items()):
+            logger.warning(
+                f"回补日志属于另一次回补 ({header.get('start')} 到 {header.get('end')})，无法续跑"
+            )
+            return False
+        
+        for number, line in enumerate(lines[1:], start=2):
+            try:
+                entry = json.loads(line)
+                date_str = str(entry['date'])
+                if entry['status'] not in self.STATUSES:
+                    raise ValueError(f"未知状态 {entry['status']}")
+                if entry['status'] == OUTCOME_OK:
+                    entry['rate_sell'] = float(entry['rate_sell'])
+                    entry['source'] = str(entry['source'])
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"跳过回补日志第 {number} 行: {e}")
+                continue
+            self._entries[date_str] = entry
+        
+        self._file = open(self.path, 'a', encoding='utf-8')
+        # 上次中断时最后一行可能没有换行符
+        if lines and not self._ends_with_newline():
+            self._file.write("\n")
+        return True
+    
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    
+    def _write(self, data: dict):
+        self._file.write(json.dumps(data, ensure_ascii=False) + "\n")
+        self._file.flush()
+    
+    def record(self, date_str: str, status: str, result: Optional[Tuple[str, float, str]] = None):
+        """
+        记录一个日期的结果，可在多个抓取线程中调用
+        
+        Args:
+            date_str: 日期 (YYYY-MM-DD)
+            status: ok / missing / failed
+            result: status 为 ok 时的 (date, rate_sell, source)
+        """
+        entry = {'date': date_str, 'status': status}
+        if status == OUTCOME_OK and result:
+            entry['rate_sell'] = result[1]
+            entry['source'] = result[2]
+        
+        with self._lock:
+            self._entries[date_str] = entry
+            if self._file is None:
+                return
+            try:
+                self._write(entry)
+            except OSError as e:
+                logger.error(f"写入回补日志失败: {e}")
+    
+    def completed(self) -> Set[str]:
+        """已完成的日期（ok 和 missing），续跑时跳过"""
+        with self._lock:
+            return {date for date, entry in self._entries.items() if entry['status'] != OUTCOME_FAILED}
+    
+    def results(self) -> List[Tuple[str, float, str]]:
+        """已抓取到的汇率 (date, rate_sell, source)，按日期升序"""
+        with self._lock:
+            return [
+                (date, entry['rate_sell'], entry['source'])
+                for date, entry in sorted(self._entries.items())
+                if entry['status'] == OUTCOME_OK
+            ]
+    
+    def counts(self) -> Dict[str, int]:
+        """各状态的日期数"""
+        with self._lock:
+            counts = {status: 0 for status in self.STATUSES}
+            for entry in self._entries.values():
+                counts[entry['status']] += 1
+            return counts
+    
+    def close(self):
+        """关闭日志文件"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def remove(self):
+        """回补完成并保存后删除日志"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
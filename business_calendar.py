@@ -0,0 +1,201 @@
+"""
+营业日历模块
+判断阿根廷银行营业日，供回补时跳过周末和节假日
+"""
+
+import os
+import csv
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from constants import HOLIDAYS_CSV, DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, date, datetime]
+
+# 固定日期节假日 (月, 日)
+FIXED_HOLIDAYS = {
+    (1, 1): "Año Nuevo",
+    (3, 24): "Día de la Memoria",
+    (4, 2): "Día de Malvinas",
+    (5, 1): "Día del Trabajador",
+    (5, 25): "Revolución de Mayo",
+    (6, 20): "Paso a la Inmortalidad de Belgrano",
+    (7, 9): "Día de la Independencia",
+    (11, 6): "Día del Bancario",
+    (12, 8): "Inmaculada Concepción",
+    (12, 25): "Navidad",
+}
+
+# 可移动节假日 (月, 日)，按 Ley 27.399 规则平移到周一
+MOVABLE_HOLIDAYS = {
+    (6, 17): "Paso a la Inmortalidad de Güemes",
+    (8, 17): "Paso a la Inmortalidad de San Martín",
+    (10, 12): "Día del Respeto a la Diversidad Cultural",
+    (11, 20): "Día de la Soberanía Nacional",
+}
+
+# 政府每年公布的旅游性非工作日（银行休市）
+BRIDGE_HOLIDAYS = {
+    "2024-04-01": "Día no laborable con fines turísticos",
+    "2024-06-21": "Día no laborable con fines turísticos",
+    "2024-10-11": "Día no laborable con fines turísticos",
+    "2025-05-02": "Día no laborable con fines turísticos",
+    "2025-08-15": "Día no laborable con fines turísticos",
+    "2025-11-21": "Día no laborable con fines turísticos",
+    "2026-03-23": "Día no laborable con fines turísticos",
+    "2026-07-10": "Día no laborable con fines turísticos",
+    "2026-12-07": "Día no laborable con fines turísticos",
+}
+
+
+def _to_date(value: DateLike) -> date:
+    """将字符串或 datetime 转换为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def _easter_sunday(year: int) -> date:
+    """计算复活节日期（匿名公历算法）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _move_holiday(holiday: date) -> date:
+    """按 Ley 27.399 平移可移动节假日：周二、周三提前到周一，周四、周五顺延到下周一"""
+    weekday = holiday.weekday()
+    if weekday in (1, 2):
+        return holiday - timedelta(days=weekday)
+    if weekday in (3, 4):
+        return holiday + timedelta(days=7 - weekday)
+    return holiday
+
+
+class BusinessCalendar:
+    """阿根廷银行营业日历"""
+    
+    def __init__(self, holidays_file: Optional[str] = HOLIDAYS_CSV):
+        """
+        Args:
+            holidays_file: 可选的节假日覆盖文件 (CSV: date,name,closed)，
+                closed 为 0 表示该日期照常营业，用于撤销内置节假日
+        """
+        self._year_cache: Dict[int, Dict[date, str]] = {}
+        self._added: Dict[date, str] = {}
+        self._removed = set()
+        
+        if holidays_file and os.path.exists(holidays_file):
+            self._load_overrides(holidays_file)
+    
+    def _load_overrides(self, path: str):
+        """加载节假日覆盖文件"""
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    holiday = _to_date(row['date'].strip())
+                    if str(row.get('closed') or '1').strip() == '0':
+                        self._removed.add(holiday)
+                    else:
+                        self._added[holiday] = (row.get('name') or '').strip()
+            logger.info(f"已加载节假日覆盖文件: {path}")
+        except Exception as e:
+            logger.error(f"加载节假日覆盖文件失败: {e}")
+    
+    def holidays(self, year: int) -> Dict[date, str]:
+        """获取指定年份的节假日表"""
+        if year in self._year_cache:
+            return self._year_cache[year]
+        
+        table = {}
+        for (month, day), name in FIXED_HOLIDAYS.items():
+            table[date(year, month, day)] = name
+        for (month, day), name in MOVABLE_HOLIDAYS.items():
+            table[_move_holiday(date(year, month, day))] = name
+        
+        # 复活节相关：狂欢节（周一、周二）、圣周四、耶稣受难日
+        easter = _easter_sunday(year)
+        table[easter - timedelta(days=48)] = "Carnaval"
+        table[easter - timedelta(days=47)] = "Carnaval"
+        table[easter - timedelta(days=3)] = "Jueves Santo"
+        table[easter - timedelta(days=2)] = "Viernes Santo"
+        
+        for day_str, name in BRIDGE_HOLIDAYS.items():
+            bridge = _to_date(day_str)
+            if bridge.year == year:
+                table[bridge] = name
+        
+        for holiday, name in self._added.items():
+            if holiday.year == year:
+                table[holiday] = name
+        for holiday in self._removed:
+            table.pop(holiday, None)
+        
+        self._year_cache[year] = table
+        return table
+    
+    def is_holiday(self, day: DateLike) -> bool:
+        """是否为节假日"""
+        day = _to_date(day)
+        return day in self.holidays(day.year)
+    
+    def is_business_day(self, day: DateLike) -> bool:
+        """是否为银行营业日（非周末且非节假日）"""
+        day = _to_date(day)
+        return day.weekday() < 5 and not self.is_holiday(day)
+    
+    def business_days(self, start_date: DateLike, end_date: DateLike) -> List[str]:
+        """
+        列出日期范围内的所有营业日
+        
+        Args:
+            start_date: 开始日期
+            end_date: 结束日期
+        
+        Returns:
+            List[str]: 营业日列表 (YYYY-MM-DD)，按日期升序
+        """
+        current = _to_date(start_date)
+        end = _to_date(end_date)
+        
+        days = []
+        while current <= end:
+            if self.is_business_day(current):
+                days.append(current.strftime(DATE_FORMAT))
+            current += timedelta(days=1)
+        return days
+    
+    def dates(self, start_date: DateLike, end_date: DateLike, business_days_only: bool = True) -> List[str]:
+        """
+        列出日期范围内的日期
+        
+        Args:
+            business_days_only: 只保留营业日，为 False 时返回所有日历日
+        
+        Returns:
+            List[str]: 日期列表 (YYYY-MM-DD)，按日期升序
+        """
+        if business_days_only:
+            return self.business_days(start_date, end_date)
+        
+        current = _to_date(start_date)
+        end = _to_date(end_date)
+        
+        days = []
+        while current <= end:
+            days.append(current.strftime(DATE_FORMAT))
+            current += timedelta(days=1)
+        return days
@@ -18,8 +18,42 @@ SOURCE_HISTORICO = "bna_divisas_historico"
 
 # 网络请求配置
 REQUEST_TIMEOUT = 10
-MAX_RETRIES = 3
-RETRY_DELAY_BASE = 2  # 指数退避基数
+MAX_RETRIES = 3  # 失败后的最大重试次数
+RETRY_BACKOFF_BASE = 1.0  # 第一次重试前等待时间的上限（秒），之后每次翻倍，实际等待在 0 到上限之间随机（全抖动）
+RETRY_BACKOFF_MAX = 30.0  # 单次等待时间的上限（秒）
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)  # 需要重试的状态码，429/503 优先按 Retry-After 等待
+REQUEST_DEADLINE = 60.0  # 单个请求包括所有重试和等待的总时限（秒）
+
+STREAM_CHUNK_SIZE = 8192  # 流式读取的块大小（字节）
+ERROR_BODY_PREVIEW = 200  # 错误日志中最多记录的响应体长度，流式响应只读取这么多
+
+# HTTP 缓存配置
+HTTP_CACHE_DIR = "data/http_cache"
+HTTP_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 缓存总大小上限
+VALORHOY_CACHE_TTL = 300  # ValorHoy 当日页面缓存有效期（秒）
+HISTORICO_CACHE_TTL = 600  # Historico 当日页面缓存有效期（秒）
+HISTORICO_PAST_CACHE_TTL = float('inf')  # Historico 历史日期页面不会再变化，永久有效
+HISTORICO_RECENT_DAYS = 3  # 最近几天的报价可能还没有发布，页面按当日有效期缓存
+
+# 回补并发配置
+BACKFILL_CONCURRENCY = 1  # 默认并发数（1 为串行）
+BACKFILL_RATE = 2.0  # 全局请求速率上限（次/秒），<= 0 表示不限速
+
+# 每个数据源的自适应流量控制（AIMD）与熔断
+ADAPTIVE_WINDOW = 30.0  # 统计耗时和错误率的滑动窗口长度（秒）
+ADAPTIVE_LATENCY_TARGET = 5.0  # 请求耗时（含传输层重试）超过该值视为服务端拥塞（秒）
+ADAPTIVE_RATE_STEP = 0.5  # 每轮成功请求后速率上限的加性增量（次/秒），一轮为当前并发数个请求
+ADAPTIVE_DECREASE_FACTOR = 0.5  # 拥塞或失败时并发数和速率的乘性减小系数
+ADAPTIVE_MIN_RATE = 0.2  # 速率下限（次/秒）
+CIRCUIT_FAILURE_THRESHOLD = 5  # 连续失败多少次后熔断
+CIRCUIT_ERROR_RATE = 0.5  # 窗口内错误率达到该值时熔断
+CIRCUIT_MIN_SAMPLES = 10  # 按错误率熔断所需的最少样本数
+CIRCUIT_RESET_TIMEOUT = 30.0  # 熔断后多久放行一个探测请求（秒）
+
+# 回补时每个日期的抓取结果
+OUTCOME_OK = "ok"  # 抓取到汇率
+OUTCOME_MISSING = "missing"  # 页面正常但没有该日期的报价，续跑时不再重试
+OUTCOME_FAILED = "failed"  # 请求或解析失败，续跑时重新抓取
 
 # 自定义 User-Agent
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
@@ -30,6 +64,23 @@ MIN_RATE = 0.0  # 最小汇率值
 # 文件路径
 DATA_DIR = "data"
 RATES_CSV = "data/rates.csv"
+RATES_HISTORY_CSV = "data/rates_history.csv"  # 压缩时归档的旧版本数据（审计记录）
+RATES_DB = "data/rates.db"  # SQLite 存储后端的数据库文件
+RATES_PARQUET_DIR = "data/rates_parquet"  # Parquet 存储后端的分区目录
+BACKFILL_JOURNAL = "data/backfill_journal.jsonl"  # 回补检查点日志，中断后可使用 --resume 续跑
+HOLIDAYS_CSV = "data/holidays.csv"  # 可选的节假日覆盖文件
+
+# 存储后端: csv、sqlite 或 parquet
+STORAGE_BACKEND = "csv"
+
+# CSV 追加写入模式：更正以新版本追加，读取时同一日期以最后一行为准
+STORAGE_APPEND_ONLY = False
+COMPACT_THRESHOLD = 1000  # 旧版本行数达到该值时自动压缩，0 表示只手动压缩
+READ_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 查询缓存的内存上限，数据超出时每次重新读取，0 表示不缓存
+
+# 回补时边抓取边写入：缓冲达到条数上限或距上次写入超过时间间隔时写入一批
+WRITE_BATCH_SIZE = 50
+WRITE_FLUSH_INTERVAL = 30.0  # 秒，0 表示只按条数写入
 
 # 日期格式
 DATE_FORMAT = "%Y-%m-%d"
@@ -0,0 +1,98 @@
+"""
+时间序列降采样模块
+把长时间序列压缩到目标点数后再交给图表，浏览器收到的点数与数据总量无关
+"""
+
+import numpy as np
+
+METHOD_LTTB = "lttb"
+METHOD_MINMAX = "minmax"
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样
+    
+    保留首尾两点，其余点均分为 threshold - 2 个桶，每个桶选出与前一个选中点、
+    下一个桶均值构成的三角形面积最大的点。桶均值一次性计算，每个桶内的
+    面积计算是向量化的，循环次数只与 threshold 有关。
+    
+    Args:
+        x: 横坐标（数值，升序）
+        y: 纵坐标
+        threshold: 目标点数
+    
+    Returns:
+        np.ndarray: 选中点的下标，升序
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    xs = np.asarray(x, dtype=np.float64)
+    ys = np.asarray(y, dtype=np.float64)
+    
+    # 第 b 个桶为 [edges[b], edges[b + 1])，桶数为 threshold - 2，每个桶至少一个点
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(xs[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(ys[:n - 1], edges[:-1]) / counts
+    # 最后一个桶的“下一个桶”是最后一个点
+    next_x = np.append(mean_x[1:], xs[-1])
+    next_y = np.append(mean_y[1:], ys[-1])
+    
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(threshold - 2):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs(
+            (xs[a] - next_x[b]) * (ys[lo:hi] - ys[a])
+            - (xs[a] - xs[lo:hi]) * (next_y[b] - ys[a])
+        )
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def minmax(y: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    最小/最大值分桶降采样
+    
+    按位置均分为 buckets 个桶，保留每个桶的最小值和最大值以及首尾两点，
+    峰值和谷值不会丢失。完全向量化：按 (桶, 值) 排序后取每个桶的首尾。
+    
+    Returns:
+        np.ndarray: 选中点的下标，升序，最多 2 * buckets + 2 个
+    """
+    n = len(y)
+    if buckets < 1 or n <= 2 * buckets:
+        return np.arange(n)
+    
+    bucket = np.arange(n) * buckets // n
+    order = np.lexsort((np.asarray(y), bucket))
+    starts = np.flatnonzero(np.diff(bucket)) + 1
+    first = np.concatenate(([0], starts))
+    last = np.concatenate((starts, [n])) - 1
+    return np.unique(np.concatenate((order[first], order[last], [0, n - 1])))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, target: int, method: str = METHOD_LTTB) -> np.ndarray:
+    """
+    按方法降采样到约 target 个点
+    
+    Args:
+        x: 横坐标（数值，升序）
+        y: 纵坐标
+        target: 目标点数
+        method: lttb 或 minmax
+    
+    Returns:
+        np.ndarray: 选中点的下标，升序
+    """
+    if method == METHOD_LTTB:
+        return lttb(x, y, target)
+    if method == METHOD_MINMAX:
+        return minmax(y, max(1, (target - 2) // 2))
+    raise ValueError(f"未知的降采样方法: {method}，可选: {METHOD_LTTB}, {METHOD_MINMAX}")
@@ -0,0 +1,210 @@
+"""
+页面提取器模块
+从 BNA 页面中定位日期和货币行，提供快速扫描和 BeautifulSoup 两种实现
+"""
+
+import re
+import html as html_lib
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from bs4 import BeautifulSoup
+
+from constants import FECHA_TEXT
+
+# 日期文本：Fecha: 15/12/2024（支持单数字日期/月份）
+FECHA_PATTERN = re.compile(re.escape(FECHA_TEXT) + r"\s*\d{1,2}/\d{1,2}/\d{4}")
+
+
+class BaseExtractor(ABC):
+    """提取器基类，子类必须实现 find_date_text 和 find_rows"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def find_date_text(self, html: str) -> Optional[str]:
+        """
+        查找包含 "Fecha: dd/mm/yyyy" 的文本
+        
+        Returns:
+            匹配的文本片段或 None
+        """
+        raise NotImplementedError
+    
+    @abstractmethod
+    def find_rows(self, html: str, marker: str) -> List[List[str]]:
+        """
+        查找所有包含指定单元格文本的表格行
+        
+        Args:
+            html: 页面内容
+            marker: 单元格文本，如 "Dolar U.S.A"
+        
+        Returns:
+            List[List[str]]: 按页面顺序排列的行，每行为去除空白后的单元格文本
+        """
+        raise NotImplementedError
+
+
+class SoupExtractor(BaseExtractor):
+    """基于 BeautifulSoup 完整解析的提取器，速度较慢但容错性最好"""
+    
+    name = "soup"
+    
+    def find_date_text(self, html: str) -> Optional[str]:
+        soup = BeautifulSoup(html, 'html.parser')
+        element = soup.find(string=FECHA_PATTERN)
+        return str(element) if element else None
+    
+    def find_rows(self, html: str, marker: str) -> List[List[str]]:
+        soup = BeautifulSoup(html, 'html.parser')
+        rows = []
+        
+        for table in soup.find_all('table'):
+            for row in table.find_all('tr'):
+                cells = row.find_all(['td', 'th'])
+                cell_texts = [cell.get_text().strip() for cell in cells]
+                if marker in cell_texts:
+                    rows.append(cell_texts)
+        
+        return rows
+
+
+class FastExtractor(BaseExtractor):
+    """
+    基于预编译正则的快速提取器
+    
+    只在标记文本出现的位置附近截取所在的 <tr> 片段并拆分单元格，
+    不构建整棵 DOM 树。
+    """
+    
+    name = "fast"
+    
+    # 向前查找 <tr 的窗口大小，找不到时退回到整段前缀
+    ROW_START_WINDOW = 4096
+    
+    _row_start = re.compile(r"<tr\b", re.IGNORECASE)
+    _row_end = re.compile(r"</tr\s*>|<tr\b|</table\s*>", re.IGNORECASE)
+    _row_close = re.compile(r"</tr\s*>|</table\s*>", re.IGNORECASE)
+    _cell = re.compile(r"<t[dh]\b[^>]*>(.*?)(?=<t[dh]\b|</t[dh]\s*>|$)", re.IGNORECASE | re.DOTALL)
+    _tag = re.compile(r"<[^>]*>")
+    
+    def find_date_text(self, html: str) -> Optional[str]:
+        match = FECHA_PATTERN.search(html)
+        return match.group(0) if match else None
+    
+    def find_rows(self, html: str, marker: str) -> List[List[str]]:
+        rows = []
+        last_row_start = -1
+        position = html.find(marker)
+        
+        while position != -1:
+            row_start = self._find_row_start(html, position)
+            if row_start is not None and row_start != last_row_start:
+                last_row_start = row_start
+                end_match = self._row_end.search(html, position)
+                row_end = end_match.start() if end_match else len(html)
+                
+                cell_texts = self._split_cells(html[row_start:row_end])
+                if marker in cell_texts:
+                    rows.append(cell_texts)
+            
+            position = html.find(marker, position + len(marker))
+        
+        return rows
+    
+    def _find_row_start(self, html: str, position: int) -> Optional[int]:
+        """查找标记所在行的 <tr 起始位置，标记不在行内时返回 None"""
+        window_start = max(0, position - self.ROW_START_WINDOW)
+        last = None
+        for last in self._row_start.finditer(html, window_start, position):
+            pass
+        if last is None and window_start > 0:
+            for last in self._row_start.finditer(html, 0, window_start):
+                pass
+        if last is None:
+            return None
+        
+        # 行在标记之前已经结束，说明标记不在表格行内
+        if self._row_close.search(html, last.end(), position):
+            return None
+        return last.start()
+    
+    def _split_cells(self, row_html: str) -> List[str]:
+        """拆分行内单元格，去掉标签并反转义实体"""
+        return [
+            html_lib.unescape(self._tag.sub('', cell)).strip()
+            for cell in self._cell.findall(row_html)
+        ]
+
+
+class StreamScanner:
+    """
+    流式页面扫描器
+    
+    逐块接收页面文本，只扫描新到达的部分，跟踪日期文本和包含标记的
+    完整表格行是否已经出现，用于判断何时可以停止读取响应体。
+    """
+    
+    # 新块与已扫描部分的重叠长度，避免日期文本被切断在两个块之间
+    DATE_OVERLAP = 64
+    
+    def __init__(self, marker: str):
+        self.marker = marker
+        self.text = ""
+        self.date_seen = False
+        self._date_scan = 0
+        self._marker_scan = 0
+        self._open_rows: List[int] = []
+        self._closed_rows = 0
+        self._reported_rows = 0
+    
+    def feed(self, chunk: str) -> bool:
+        """
+        追加一块文本
+        
+        Returns:
+            bool: 日期已出现且有新的标记行读取完整，值得尝试解析
+        """
+        self.text += chunk
+        
+        if not self.date_seen:
+            if FECHA_PATTERN.search(self.text, self._date_scan):
+                self.date_seen = True
+            else:
+                self._date_scan = max(0, len(self.text) - self.DATE_OVERLAP)
+        
+        # 记录新出现的标记位置
+        position = self.text.find(self.marker, self._marker_scan)
+        while position != -1:
+            self._open_rows.append(position + len(self.marker))
+            position = self.text.find(self.marker, position + len(self.marker))
+        self._marker_scan = max(self._marker_scan, len(self.text) - len(self.marker) + 1)
+        
+        # 标记之后出现行结束，说明该行已读取完整
+        still_open = []
+        for row_position in self._open_rows:
+            if FastExtractor._row_end.search(self.text, row_position):
+                self._closed_rows += 1
+            else:
+                still_open.append(row_position)
+        self._open_rows = still_open
+        
+        if self.date_seen and self._closed_rows > self._reported_rows:
+            self._reported_rows = self._closed_rows
+            return True
+        return False
+
+
+EXTRACTORS = {
+    FastExtractor.name: FastExtractor,
+    SoupExtractor.name: SoupExtractor,
+}
+
+
+def get_extractor(name: str) -> BaseExtractor:
+    """按名称创建提取器"""
+    try:
+        return EXTRACTORS[name]()
+    except KeyError:
+        raise ValueError(f"未知的提取器: {name}，可选: {', '.join(EXTRACTORS)}")
@@ -0,0 +1,332 @@
+"""
+流量控制模块
+令牌桶限速器，以及每个数据源独立的自适应并发/速率控制（AIMD）和熔断器
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from constants import (
+    BACKFILL_CONCURRENCY, BACKFILL_RATE, ADAPTIVE_WINDOW, ADAPTIVE_LATENCY_TARGET,
+    ADAPTIVE_RATE_STEP, ADAPTIVE_DECREASE_FACTOR, ADAPTIVE_MIN_RATE,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_ERROR_RATE, CIRCUIT_MIN_SAMPLES, CIRCUIT_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器已打开，请求被直接拒绝"""
+
+
+class RateLimiter:
+    """令牌桶限速器，可在多个线程间共享"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Args:
+            rate: 每秒补充的令牌数，<= 0 表示不限速
+            burst: 桶容量，即允许的瞬时突发请求数
+        """
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait = (1 - self._tokens) / self.rate
+            
+            time.sleep(wait)
+    
+    def set_rate(self, rate: float):
+        """调整速率，此前累积的令牌按旧速率结算"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = rate
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    
+    连续失败达到阈值，或滑动窗口内错误率过高时打开，之后的请求直接拒绝；
+    经过 reset_timeout 秒后进入半开状态，只放行一个探测请求：成功则关闭，失败则重新打开。
+    """
+    
+    def __init__(self, name: str,
+                 failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 error_rate: float = CIRCUIT_ERROR_RATE,
+                 min_samples: int = CIRCUIT_MIN_SAMPLES,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.min_samples = min_samples
+        self.reset_timeout = reset_timeout
+        
+        self.state = CIRCUIT_CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+    
+    @property
+    def rejecting(self) -> bool:
+        """是否处于打开状态且尚未到探测时间"""
+        with self._lock:
+            return self.state == CIRCUIT_OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+    
+    def allow(self) -> bool:
+        """是否放行一个请求；半开状态下同时只放行一个探测请求"""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return True
+            
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+                self._probing = False
+                logger.info(f"{self.name} 熔断已到期，发送探测请求")
+            
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+    
+    def record(self, started: float, failed: bool, error_rate: float, samples: int) -> Optional[str]:
+        """
+        记录一个请求的结果
+        
+        Args:
+            started: 请求开始时间，熔断前发出的请求不影响熔断状态
+            failed: 请求是否失败
+            error_rate: 滑动窗口内的错误率
+            samples: 滑动窗口内的样本数
+        
+        Returns:
+            状态变化时返回新状态，否则为 None
+        """
+        with self._lock:
+            if self.state != CIRCUIT_CLOSED:
+                if self.state == CIRCUIT_OPEN or started < self._opened_at:
+                    return None
+                # 半开状态下探测请求的结果
+                self._probing = False
+                if failed:
+                    return self._open("探测请求失败")
+                self.state = CIRCUIT_CLOSED
+                self._consecutive = 0
+                logger.info(f"{self.name} 探测成功，熔断关闭")
+                return CIRCUIT_CLOSED
+            
+            self._consecutive = self._consecutive + 1 if failed else 0
+            if not failed:
+                return None
+            if self._consecutive >= self.failure_threshold:
+                return self._open(f"连续失败 {self._consecutive} 次")
+            if samples >= self.min_samples and error_rate >= self.error_rate:
+                return self._open(f"错误率 {error_rate:.0%}（{samples} 个请求）")
+            return None
+    
+    def _open(self, reason: str) -> str:
+        self.state = CIRCUIT_OPEN
+        self._opened_at = time.monotonic()
+        self._consecutive = 0
+        self._probing = False
+        logger.warning(f"{self.name} 熔断: {reason}，{self.reset_timeout:.0f} 秒内的请求直接失败")
+        return CIRCUIT_OPEN
+
+
+class AdaptiveController:
+    """
+    单个数据源的自适应流量控制
+    
+    在滑动窗口内统计请求耗时和错误率，按 AIMD 调整允许的并发数和速率：
+    成功且耗时正常的请求使并发数增加 1/并发数、速率增加 rate_step/并发数，
+    即每轮（当前并发数个请求）加性增加；失败或耗时超过目标时两者乘以
+    decrease_factor。在上一次减小之前发出的请求不会再次触发减小，
+    同一次拥塞只减小一次。并发数和速率不超过构造时给定的上限，
+    速率上限 <= 0 时不限速，只调整并发数。
+    """
+    
+    def __init__(self, name: str,
+                 max_concurrency: int = BACKFILL_CONCURRENCY,
+                 max_rate: float = BACKFILL_RATE,
+                 window: float = ADAPTIVE_WINDOW,
+                 latency_target: float = ADAPTIVE_LATENCY_TARGET,
+                 rate_step: float = ADAPTIVE_RATE_STEP,
+                 decrease_factor: float = ADAPTIVE_DECREASE_FACTOR,
+                 min_rate: float = ADAPTIVE_MIN_RATE,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            name: 数据源名称，用于日志
+            max_concurrency: 并发数上限，也是初始并发数
+            max_rate: 速率上限（次/秒），也是初始速率
+            breaker: 熔断器，默认按 constants 中的阈值创建
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_rate = max_rate
+        self.window = window
+        self.latency_target = latency_target
+        self.rate_step = rate_step
+        self.decrease_factor = decrease_factor
+        self.min_rate = min_rate
+        self.breaker = breaker or CircuitBreaker(name)
+        self.limiter = RateLimiter(max_rate)
+        self.limit = float(self.max_concurrency)
+        
+        # (完成时间, 耗时, 是否失败)
+        self._samples: Deque[Tuple[float, float, bool]] = deque()
+        self._failures = 0
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+    
+    @property
+    def rate(self) -> float:
+        return self.limiter.rate
+    
+    def configure(self, max_concurrency: int, max_rate: float):
+        """
+        调整并发数和速率上限，例如每次回补按调用方给定的参数设置
+        
+        当前值处于原上限（没有因拥塞降低）时直接移到新上限，
+        已经降低的值只按新上限截断，继续按 AIMD 恢复。
+        """
+        with self._cond:
+            max_concurrency = max(1, max_concurrency)
+            if self.limit >= self.max_concurrency:
+                self.limit = float(max_concurrency)
+            else:
+                self.limit = min(self.limit, float(max_concurrency))
+            
+            if max_rate <= 0:
+                rate = 0
+            elif self.max_rate <= 0 or self.rate >= self.max_rate:
+                rate = max_rate
+            else:
+                rate = min(self.rate, max_rate)
+            
+            self.max_concurrency = max_concurrency
+            self.max_rate = max_rate
+            if rate != self.limiter.rate:
+                self.limiter.set_rate(rate)
+            self._cond.notify_all()
+    
+    def acquire(self) -> float:
+        """
+        等待并发名额和速率令牌
+        
+        Returns:
+            float: 请求开始时间，完成后传给 release()
+        
+        Raises:
+            CircuitOpenError: 熔断器打开
+        """
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                if self.breaker.rejecting:
+                    break
+                self._cond.wait(0.5)
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"{self.name} 已熔断")
+            self._in_flight += 1
+        
+        self.limiter.acquire()
+        return time.monotonic()
+    
+    def release(self, started: float, failed: bool):
+        """
+        记录请求结果，调整并发数和速率
+        
+        Args:
+            started: acquire() 返回的开始时间
+            failed: 请求是否失败（连接错误、超时或重试后仍为 429/5xx）
+        """
+        now = time.monotonic()
+        latency = now - started
+        
+        with self._cond:
+            self._in_flight -= 1
+            self._samples.append((now, latency, failed))
+            self._failures += failed
+            self._prune(now)
+            samples = len(self._samples)
+            
+            state = self.breaker.record(started, failed, self._failures / samples, samples)
+            if state == CIRCUIT_OPEN:
+                # 恢复后从最低并发数和速率重新开始增加
+                self._set_limits(1.0, self.min_rate)
+                self._last_decrease = now
+            elif state == CIRCUIT_CLOSED:
+                self._samples.clear()
+                self._failures = 0
+            elif failed or latency > self.latency_target:
+                if started > self._last_decrease:
+                    self._set_limits(self.limit * self.decrease_factor, self.rate * self.decrease_factor)
+                    self._last_decrease = now
+                    reason = "请求失败" if failed else f"耗时 {latency:.1f} 秒"
+                    logger.warning(f"{self.name} {reason}，并发数降为 {int(self.limit)}，速率降为 {self.rate:.2f} 次/秒")
+            else:
+                self._set_limits(self.limit + 1 / self.limit, self.rate + self.rate_step / self.limit)
+            
+            self._cond.notify_all()
+    
+    def snapshot(self) -> dict:
+        """
+        当前状态
+        
+        Returns:
+            dict: state, concurrency, rate, in_flight, error_rate, latency (窗口内平均耗时，秒)
+        """
+        with self._cond:
+            self._prune(time.monotonic())
+            samples = len(self._samples)
+            return {
+                'state': self.breaker.state,
+                'concurrency': int(self.limit),
+                'rate': self.rate,
+                'in_flight': self._in_flight,
+                'error_rate': self._failures / samples if samples else 0.0,
+                'latency': sum(s[1] for s in self._samples) / samples if samples else 0.0,
+            }
+    
+    def _prune(self, now: float):
+        while self._samples and self._samples[0][0] < now - self.window:
+            self._failures -= self._samples.popleft()[2]
+    
+    def _set_limits(self, limit: float, rate: float):
+        self.limit = min(float(self.max_concurrency), max(1.0, limit))
+        if self.max_rate > 0:
+            rate = min(self.max_rate, max(self.min_rate, rate))
+            if rate != self.limiter.rate:
+                self.limiter.set_rate(rate)
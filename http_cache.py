@@ -0,0 +1,195 @@
+"""
+HTTP 缓存模块
+在磁盘上缓存页面内容，支持 ETag/Last-Modified 条件请求和 LRU 淘汰
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import requests
+
+from constants import HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    """磁盘 HTTP 缓存，按最近访问顺序淘汰"""
+    
+    INDEX_FILE = "index.json"
+    
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        """
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存内容总大小上限（字节），超出后淘汰最久未访问的条目
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._total_bytes = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+    
+    @staticmethod
+    def make_key(url: str, params: Optional[dict] = None) -> str:
+        """根据 URL 和查询参数生成缓存键"""
+        raw = url + "?" + "&".join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[dict]:
+        """获取缓存条目，并标记为最近访问"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            body_path = self._body_path(key)
+            if not os.path.exists(body_path):
+                self._drop(key)
+                return None
+            
+            self._entries.move_to_end(key)
+            return dict(entry)
+    
+    def is_fresh(self, entry: dict, ttl: float) -> bool:
+        """条目是否仍在有效期内，ttl 为 inf 表示永不过期"""
+        return time.time() - entry['stored_at'] < ttl
+    
+    def conditional_headers(self, entry: dict) -> dict:
+        """生成条件请求头"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def store(self, key: str, url: str, response: requests.Response):
+        """保存 200 响应的内容和校验头"""
+        body = response.content
+        entry = {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'encoding': response.encoding,
+            'stored_at': time.time(),
+            'size': len(body),
+        }
+        
+        with self._lock:
+            try:
+                self._write_atomic(self._body_path(key), body)
+            except OSError as e:
+                logger.warning(f"写入 HTTP 缓存失败: {e}")
+                return
+            
+            if key in self._entries:
+                self._total_bytes -= self._entries[key]['size']
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._total_bytes += entry['size']
+            
+            self._evict()
+            self._save_index()
+    
+    def refresh(self, key: str):
+        """收到 304 后刷新条目的保存时间"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['stored_at'] = time.time()
+            self._entries.move_to_end(key)
+            self._save_index()
+    
+    def discard(self, key: str):
+        """删除条目，例如内容无效、不应继续复用时"""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self._save_index()
+    
+    def build_response(self, entry: dict, key: str) -> Optional[requests.Response]:
+        """用缓存内容构造一个 200 响应，from_cache 属性为 True"""
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None
+        
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response._content_consumed = True
+        response.url = entry['url']
+        response.encoding = entry.get('encoding')
+        response.from_cache = True
+        if entry.get('etag'):
+            response.headers['ETag'] = entry['etag']
+        if entry.get('last_modified'):
+            response.headers['Last-Modified'] = entry['last_modified']
+        return response
+    
+    def _evict(self):
+        """按 LRU 淘汰条目直到总大小不超过上限，至少保留最近一条"""
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            logger.debug(f"淘汰 HTTP 缓存条目: {self._entries[key]['url']}")
+            self._drop(key)
+    
+    def _drop(self, key: str):
+        """删除条目及其内容文件"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry['size']
+        try:
+            os.remove(self._body_path(key))
+        except OSError:
+            pass
+    
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.body")
+    
+    def _index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+    
+    def _load_index(self):
+        """加载索引文件，按 LRU 顺序保存（最久未访问的在前）"""
+        index_path = self._index_path()
+        if not os.path.exists(index_path):
+            return
+        
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                for key, entry in json.load(f):
+                    self._entries[key] = entry
+                    self._total_bytes += entry['size']
+        except Exception as e:
+            logger.warning(f"HTTP 缓存索引损坏，将重新建立: {e}")
+            self._entries.clear()
+            self._total_bytes = 0
+    
+    def _save_index(self):
+        """保存索引文件"""
+        data = json.dumps(list(self._entries.items()), ensure_ascii=False)
+        try:
+            self._write_atomic(self._index_path(), data.encode('utf-8'))
+        except OSError as e:
+            logger.warning(f"保存 HTTP 缓存索引失败: {e}")
+    
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        """先写临时文件再重命名，避免留下写了一半的文件"""
+        tmp_path = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -0,0 +1,160 @@
+"""
+HTTP 传输模块
+所有数据源共用一个 requests.Session：连接池大小与回补并发数一致，
+重试交给 urllib3 的 Retry 声明式处理（全抖动退避、遵守 Retry-After、单个请求总时限）
+"""
+
+import time
+import random
+import logging
+import threading
+from itertools import takewhile
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, ResponseError
+from urllib3.util.retry import Retry
+
+from constants import (
+    USER_AGENT, BACKFILL_CONCURRENCY, MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+    RETRY_STATUS_CODES, REQUEST_DEADLINE
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-AR,es;q=0.8,en-US;q=0.5,en;q=0.3',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# 当前线程中正在发送的请求的开始时间；urllib3 在发送请求的线程中调用 Retry.increment
+_request_clock = threading.local()
+
+
+class JitterRetry(Retry):
+    """
+    带全抖动退避和总时限的重试策略
+    
+    第 n 次连续失败后等待 uniform(0, min(max_backoff, backoff_factor * 2^(n-1))) 秒；
+    响应带 Retry-After 时按其等待。下一次等待会超出请求总时限时不再重试。
+    """
+    
+    def __init__(self, *args, deadline: Optional[float] = None, max_backoff: float = RETRY_BACKOFF_MAX, **kwargs):
+        """
+        Args:
+            deadline: 单个请求包括所有重试和等待的总时限（秒），None 表示不限制
+            max_backoff: 单次退避等待的上限（秒）
+        """
+        super().__init__(*args, **kwargs)
+        self.deadline = deadline
+        self.max_backoff = max_backoff
+        self._backoff: Optional[float] = None
+    
+    def new(self, **kw) -> "JitterRetry":
+        retry = super().new(**kw)
+        retry.deadline = self.deadline
+        retry.max_backoff = self.max_backoff
+        return retry
+    
+    def get_backoff_time(self) -> float:
+        """全抖动退避时间；同一个重试状态只抽取一次，检查时限和实际等待使用同一个值"""
+        if self._backoff is None:
+            errors = len(list(takewhile(lambda h: h.redirect_location is None, reversed(self.history))))
+            if errors == 0:
+                self._backoff = 0.0
+            else:
+                ceiling = min(self.max_backoff, self.backoff_factor * 2 ** (errors - 1))
+                self._backoff = random.uniform(0, ceiling)
+        return self._backoff
+    
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        retry = super().increment(method, url, response, error, _pool, _stacktrace)
+        
+        started = getattr(_request_clock, 'started', None)
+        if self.deadline is not None and started is not None:
+            wait = None
+            if response is not None and retry.respect_retry_after_header:
+                wait = retry.get_retry_after(response)
+            if not wait:
+                wait = retry.get_backoff_time()
+            
+            elapsed = time.monotonic() - started
+            if elapsed + wait > self.deadline:
+                reason = error or ResponseError(f"等待 {wait:.1f} 秒后重试将超过请求总时限 {self.deadline} 秒")
+                raise MaxRetryError(_pool, url, reason) from reason
+        
+        if response is not None:
+            logger.warning(f"HTTP {response.status}，{retry.get_backoff_time():.1f} 秒后重试: {url}")
+        elif error is not None:
+            logger.warning(f"请求异常: {error}，{retry.get_backoff_time():.1f} 秒后重试: {url}")
+        return retry
+
+
+class PooledAdapter(HTTPAdapter):
+    """记录每个请求的开始时间，供 JitterRetry 计算总时限"""
+    
+    @property
+    def pool_size(self) -> int:
+        return self._pool_maxsize
+    
+    def send(self, request, **kwargs):
+        _request_clock.started = time.monotonic()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            _request_clock.started = None
+
+
+def make_retry(total: int = MAX_RETRIES, deadline: Optional[float] = REQUEST_DEADLINE) -> JitterRetry:
+    """默认的重试策略：只重试幂等请求，状态码重试耗尽后返回最后一个响应"""
+    return JitterRetry(
+        total=total,
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=RETRY_BACKOFF_BASE,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        deadline=deadline,
+        max_backoff=RETRY_BACKOFF_MAX,
+    )
+
+
+def create_session(pool_size: int = BACKFILL_CONCURRENCY, retry: Optional[Retry] = None) -> requests.Session:
+    """
+    创建共享的 Session
+    
+    Args:
+        pool_size: 每个主机保持的连接数，应与并发抓取的线程数一致，
+            否则多出的线程用完后连接会被丢弃，无法复用
+        retry: 重试策略，默认使用 make_retry()
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    _mount(session, max(1, pool_size), retry or make_retry())
+    return session
+
+
+def ensure_pool_size(session: requests.Session, pool_size: int):
+    """
+    连接池小于 pool_size 时换上更大的连接池，重试策略不变
+    
+    旧连接池不主动关闭，其他线程正在使用的连接归还后随之释放。
+    """
+    adapter = session.get_adapter('https://')
+    if isinstance(adapter, PooledAdapter) and adapter.pool_size < pool_size:
+        logger.debug(f"连接池扩大到 {pool_size}")
+        _mount(session, pool_size, adapter.max_retries)
+
+
+def _mount(session: requests.Session, pool_size: int, retry: Retry):
+    adapter = PooledAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
@@ -1,6 +1,9 @@
 """
 CLI 主程序
 使用 Typer 实现命令行界面
+
+抓取器（requests、bs4）和 pandas 等较重的依赖只在需要它们的命令中导入，
+status、latest 等查询命令启动时不加载这些模块。
 """
 
 import logging
@@ -9,13 +12,25 @@ from datetime import datetime, timedelta
 from typing import Optional
 import typer
 
-from scraper import ScraperManager
-from storage import RateStorage
-from constants import SOURCE_VALORHOY, SOURCE_HISTORICO
+from storage import BatchWriter, create_storage
+from constants import (
+    SOURCE_VALORHOY, SOURCE_HISTORICO, BACKFILL_CONCURRENCY, BACKFILL_RATE,
+    STORAGE_BACKEND, RATES_CSV, RATES_DB, RATES_PARQUET_DIR, WRITE_BATCH_SIZE
+)
 
 # 创建 Typer 应用
 app = typer.Typer(help="BNA 阿根廷兑美元汇率抓取器")
 
+# 全局选项
+state = {'backend': STORAGE_BACKEND}
+
+@app.callback()
+def cli(
+    backend: str = typer.Option(STORAGE_BACKEND, "--backend", help="存储后端 (csv/sqlite/parquet)")
+):
+    """BNA 阿根廷兑美元汇率抓取器"""
+    state['backend'] = backend
+
 # 配置日志
 def setup_logging(debug: bool = False):
     """配置日志级别"""
@@ -35,6 +50,8 @@ def yesterday(
         "--fallback", 
         help="在 ValorHoy 失败时使用 Historico 作为备选"
     ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="不使用本地 HTTP 缓存"),
+    stream: bool = typer.Option(False, "--stream", help="流式读取 ValorHoy 页面，找到数据后立即断开"),
     debug: bool = typer.Option(False, "--debug", help="启用调试模式"),
     dry_run: bool = typer.Option(False, "--dry-run", help="仅显示，不保存数据")
 ):
@@ -44,9 +61,12 @@ def yesterday(
     
     logger.info("开始抓取昨天数据...")
     
+    from scraper import ScraperManager
+    from http_cache import HttpCache
+    
     # 初始化组件
-    scraper = ScraperManager()
-    storage = RateStorage()
+    scraper = ScraperManager(cache=None if no_cache else HttpCache(), streaming=stream)
+    storage = create_storage(state['backend'])
     
     # 抓取数据
     result = scraper.scrape_yesterday(fallback=fallback)
@@ -73,6 +93,39 @@ def yesterday(
 def backfill(
     start_date: str = typer.Argument(..., help="开始日期 (YYYY-MM-DD)"),
     end_date: str = typer.Argument(..., help="结束日期 (YYYY-MM-DD)"),
+    concurrency: int = typer.Option(
+        BACKFILL_CONCURRENCY,
+        "--concurrency",
+        min=1,
+        help="并发抓取的线程数"
+    ),
+    rate: float = typer.Option(
+        BACKFILL_RATE,
+        "--rate",
+        help="全局请求速率上限（次/秒），<= 0 表示不限速"
+    ),
+    all_days: bool = typer.Option(
+        False,
+        "--all-days",
+        help="抓取所有日历日，不跳过周末和银行节假日"
+    ),
+    missing_only: bool = typer.Option(
+        False,
+        "--missing-only/--force",
+        help="只抓取存储中缺失的日期 / 重新抓取范围内的所有日期（默认）"
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="从上次中断的检查点续跑，跳过已完成的日期"
+    ),
+    batch_size: int = typer.Option(
+        WRITE_BATCH_SIZE,
+        "--batch-size",
+        min=1,
+        help="边抓取边写入，每累积多少条写入一次存储"
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="不使用本地 HTTP 缓存"),
     debug: bool = typer.Option(False, "--debug", help="启用调试模式"),
     dry_run: bool = typer.Option(False, "--dry-run", help="仅显示，不保存数据")
 ):
@@ -88,41 +141,107 @@ def backfill(
         if start_obj > end_obj:
             logger.error("开始日期不能晚于结束日期")
             raise typer.Exit(1)
-            
+    
     except ValueError:
         logger.error("日期格式无效，请使用 YYYY-MM-DD 格式")
         raise typer.Exit(1)
     
     logger.info(f"开始回补日期范围: {start_date} 到 {end_date}")
     
+    from scraper import ScraperManager
+    from http_cache import HttpCache
+    from flow_control import CIRCUIT_CLOSED
+    
     # 初始化组件
-    scraper = ScraperManager()
-    storage = RateStorage()
+    scraper = ScraperManager(cache=None if no_cache else HttpCache(), pool_size=concurrency, max_rate=rate)
+    storage = create_storage(state['backend'])
     
-    # 抓取数据
-    results = scraper.scrape_date_range(start_date, end_date)
+    # 计划抓取的日期
+    business_days_only = not all_days
+    if missing_only:
+        dates = storage.find_missing_dates(
+            start_date, end_date,
+            business_days_only=business_days_only,
+            calendar=scraper.calendar
+        )
+        if not dates:
+            logger.info("范围内数据已完整，无需抓取")
+            return
+        logger.info(f"存储中缺失 {len(dates)} 天: {', '.join(dates[:10])}{' ...' if len(dates) > 10 else ''}")
+    else:
+        dates = scraper.plan_dates(start_date, end_date, business_days_only)
+        logger.info(f"需要抓取 {len(dates)} 天")
+    
+    # 检查点日志：每个日期完成后立即记录，中断后可以续跑
+    journal = None
+    carried = []
+    if not dry_run:
+        from backfill_journal import BackfillJournal
+        
+        journal = BackfillJournal()
+        if resume and journal.resume(start_date, end_date, business_days_only):
+            done = journal.completed()
+            dates = [date for date in dates if date not in done]
+            counts = journal.counts()
+            logger.info(
+                f"从检查点续跑: 已完成 {len(done)} 天 (ok {counts['ok']}, missing {counts['missing']})，"
+                f"剩余 {len(dates)} 天"
+            )
+            # 上次中断前已抓取但还没写入存储的数据
+            stored = dict(storage.get_rates(start_date, end_date))
+            carried = [record for record in journal.results() if stored.get(record[0]) != record[1]]
+        else:
+            if resume:
+                logger.warning("没有可续跑的检查点，从头开始回补")
+            journal.start(start_date, end_date, business_days_only)
     
-    if not results:
+    # 边抓取边写入：每条结果产出后进入写入缓冲，按微批写入存储
+    results = scraper.iter_dates(
+        dates,
+        concurrency=concurrency,
+        rate=rate,
+        on_outcome=journal.record if journal else None
+    )
+    scraped = 0
+    try:
+        if dry_run:
+            logger.info("DRY RUN 模式，不保存数据")
+            for date, rate_sell, source in results:
+                scraped += 1
+                logger.info(f"  {date}: {rate_sell} ({source})")
+        else:
+            with BatchWriter(storage, batch_size=batch_size) as writer:
+                for record in carried:
+                    writer.add(record)
+                for record in results:
+                    scraped += 1
+                    writer.add(record)
+    except KeyboardInterrupt:
+        if journal:
+            logger.warning(f"回补被中断，已抓取的数据已保存，进度记录在 {journal.path}，可使用 --resume 续跑")
+        raise typer.Exit(130)
+    finally:
+        results.close()
+        if journal:
+            journal.close()
+    
+    if not scraped and not carried:
         logger.warning("没有抓取到任何数据")
         return
     
-    logger.info(f"成功抓取 {len(results)} 条数据")
-    
+    logger.info(f"成功抓取 {scraped} 条数据")
     if dry_run:
-        logger.info("DRY RUN 模式，不保存数据")
-        for date, rate_sell, source in results:
-            logger.info(f"  {date}: {rate_sell} ({source})")
         return
     
-    # 保存数据
-    success_count = 0
-    for date, rate_sell, source in results:
-        if storage.add_rate(date, rate_sell, source):
-            success_count += 1
-        else:
-            logger.warning(f"保存 {date} 数据失败")
+    logger.info(f"数据保存完成，成功 {writer.written}/{scraped + len(carried)} 条")
     
-    logger.info(f"数据保存完成，成功 {success_count}/{len(results)} 条")
+    failed_dates = journal.counts()['failed']
+    if failed_dates:
+        logger.warning(f"{failed_dates} 天抓取失败，可使用 --resume 重试")
+        if scraper.historico_source.controller.snapshot()['state'] != CIRCUIT_CLOSED:
+            logger.warning("Historico 数据源已熔断，请在服务端恢复后再续跑")
+    elif not writer.rejected:
+        journal.remove()
 
 @app.command()
 def status(
@@ -132,7 +251,7 @@ def status(
     setup_logging(debug)
     logger = logging.getLogger(__name__)
     
-    storage = RateStorage()
+    storage = create_storage(state['backend'])
     stats = storage.get_stats()
     
     if not stats:
@@ -150,6 +269,12 @@ def status(
         for source, count in stats['sources'].items():
             logger.info(f"    {source}: {count} 条")
     
+    if stats.get('latest'):
+        latest = stats['latest']
+        logger.info(f"  最新汇率: {latest['date']} = {latest['rate_sell']} ({latest['source']})")
+    if stats.get('last_fetched_at'):
+        logger.info(f"  最后抓取时间: {stats['last_fetched_at']}")
+    
     # 显示最近的数据
     recent_data = storage.get_recent_rates(5)
     if recent_data:
@@ -157,5 +282,93 @@ def status(
         for record in recent_data:
             logger.info(f"    {record['date']}: {record['rate_sell']} ({record['source']})")
 
+@app.command()
+def latest(
+    debug: bool = typer.Option(False, "--debug", help="启用调试模式")
+):
+    """输出最新日期的汇率 (日期 卖出价 数据源)，供定时任务和健康检查使用"""
+    setup_logging(debug)
+    logger = logging.getLogger(__name__)
+    
+    latest_rate = create_storage(state['backend']).get_latest_rate()
+    if not latest_rate:
+        logger.error("暂无数据")
+        raise typer.Exit(1)
+    
+    typer.echo(f"{latest_rate['date']} {latest_rate['rate_sell']} {latest_rate['source']}")
+
+@app.command()
+def stats(
+    rebuild: bool = typer.Option(False, "--rebuild", help="重新读取数据并重建统计摘要"),
+    debug: bool = typer.Option(False, "--debug", help="启用调试模式")
+):
+    """核对 CSV 统计摘要是否与数据一致"""
+    setup_logging(debug)
+    logger = logging.getLogger(__name__)
+    
+    if state['backend'] != "csv":
+        logger.info(f"{state['backend']} 后端直接查询统计信息，无需摘要文件")
+        return
+    
+    storage = create_storage(state['backend'])
+    if rebuild:
+        storage.rebuild_stats()
+        return
+    
+    if storage.verify_stats():
+        logger.info("统计摘要与数据一致")
+    else:
+        logger.error("统计摘要与数据不一致，可使用 --rebuild 重建")
+        raise typer.Exit(1)
+
+@app.command()
+def compact(
+    no_archive: bool = typer.Option(False, "--no-archive", help="丢弃旧版本，不写入归档文件"),
+    debug: bool = typer.Option(False, "--debug", help="启用调试模式")
+):
+    """压缩 CSV 数据文件，每个日期只保留最新版本"""
+    setup_logging(debug)
+    logger = logging.getLogger(__name__)
+    
+    if state['backend'] != "csv":
+        logger.info(f"{state['backend']} 后端无需压缩")
+        return
+    
+    storage = create_storage(state['backend'])
+    if no_archive:
+        storage.archive_path = None
+    
+    if storage.compact() is None:
+        raise typer.Exit(1)
+
+@app.command()
+def migrate(
+    to: str = typer.Option("sqlite", "--to", help="目标存储后端 (sqlite/parquet)"),
+    csv_path: str = typer.Option(RATES_CSV, "--csv", help="源 CSV 文件"),
+    db_path: str = typer.Option(RATES_DB, "--db", help="目标 SQLite 数据库"),
+    parquet_dir: str = typer.Option(RATES_PARQUET_DIR, "--parquet-dir", help="目标 Parquet 分区目录"),
+    debug: bool = typer.Option(False, "--debug", help="启用调试模式")
+):
+    """将 CSV 数据导入 SQLite 或 Parquet 存储"""
+    setup_logging(debug)
+    logger = logging.getLogger(__name__)
+    
+    try:
+        if to == "sqlite":
+            target = create_storage("sqlite", db_path=db_path)
+        elif to == "parquet":
+            target = create_storage("parquet", root_dir=parquet_dir)
+        else:
+            logger.error(f"不支持的迁移目标: {to}，可选: sqlite, parquet")
+            raise typer.Exit(1)
+        count = target.import_csv(csv_path)
+    except typer.Exit:
+        raise
+    except Exception as e:
+        logger.error(f"迁移失败: {e}")
+        raise typer.Exit(1)
+    
+    logger.info(f"迁移完成，共导入 {count} 条记录，可使用 --backend {to} 切换存储后端")
+
 if __name__ == "__main__":
     app()
@@ -0,0 +1,280 @@
+"""
+Parquet 存储模块
+按 年/月 分区存储列式数据，范围查询只打开与范围重叠的分区，并且只读取需要的列
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+from datetime import datetime, date as date_type
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = None
+    pq = None
+
+from constants import RATES_PARQUET_DIR, DATE_FORMAT
+from storage import BaseRateStorage
+
+logger = logging.getLogger(__name__)
+
+PARTITION_FILE = "data.parquet"
+
+Partition = Tuple[int, int]  # (年, 月)
+
+
+def _schema():
+    """date 为 date32，source 使用字典编码"""
+    return pa.schema([
+        ('date', pa.date32()),
+        ('rate_sell', pa.float64()),
+        ('source', pa.dictionary(pa.int32(), pa.string())),
+        ('fetched_at', pa.string()),
+    ])
+
+
+class ParquetRateStorage(BaseRateStorage):
+    """
+    Parquet 汇率数据存储
+    
+    目录结构为 year=YYYY/month=MM/data.parquet，每个分区内按日期排序。
+    写入时只重写受影响的分区（写临时文件后原子重命名）。
+    """
+    
+    def __init__(self, root_dir: str = RATES_PARQUET_DIR):
+        if pa is None:
+            raise ImportError("Parquet 存储需要安装 pyarrow: pip install pyarrow")
+        
+        self.root_dir = root_dir
+        if not os.path.exists(root_dir):
+            os.makedirs(root_dir)
+            logger.info(f"创建数据目录: {root_dir}")
+    
+    def _partition_path(self, partition: Partition) -> str:
+        year, month = partition
+        return os.path.join(self.root_dir, f"year={year:04d}", f"month={month:02d}", PARTITION_FILE)
+    
+    def _partitions(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Partition]:
+        """
+        列出已存在的分区，按时间升序
+        
+        给定日期范围时只返回与范围重叠的分区（分区裁剪）。
+        """
+        low = (int(start_date[:4]), int(start_date[5:7])) if start_date else None
+        high = (int(end_date[:4]), int(end_date[5:7])) if end_date else None
+        
+        partitions = []
+        for year_dir in os.listdir(self.root_dir):
+            if not year_dir.startswith("year="):
+                continue
+            year_path = os.path.join(self.root_dir, year_dir)
+            for month_dir in os.listdir(year_path):
+                if not month_dir.startswith("month="):
+                    continue
+                partition = (int(year_dir[5:]), int(month_dir[6:]))
+                if low and partition < low or high and partition > high:
+                    continue
+                if os.path.exists(self._partition_path(partition)):
+                    partitions.append(partition)
+        
+        return sorted(partitions)
+    
+    def version(self) -> Optional[tuple]:
+        """数据版本标记：各分区文件的 (分区, 大小, 修改时间)"""
+        signature = []
+        for partition in self._partitions():
+            stat = os.stat(self._partition_path(partition))
+            signature.append((partition, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+    
+    def _read(
+        self,
+        columns: Optional[List[str]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> "pa.Table":
+        """读取与日期范围重叠的分区，只读取指定的列"""
+        filters = []
+        if start_date:
+            filters.append(('date', '>=', datetime.strptime(start_date, DATE_FORMAT).date()))
+        if end_date:
+            filters.append(('date', '<=', datetime.strptime(end_date, DATE_FORMAT).date()))
+        
+        schema = _schema()
+        if columns:
+            schema = pa.schema([schema.field(name) for name in columns])
+        
+        tables = [
+            pq.read_table(self._partition_path(partition), columns=columns, filters=filters or None)
+            for partition in self._partitions(start_date, end_date)
+        ]
+        if not tables:
+            return schema.empty_table()
+        return pa.concat_tables(tables)
+    
+    @staticmethod
+    def _to_records(table: "pa.Table") -> List[dict]:
+        """转换为与 CSV 后端一致的字典列表，日期为 YYYY-MM-DD 字符串"""
+        records = table.to_pylist()
+        for record in records:
+            if isinstance(record.get('date'), date_type):
+                record['date'] = record['date'].strftime(DATE_FORMAT)
+        return records
+    
+    def add_rates(self, records: Iterable[Tuple[str, float, str]]) -> List[dict]:
+        """
+        批量添加汇率数据，每个受影响的分区只重写一次
+        
+        Returns:
+            List[dict]: 与输入顺序一致的逐条结果，status 含义同 RateStorage.add_rates；
+                某个分区写入失败时只有该分区的记录标记为 failed
+        """
+        records = list(records)
+        outcomes, latest = self._plan_batch(records)
+        
+        fetched_at = datetime.now().isoformat()
+        by_partition: Dict[Partition, Dict[str, int]] = {}
+        for date, position in latest.items():
+            by_partition.setdefault((int(date[:4]), int(date[5:7])), {})[date] = position
+        
+        for partition, positions in sorted(by_partition.items()):
+            rows = {
+                date: (records[position][0], float(records[position][1]), records[position][2], fetched_at)
+                for date, position in positions.items()
+            }
+            try:
+                existing = self._write_partition(partition, rows)
+            except Exception as e:
+                logger.error(f"写入分区 {partition[0]}-{partition[1]:02d} 失败: {e}")
+                for position in positions.values():
+                    outcomes[position].update(status='failed', reason=str(e))
+                continue
+            
+            for date, position in positions.items():
+                outcomes[position]['status'] = 'updated' if date in existing else 'added'
+        
+        if latest:
+            added = sum(1 for o in outcomes if o.get('status') == 'added')
+            updated = sum(1 for o in outcomes if o.get('status') == 'updated')
+            logger.info(f"批量写入完成: 新增 {added} 条，更新 {updated} 条，共 {len(records)} 条输入")
+        return outcomes
+    
+    def _write_partition(self, partition: Partition, rows: Dict[str, tuple]) -> set:
+        """
+        合并并重写一个分区
+        
+        Returns:
+            set: 写入前分区中已存在的日期
+        """
+        path = self._partition_path(partition)
+        merged = {}
+        if os.path.exists(path):
+            for record in self._to_records(pq.read_table(path)):
+                merged[record['date']] = (record['date'], record['rate_sell'], record['source'], record['fetched_at'])
+        existing = set(merged)
+        merged.update(rows)
+        
+        ordered = [merged[date] for date in sorted(merged)]
+        table = pa.table({
+            'date': pa.array([datetime.strptime(row[0], DATE_FORMAT).date() for row in ordered], pa.date32()),
+            'rate_sell': pa.array([row[1] for row in ordered], pa.float64()),
+            'source': pa.array([row[2] for row in ordered], pa.string()).dictionary_encode(),
+            'fetched_at': pa.array([row[3] for row in ordered], pa.string()),
+        }, schema=_schema())
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{PARTITION_FILE}.", suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return existing
+    
+    def _stored_dates(self, start_date: str, end_date: str) -> set:
+        """只读取范围内分区的 date 列"""
+        dates = self._read(['date'], start_date, end_date)['date'].to_pylist()
+        return {day.strftime(DATE_FORMAT) for day in dates}
+    
+    def get_recent_rates(self, limit: int = 10) -> List[dict]:
+        """获取最近写入的汇率数据，fetched_at 与 CSV 后端一样转换为 datetime"""
+        try:
+            table = self._read()
+            if table.num_rows == 0:
+                return []
+            table = table.sort_by([('fetched_at', 'descending')]).slice(0, limit)
+            records = self._to_records(table)
+            for record in records:
+                record['fetched_at'] = datetime.fromisoformat(record['fetched_at'])
+            return records
+        except Exception as e:
+            logger.error(f"读取最近汇率数据失败: {e}")
+            return []
+    
+    def get_all_rates(self) -> List[dict]:
+        """获取所有汇率数据，最新日期在前"""
+        try:
+            table = self._read()
+            return self._to_records(table.sort_by([('date', 'descending')]))
+        except Exception as e:
+            logger.error(f"读取所有汇率数据失败: {e}")
+            return []
+    
+    def get_date_range(self, start_date: str, end_date: str, columns: Optional[List[str]] = None) -> List[dict]:
+        """
+        获取指定日期范围内的汇率数据，只打开与范围重叠的月份分区
+        
+        Args:
+            columns: 只读取这些列，默认读取全部列
+        """
+        try:
+            table = self._read(columns, start_date, end_date)
+            if 'date' in table.column_names:
+                table = table.sort_by('date')
+            return self._to_records(table)
+        except Exception as e:
+            logger.error(f"读取日期范围数据失败: {e}")
+            return []
+    
+    def get_stats(self) -> dict:
+        """获取存储统计信息，只读取 date 和 source 两列"""
+        try:
+            table = self._read(['date', 'source'])
+            if table.num_rows == 0:
+                return {
+                    'total_records': 0,
+                    'date_range': None,
+                    'sources': {}
+                }
+            
+            dates = table['date'].combine_chunks()
+            sources = table['source'].cast(pa.string()).value_counts().to_pylist()
+            sources.sort(key=lambda item: item['counts'], reverse=True)
+            return {
+                'total_records': table.num_rows,
+                'date_range': {
+                    'start': min(dates.to_pylist()).strftime(DATE_FORMAT),
+                    'end': max(dates.to_pylist()).strftime(DATE_FORMAT)
+                },
+                'sources': {item['values']: item['counts'] for item in sources}
+            }
+        except Exception as e:
+            logger.error(f"获取统计信息失败: {e}")
+            return {}
+    
+    def _import_rows(self, rows: Dict[str, Tuple[str, float, str, str]]):
+        """按分区写入导入的数据，已存在的日期会被覆盖"""
+        by_partition: Dict[Partition, Dict[str, tuple]] = {}
+        for date, row in rows.items():
+            by_partition.setdefault((int(date[:4]), int(date[5:7])), {})[date] = row
+        
+        for partition, partition_rows in sorted(by_partition.items()):
+            self._write_partition(partition, partition_rows)
@@ -0,0 +1,202 @@
+"""
+汇率二进制索引模块
+将 日期 -> 卖出价 保存为按日期排序的定长记录，通过内存映射读取，
+单日查询和范围查询使用二分查找，不需要解析 CSV
+"""
+
+import os
+import struct
+import logging
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from constants import DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RIDX"
+VERSION = 1
+
+# 文件头: 魔数, 版本, 记录数, 源文件签名 (大小, 修改时间, inode)
+HEADER = struct.Struct("<4sIQqqQ")
+
+# 定长记录: 自 1970-01-01 起的天数 (int32) + 卖出价 (float64)
+RECORD_DTYPE = np.dtype([('day', '<i4'), ('rate', '<f8')])
+
+EPOCH = date(1970, 1, 1)
+
+Signature = Tuple[int, int, int]
+
+
+def day_number(value: str) -> int:
+    """YYYY-MM-DD 转换为天数"""
+    return (datetime.strptime(value, DATE_FORMAT).date() - EPOCH).days
+
+
+def day_to_str(day: int) -> str:
+    """天数转换为 YYYY-MM-DD"""
+    return (EPOCH + timedelta(days=int(day))).strftime(DATE_FORMAT)
+
+
+def file_signature(path: str) -> Optional[Signature]:
+    """文件签名 (大小, 修改时间, inode)，与 RateStorage 的签名一致"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class RateIndex:
+    """
+    内存映射的汇率索引
+    
+    文件头记录了建立索引时源 CSV 的签名，签名不一致说明索引已过期。
+    只读打开时页面按需加载，多个进程通过系统页缓存共享同一份数据。
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.signature: Optional[Signature] = None
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self._loaded = False
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+    
+    def load(self) -> bool:
+        """
+        映射索引文件
+        
+        Returns:
+            bool: 文件存在且格式有效
+        """
+        self.close()
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(HEADER.size)
+            file_size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        
+        if len(header) < HEADER.size:
+            return False
+        magic, version, count, size, mtime_ns, inode = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            logger.warning(f"汇率索引格式不匹配，将重新建立: {self.path}")
+            return False
+        if file_size < HEADER.size + count * RECORD_DTYPE.itemsize:
+            logger.warning(f"汇率索引不完整，将重新建立: {self.path}")
+            return False
+        
+        if count:
+            self._records = np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+        self.signature = (size, mtime_ns, inode)
+        self._loaded = True
+        return True
+    
+    def close(self):
+        """释放内存映射"""
+        self._records = np.empty(0, dtype=RECORD_DTYPE)
+        self.signature = None
+        self._loaded = False
+    
+    def is_current(self, source_path: str) -> bool:
+        """索引是否与源文件一致"""
+        return self._loaded and self.signature == file_signature(source_path)
+    
+    def build(self, items: Iterable[Tuple[str, float]], signature: Signature):
+        """用 (日期, 卖出价) 重建整个索引（写临时文件后原子重命名）"""
+        days = {}
+        for day_str, rate in items:
+            days[day_number(day_str)] = float(rate)
+        
+        records = np.empty(len(days), dtype=RECORD_DTYPE)
+        ordered = sorted(days.items())
+        records['day'] = [day for day, _ in ordered]
+        records['rate'] = [rate for _, rate in ordered]
+        
+        self.close()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or '.', prefix=f"{os.path.basename(self.path)}.", suffix=".tmp"
+        )
+        try:
+            with open(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, len(records), *signature))
+                f.write(records.tobytes())
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.load()
+    
+    def upsert(self, items: List[Tuple[str, float]], signature: Signature) -> bool:
+        """
+        增量更新索引：已有日期原地覆盖，晚于最后日期的追加到末尾
+        
+        先写记录再写文件头，中途失败时文件头中的旧签名会让索引被判定为过期。
+        会原地修改其他实例正在映射的文件，调用方需持有与读取方共用的锁。
+        
+        Returns:
+            bool: 是否完成增量更新；需要在中间插入新日期时返回 False，由调用方重建
+        """
+        if not self._loaded:
+            return False
+        
+        days = self._records['day']
+        last_day = int(days[-1]) if len(days) else None
+        overwrites = {}
+        appends = {}
+        
+        for day_str, rate in items:
+            day = day_number(day_str)
+            position = int(np.searchsorted(days, day))
+            if position < len(days) and days[position] == day:
+                overwrites[position] = float(rate)
+            elif last_day is None or day > last_day:
+                appends[day] = float(rate)
+            else:
+                return False
+        
+        count = len(days) + len(appends)
+        with open(self.path, 'r+b') as f:
+            for position, rate in overwrites.items():
+                f.seek(HEADER.size + position * RECORD_DTYPE.itemsize + RECORD_DTYPE.fields['rate'][1])
+                f.write(struct.pack('<d', rate))
+            if appends:
+                records = np.empty(len(appends), dtype=RECORD_DTYPE)
+                ordered = sorted(appends.items())
+                records['day'] = [day for day, _ in ordered]
+                records['rate'] = [rate for _, rate in ordered]
+                f.seek(HEADER.size + len(days) * RECORD_DTYPE.itemsize)
+                f.write(records.tobytes())
+                f.truncate()
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, count, *signature))
+        
+        self.load()
+        return True
+    
+    def lookup(self, day_str: str) -> Optional[float]:
+        """查询单个日期的卖出价"""
+        days = self._records['day']
+        day = day_number(day_str)
+        position = int(np.searchsorted(days, day))
+        if position < len(days) and days[position] == day:
+            return float(self._records['rate'][position])
+        return None
+    
+    def lookup_range(self, start_date: str, end_date: str) -> List[Tuple[str, float]]:
+        """查询日期范围内的 (日期, 卖出价)，按日期升序"""
+        days = self._records['day']
+        low = int(np.searchsorted(days, day_number(start_date), side='left'))
+        high = int(np.searchsorted(days, day_number(end_date), side='right'))
+        chunk = self._records[low:high]
+        return [(day_to_str(day), float(rate)) for day, rate in zip(chunk['day'], chunk['rate'])]
@@ -0,0 +1,152 @@
+"""
+统计摘要模块
+将记录数、日期范围、各数据源记录数、最后抓取时间和最新汇率保存在一个
+小的 JSON 文件中，随每次写入增量更新，查询统计信息时无需读取整个数据文件
+"""
+
+import os
+import json
+import logging
+import tempfile
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateStats:
+    """
+    统计摘要
+    
+    文件中记录了对应数据文件的签名，签名不一致说明摘要已过期。
+    append_order 表示各日期的最新版本按文件顺序排列时 fetched_at 单调不减，
+    此时最近写入的数据一定位于文件末尾。
+    """
+    
+    FIELDS = ('total_records', 'date_range', 'sources', 'last_fetched_at', 'latest', 'append_order')
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.signature = None
+        self.loaded = False
+        self._reset()
+    
+    def _reset(self):
+        self.total_records = 0
+        self.date_range = None
+        self.sources = {}
+        self.last_fetched_at = None
+        self.latest = None
+        self.append_order = True
+    
+    def load(self) -> bool:
+        """
+        读取摘要文件
+        
+        Returns:
+            bool: 文件存在且格式有效
+        """
+        self.loaded = False
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            for field in self.FIELDS:
+                setattr(self, field, data[field])
+            self.signature = tuple(data['signature']) if data.get('signature') else None
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"统计摘要文件损坏，将重新建立: {e}")
+            self._reset()
+            return False
+        
+        self.loaded = True
+        return True
+    
+    def save(self, signature):
+        """
+        保存摘要文件
+        
+        写临时文件后原子重命名，其他实例读取时不会读到写了一半的文件。
+        """
+        self.signature = signature
+        data = self.summary()
+        data['signature'] = list(signature) if signature else None
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(self.path) or '.', prefix=f"{os.path.basename(self.path)}.", suffix=".tmp"
+            )
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.loaded = True
+        except OSError as e:
+            logger.warning(f"保存统计摘要失败: {e}")
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def is_current(self, signature) -> bool:
+        """摘要是否与数据文件一致"""
+        return self.loaded and signature is not None and self.signature == signature
+    
+    def summary(self) -> dict:
+        """摘要内容（不含签名）"""
+        return {field: getattr(self, field) for field in self.FIELDS}
+    
+    def rebuild(self, rows: Iterable[List[str]]):
+        """从全部数据行 (date, rate_sell, source, fetched_at) 按文件顺序重新计算"""
+        self._reset()
+        for row in rows:
+            self.apply(None, row)
+    
+    def apply(self, old_row: Optional[List[str]], new_row: List[str]):
+        """
+        增量更新一条追加到文件末尾的写入
+        
+        Args:
+            old_row: 被覆盖的旧数据行，新增日期时为 None
+            new_row: 新数据行
+        """
+        date, rate_sell, source, fetched_at = new_row[:4]
+        
+        if old_row is None:
+            self.total_records += 1
+        else:
+            old_source = old_row[2]
+            self.sources[old_source] -= 1
+            if self.sources[old_source] <= 0:
+                del self.sources[old_source]
+        self.sources[source] = self.sources.get(source, 0) + 1
+        
+        if self.date_range is None:
+            self.date_range = {'start': date, 'end': date}
+        else:
+            self.date_range = {
+                'start': min(self.date_range['start'], date),
+                'end': max(self.date_range['end'], date)
+            }
+        
+        if self.latest is None or date >= self.latest['date']:
+            self.latest = {'date': date, 'rate_sell': float(rate_sell), 'source': source}
+        if self.last_fetched_at is not None and fetched_at < self.last_fetched_at:
+            self.append_order = False
+        if self.last_fetched_at is None or fetched_at > self.last_fetched_at:
+            self.last_fetched_at = fetched_at
+    
+    def as_stats(self) -> dict:
+        """转换为 get_stats 的返回格式，数据源按记录数降序"""
+        if self.total_records == 0:
+            return {
+                'total_records': 0,
+                'date_range': None,
+                'sources': {}
+            }
+        
+        return {
+            'total_records': self.total_records,
+            'date_range': dict(self.date_range),
+            'sources': dict(sorted(self.sources.items(), key=lambda item: item[1], reverse=True)),
+            'last_fetched_at': self.last_fetched_at,
+            'latest': dict(self.latest)
+        }
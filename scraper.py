@@ -4,67 +4,216 @@
 """
 
 import re
-import time
+import codecs
 import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import requests
-from bs4 import BeautifulSoup
-from dateutil import parser
 
 from constants import (
     VALORHOY_URL, HISTORICO_URL, DOLLAR_USA_TEXT, VENTA_TEXT, FECHA_TEXT,
-    SOURCE_VALORHOY, SOURCE_HISTORICO, REQUEST_TIMEOUT, MAX_RETRIES,
-    RETRY_DELAY_BASE, USER_AGENT, ARGENTINA_DATE_FORMAT
+    SOURCE_VALORHOY, SOURCE_HISTORICO, REQUEST_TIMEOUT, ARGENTINA_DATE_FORMAT,
+    BACKFILL_CONCURRENCY, BACKFILL_RATE, VALORHOY_CACHE_TTL, HISTORICO_CACHE_TTL,
+    HISTORICO_PAST_CACHE_TTL, HISTORICO_RECENT_DAYS, STREAM_CHUNK_SIZE, ERROR_BODY_PREVIEW,
+    OUTCOME_OK, OUTCOME_MISSING, OUTCOME_FAILED, RETRY_STATUS_CODES
 )
+from business_calendar import BusinessCalendar
+from http_cache import HttpCache
+from http_transport import create_session, ensure_pool_size
+from flow_control import AdaptiveController, CircuitOpenError, RateLimiter
+from extractors import BaseExtractor, FastExtractor, SoupExtractor, StreamScanner
 
 logger = logging.getLogger(__name__)
 
+# 回补时每个日期完成后的回调: (date, status, result)
+OutcomeCallback = Callable[[str, str, Optional[Tuple[str, float, str]]], None]
+
 
 class BaseScraper:
     """抓取器基类"""
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': USER_AGENT,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'es-AR,es;q=0.8,en-US;q=0.5,en;q=0.3',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        })
+    def __init__(self, cache: Optional[HttpCache] = None,
+                 extractor: Optional[BaseExtractor] = None,
+                 session: Optional[requests.Session] = None,
+                 controller: Optional[AdaptiveController] = None):
+        """
+        Args:
+            cache: HTTP 缓存
+            extractor: 页面提取器
+            session: 共享的 HTTP 会话（连接池和重试策略），默认单独创建一个
+            controller: 该数据源的自适应流量控制和熔断器，None 表示不限制
+        """
+        self.cache = cache
+        self.controller = controller
+        # 默认使用快速提取器，失败时退回 BeautifulSoup 完整解析
+        self.extractor = extractor or FastExtractor()
+        self.fallback_extractor = SoupExtractor()
+        self.session = session or create_session()
     
-    def _make_request(self, url: str, params: Optional[dict] = None) -> Optional[requests.Response]:
-        """发送HTTP请求，支持重试和指数退避"""
-        for attempt in range(MAX_RETRIES):
-            try:
-                response = self.session.get(
-                    url, 
-                    params=params, 
-                    timeout=REQUEST_TIMEOUT
-                )
+    def _make_request(self, url: str, params: Optional[dict] = None,
+                      cache_ttl: float = 0, stream: bool = False,
+                      store: bool = True) -> Optional[requests.Response]:
+        """
+        发送HTTP请求
+        
+        重试由会话的传输层处理（见 http_transport），这里只发送一次。
+        配置了缓存时，有效期内直接返回缓存内容；过期后带
+        If-None-Match/If-Modified-Since 发送条件请求，304 时复用缓存。
+        
+        Args:
+            url: 请求地址
+            params: 查询参数
+            cache_ttl: 缓存有效期（秒），0 表示每次都重新验证
+            stream: 是否以流式方式返回响应（响应体未读取，不写入缓存）
+            store: 200 响应是否立即写入缓存；为 False 时由调用方确认内容有效后
+                调用 _store_response，避免把错误页或空页面长期缓存
+        """
+        cache_key = None
+        cached = None
+        request_headers = {}
+        
+        if self.cache is not None:
+            cache_key = self.cache.make_key(url, params)
+            cached = self.cache.get(cache_key)
+            if cached:
+                if self.cache.is_fresh(cached, cache_ttl):
+                    response = self.cache.build_response(cached, cache_key)
+                    if response is not None:
+                        logger.debug(f"命中 HTTP 缓存: {url} {params or ''}")
+                        return response
+                request_headers = self.cache.conditional_headers(cached)
+        
+        try:
+            response = self._send(url, params, request_headers, stream)
                 
-                if response.status_code == 200:
-                    return response
-                elif response.status_code >= 500:
-                    logger.warning(f"服务器错误 {response.status_code}，尝试重试 {attempt + 1}/{MAX_RETRIES}")
-                else:
-                    logger.error(f"HTTP错误 {response.status_code}: {response.text}")
-                    return None
+            if response.status_code == 304 and cached:
+                response.close()
+                cached_response = self.cache.build_response(cached, cache_key)
+                if cached_response is not None:
+                    logger.debug(f"内容未变化 (304)，使用缓存: {url} {params or ''}")
+                    self.cache.refresh(cache_key)
+                    return cached_response
+                # 缓存内容已被淘汰，去掉条件头重新请求
+                response = self._send(url, params, {}, stream)
+        except CircuitOpenError as e:
+            logger.warning(f"{e}，跳过请求: {url} {params or ''}")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"请求失败: {e}")
+            return None
+                
+        if response.status_code == 200:
+            if store and not stream:
+                self._store_response(url, params, response)
+            return response
                     
-            except requests.exceptions.Timeout:
-                logger.warning(f"请求超时，尝试重试 {attempt + 1}/{MAX_RETRIES}")
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"请求异常: {e}，尝试重试 {attempt + 1}/{MAX_RETRIES}")
+        # 只记录响应体的开头，随后关闭响应，流式请求的连接归还连接池
+        logger.error(f"HTTP错误 {response.status_code}: {self._body_preview(response, stream)}")
+        response.close()
+        return None
+    
+    @staticmethod
+    def _body_preview(response: requests.Response, stream: bool) -> str:
+        """错误响应体的开头部分，流式响应只读取这么多，不下载整个响应体"""
+        if not stream:
+            return response.text[:ERROR_BODY_PREVIEW]
+        try:
+            head = next(response.iter_content(chunk_size=ERROR_BODY_PREVIEW), b'')
+        except requests.exceptions.RequestException:
+            return ''
+        return head[:ERROR_BODY_PREVIEW].decode('utf-8', errors='replace')
+    
+    def _store_response(self, url: str, params: Optional[dict], response: requests.Response):
+        """把网络响应写入缓存，来自缓存的响应不重复写入"""
+        if self.cache is None or getattr(response, 'from_cache', False) is True:
+            return
+        self.cache.store(self.cache.make_key(url, params), url, response)
+    
+    def _discard_cached(self, url: str, params: Optional[dict]):
+        """删除缓存条目"""
+        if self.cache is not None:
+            self.cache.discard(self.cache.make_key(url, params))
             
-            # 指数退避
-            if attempt < MAX_RETRIES - 1:
-                delay = RETRY_DELAY_BASE ** attempt
-                logger.info(f"等待 {delay} 秒后重试...")
-                time.sleep(delay)
+    def _send(self, url: str, params: Optional[dict], headers: dict, stream: bool) -> requests.Response:
+        """发送一次请求；配置了流量控制时先等待名额，并把耗时和结果反馈给控制器"""
+        if self.controller is None:
+            return self.session.get(
+                url, 
+                params=params, 
+                timeout=REQUEST_TIMEOUT,
+                headers=headers or None,
+                stream=stream
+            )
         
-        logger.error(f"请求失败，已重试 {MAX_RETRIES} 次")
-        return None
+        started = self.controller.acquire()
+        failed = True
+        try:
+            response = self.session.get(
+                url, 
+                params=params, 
+                timeout=REQUEST_TIMEOUT,
+                headers=headers or None,
+                stream=stream
+            )
+            failed = response.status_code in RETRY_STATUS_CODES
+            return response
+        finally:
+            self.controller.release(started, failed)
+    
+    def _read_streaming(self, response: requests.Response,
+                        parse_page: Callable[[str, BaseExtractor], Any],
+                        marker: str) -> Tuple[str, Any]:
+        """
+        逐块读取响应体，目标数据解析成功后立即关闭连接
+        
+        Args:
+            response: 以 stream=True 发出的响应
+            parse_page: 解析函数 (html, extractor) -> 结果
+            marker: 目标行的单元格文本
+            
+        Returns:
+            Tuple[已读取的文本, 解析结果]，读完整个响应仍未解析成功时结果为 None
+        """
+        scanner = StreamScanner(marker)
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        
+        try:
+            for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                if scanner.feed(decoder.decode(chunk)):
+                    result = parse_page(scanner.text, self.extractor)
+                    if result:
+                        logger.debug(f"已解析到目标数据，提前结束读取（已读取 {len(scanner.text)} 字符）")
+                        return scanner.text, result
+            scanner.feed(decoder.decode(b'', final=True))
+        finally:
+            response.close()
+        
+        return scanner.text, None
+    
+    def _decode(self, content) -> str:
+        """将响应内容解码为文本"""
+        if isinstance(content, bytes):
+            return content.decode('utf-8', errors='replace')
+        return content
+    
+    def _extract(self, parse_page: Callable[[str, BaseExtractor], Any], content) -> Any:
+        """
+        使用提取器解析页面，快速提取失败时退回 BeautifulSoup
+        
+        Args:
+            parse_page: 解析函数 (html, extractor) -> 结果，结果为空表示失败
+            content: 响应内容
+        """
+        html = self._decode(content)
+        result = parse_page(html, self.extractor)
+        
+        if not result and type(self.extractor) is not type(self.fallback_extractor):
+            logger.debug(f"{self.extractor.name} 提取失败，改用 {self.fallback_extractor.name} 解析")
+            result = parse_page(html, self.fallback_extractor)
+        
+        return result
     
     def _parse_rate_value(self, rate_text: str) -> Optional[float]:
         """解析汇率值，兼容不同格式"""
@@ -97,6 +246,22 @@ class BaseScraper:
 class ValorHoySource(BaseScraper):
     """ValorHoy 数据源抓取器"""
     
+    def __init__(self, cache: Optional[HttpCache] = None,
+                 extractor: Optional[BaseExtractor] = None,
+                 streaming: bool = False,
+                 session: Optional[requests.Session] = None,
+                 controller: Optional[AdaptiveController] = None):
+        """
+        Args:
+            cache: HTTP 缓存
+            extractor: 页面提取器
+            streaming: 是否流式读取，找到日期和美元行后立即关闭连接
+            session: 共享的 HTTP 会话
+            controller: 自适应流量控制和熔断器
+        """
+        super().__init__(cache=cache, extractor=extractor, session=session, controller=controller)
+        self.streaming = streaming
+    
     def scrape(self) -> Optional[Tuple[str, float, str]]:
         """
         抓取 ValorHoy 页面数据
@@ -106,65 +271,59 @@ class ValorHoySource(BaseScraper):
         """
         logger.info("开始抓取 ValorHoy 数据源...")
         
-        response = self._make_request(VALORHOY_URL)
+        response = self._make_request(VALORHOY_URL, cache_ttl=VALORHOY_CACHE_TTL, stream=self.streaming)
         if not response:
             logger.error("ValorHoy 请求失败")
             return None
         
         try:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 查找日期 - 新的模式匹配
-            date_element = soup.find(string=re.compile(r"Fecha:\s*\d{1,2}/\d{1,2}/\d{4}"))
-            if not date_element:
-                logger.error("未找到日期信息")
-                return None
-            
-            # 提取日期 - 支持单数字日期/月份
-            date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', date_element)
-            if not date_match:
-                logger.error("日期格式解析失败")
-                return None
-            
-            argentina_date = date_match.group(1)
-            # 转换为标准格式
-            date_obj = datetime.strptime(argentina_date, "%d/%m/%Y")
-            date = date_obj.strftime("%Y-%m-%d")
-            
-            # 查找表格中的美元行
-            tables = soup.find_all('table')
-            rate_sell = None
-            
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    cell_texts = [cell.get_text().strip() for cell in cells]
-                    
-                    # 检查是否包含美元行
-                    if len(cell_texts) >= 3 and DOLLAR_USA_TEXT in cell_texts:
-                        # 找到美元行，获取卖出价（第三列，索引2）
-                        try:
-                            rate_text = cell_texts[2]  # Venta 列
-                            rate_sell = self._parse_rate_value(rate_text)
-                            break
-                        except (IndexError, ValueError) as e:
-                            logger.warning(f"解析美元行失败: {e}")
-                            continue
-                
-                if rate_sell is not None:
-                    break
+            if self.streaming:
+                html, result = self._read_streaming(response, self._parse_page, DOLLAR_USA_TEXT)
+                if not result:
+                    # 已读完整个页面，按常规流程解析（含 BeautifulSoup 回退）
+                    result = self._extract(self._parse_page, html)
+            else:
+                result = self._extract(self._parse_page, response.content)
             
-            if rate_sell is None:
-                logger.error("未找到卖出价")
+            if not result:
+                logger.error("未找到日期信息或卖出价")
                 return None
             
+            date, rate_sell = result
             logger.info(f"ValorHoy 抓取成功: {date} = {rate_sell}")
             return date, rate_sell, SOURCE_VALORHOY
             
         except Exception as e:
             logger.error(f"ValorHoy 解析失败: {e}")
             return None
+    
+    def _parse_page(self, html: str, extractor: BaseExtractor) -> Optional[Tuple[str, float]]:
+        """
+        解析页面中的日期和美元卖出价
+        
+        Returns:
+            Tuple[date, rate_sell] 或 None
+        """
+        # 查找日期 - 支持单数字日期/月份
+        date_text = extractor.find_date_text(html)
+        date_match = re.search(r'(\d{1,2}/\d{1,2}/\d{4})', date_text or '')
+        if not date_match:
+            logger.debug(f"{extractor.name}: 未找到日期信息")
+            return None
+        
+        # 转换为标准格式
+        date_obj = datetime.strptime(date_match.group(1), "%d/%m/%Y")
+        date = date_obj.strftime("%Y-%m-%d")
+        
+        # 查找美元行，获取卖出价（第三列，索引2）
+        for cell_texts in extractor.find_rows(html, DOLLAR_USA_TEXT):
+            if len(cell_texts) >= 3:
+                rate_sell = self._parse_rate_value(cell_texts[2])  # Venta 列
+                if rate_sell is not None:
+                    return date, rate_sell
+        
+        logger.debug(f"{extractor.name}: 未找到卖出价")
+        return None
 
 
 class HistoricoSource(BaseScraper):
@@ -180,6 +339,31 @@ class HistoricoSource(BaseScraper):
         Returns:
             Tuple[date, rate_sell, source] 或 None
         """
+        rows = self.scrape_rows(target_date)
+        if rows is None:
+            return None
+        
+        rate_sell = rows.get(target_date)
+        if rate_sell is None:
+            logger.error(f"未找到目标日期 {target_date} 的数据行")
+            return None
+        
+        logger.info(f"Historico 抓取成功: {target_date} = {rate_sell}")
+        return target_date, rate_sell, SOURCE_HISTORICO
+    
+    def scrape_rows(self, target_date: str) -> Optional[Dict[str, float]]:
+        """
+        抓取 Historico 页面中的所有美元行
+        
+        一次查询返回的页面通常包含多个日期的报价，全部解析出来
+        供回补复用，避免为页面中已有的日期重复发送请求。
+        
+        Args:
+            target_date: 查询日期 (YYYY-MM-DD)
+            
+        Returns:
+            Dict[date, rate_sell]: 页面中所有日期的卖出价，请求或解析失败时为 None
+        """
         logger.info(f"开始抓取 Historico 数据源，目标日期: {target_date}")
         
         # 转换为阿根廷日期格式
@@ -196,77 +380,130 @@ class HistoricoSource(BaseScraper):
             'id': 'monedas'
         }
         
-        response = self._make_request(HISTORICO_URL, params)
+        # 较早日期的页面不会再变化，可以一直使用缓存；最近几天的报价可能还没有发布
+        recent_start = datetime.now().date() - timedelta(days=HISTORICO_RECENT_DAYS)
+        if date_obj.date() < recent_start:
+            cache_ttl = HISTORICO_PAST_CACHE_TTL
+        else:
+            cache_ttl = HISTORICO_CACHE_TTL
+        
+        response = self._make_request(HISTORICO_URL, params, cache_ttl=cache_ttl, store=False)
         if not response:
             logger.error("Historico 请求失败")
             return None
         
         try:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 查找表格
-            tables = soup.find_all('table')
-            rate_sell = None
+            rows = self._extract(self._parse_rows, response.content) or {}
+        except Exception as e:
+            logger.error(f"Historico 解析失败: {e}")
+            rows = None
+        
+        # 只缓存解析出报价的页面：空页面或错误页可能是暂时的，缓存后会被一直复用
+        if rows:
+            self._store_response(HISTORICO_URL, params, response)
+        else:
+            self._discard_cached(HISTORICO_URL, params)
+        
+        if rows is not None:
+            logger.debug(f"Historico 页面 {target_date} 包含 {len(rows)} 个日期")
+        return rows
+    
+    def _parse_rows(self, html: str, extractor: BaseExtractor) -> Dict[str, float]:
+        """解析页面中所有美元行，返回 {日期: 卖出价}"""
+        rows = {}
+        
+        for cell_texts in extractor.find_rows(html, DOLLAR_USA_TEXT):
+            # 美元行：卖出价在第3列（索引2），日期在第4列（索引3）
+            if len(cell_texts) < 4:
+                continue
             
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all(['td', 'th'])
-                    cell_texts = [cell.get_text().strip() for cell in cells]
-                    
-                    # 检查是否是美元行且包含目标日期
-                    if len(cell_texts) >= 4 and DOLLAR_USA_TEXT in cell_texts:
-                        # 检查日期列（第4列，索引3）
-                        date_cell = cell_texts[3]
-                        
-                        # 匹配目标日期（支持不同格式）
-                        # 生成所有可能的日期格式
-                        day = date_obj.day
-                        month = date_obj.month
-                        year = date_obj.year
-                        
-                        possible_formats = [
-                            f"{day:02d}/{month:02d}/{year}",  # 19/08/2024
-                            f"{day}/{month}/{year}",          # 19/8/2024
-                            f"{day:02d}/{month}/{year}",      # 19/8/2024
-                            f"{day}/{month:02d}/{year}",      # 19/08/2024
-                            target_date,                      # 2024-08-19
-                            argentina_date                    # 原始输入格式
-                        ]
-                        
-                        date_match = False
-                        for date_format in possible_formats:
-                            if date_format in date_cell:
-                                date_match = True
-                                break
-                        
-                        if date_match:
-                            
-                            try:
-                                # 获取卖出价（第3列，索引2）
-                                rate_text = cell_texts[2]  # Venta 列
-                                rate_sell = self._parse_rate_value(rate_text)
-                                if rate_sell is not None:
-                                    logger.info(f"Historico 抓取成功: {target_date} = {rate_sell}")
-                                    return target_date, rate_sell, SOURCE_HISTORICO
-                            except (IndexError, ValueError) as e:
-                                logger.warning(f"解析历史数据行失败: {e}")
-                                continue
+            row_date = self._parse_row_date(cell_texts[3])
+            if row_date is None:
+                continue
             
-            logger.error(f"未找到目标日期 {target_date} 的数据行")
-            return None
+            rate_sell = self._parse_rate_value(cell_texts[2])
+            if rate_sell is not None:
+                # 同一日期出现多次时以第一行为准
+                rows.setdefault(row_date, rate_sell)
+        
+        return rows
+    
+    def _parse_row_date(self, date_text: str) -> Optional[str]:
+        """解析数据行中的日期，支持 19/8/2024 和 2024-08-19 两种格式"""
+        try:
+            match = re.search(r'(\d{1,2})/(\d{1,2})/(\d{4})', date_text)
+            if match:
+                day, month, year = (int(part) for part in match.groups())
+                return datetime(year, month, day).strftime("%Y-%m-%d")
             
-        except Exception as e:
-            logger.error(f"Historico 解析失败: {e}")
-            return None
+            match = re.search(r'\d{4}-\d{2}-\d{2}', date_text)
+            if match:
+                return datetime.strptime(match.group(0), "%Y-%m-%d").strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+        return None
+
+
+class HarvestLookup:
+    """
+    单次回补运行内的 Historico 结果查找表
+    
+    记录已抓取页面中出现的所有日期及其覆盖区间，线程安全。
+    """
+    
+    def __init__(self):
+        self._rates: Dict[str, float] = {}
+        self._spans: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+    
+    def add_rows(self, rows: Dict[str, float]):
+        """记录一个页面解析出的所有数据行"""
+        if not rows:
+            return
+        with self._lock:
+            for date_str, rate_sell in rows.items():
+                self._rates.setdefault(date_str, rate_sell)
+            self._spans.append((min(rows), max(rows)))
+    
+    def covers(self, date_str: str) -> bool:
+        """日期是否已被某个页面覆盖（在页面日期区间内）"""
+        with self._lock:
+            if date_str in self._rates:
+                return True
+            return any(start <= date_str <= end for start, end in self._spans)
+    
+    def get(self, date_str: str) -> Optional[float]:
+        """获取已收集的卖出价，页面中没有该日期时返回 None"""
+        with self._lock:
+            return self._rates.get(date_str)
 
 
 class ScraperManager:
     """抓取器管理器"""
     
-    def __init__(self):
-        self.valorhoy_source = ValorHoySource()
-        self.historico_source = HistoricoSource()
+    def __init__(self, calendar: Optional[BusinessCalendar] = None,
+                 cache: Optional[HttpCache] = None,
+                 streaming: bool = False,
+                 pool_size: int = BACKFILL_CONCURRENCY,
+                 max_rate: float = BACKFILL_RATE):
+        """
+        Args:
+            pool_size: 共享连接池的大小，也是每个数据源的初始并发数上限；
+                iter_dates 按调用参数重新设置上限，需要时扩大连接池
+            max_rate: 每个数据源的初始请求速率上限（次/秒），<= 0 表示不限速
+        """
+        # 所有数据源共用一个会话，连接池和重试策略只有一份；
+        # 并发数、速率和熔断按数据源分别控制，一个数据源出问题不影响另一个
+        self.session = create_session(pool_size)
+        self.valorhoy_source = ValorHoySource(
+            cache=cache, streaming=streaming, session=self.session,
+            controller=AdaptiveController(SOURCE_VALORHOY, pool_size, max_rate)
+        )
+        self.historico_source = HistoricoSource(
+            cache=cache, session=self.session,
+            controller=AdaptiveController(SOURCE_HISTORICO, pool_size, max_rate)
+        )
+        self.calendar = calendar or BusinessCalendar()
     
     def scrape_yesterday(self, fallback: bool = False) -> Optional[Tuple[str, float, str]]:
         """
@@ -298,42 +535,159 @@ class ScraperManager:
         logger.error("所有数据源都失败了")
         return None
     
-    def scrape_date_range(self, start_date: str, end_date: str) -> list:
+    def plan_dates(self, start_date: str, end_date: str, business_days_only: bool = True) -> List[str]:
+        """
+        生成日期范围内需要抓取的日期列表
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            business_days_only: 是否跳过周末和银行节假日
+            
+        Returns:
+            List[str]: 日期列表 (YYYY-MM-DD)，按日期升序
+        """
+        return self.calendar.dates(start_date, end_date, business_days_only)
+    
+    def scrape_date_range(self, start_date: str, end_date: str,
+                          concurrency: int = BACKFILL_CONCURRENCY,
+                          rate: float = BACKFILL_RATE,
+                          business_days_only: bool = True) -> list:
         """
         抓取指定日期范围的数据
         
         Args:
             start_date: 开始日期 (YYYY-MM-DD)
             end_date: 结束日期 (YYYY-MM-DD)
+            concurrency: 并发抓取的线程数
+            rate: 所有线程共享的请求速率上限（次/秒）
+            business_days_only: 是否跳过周末和银行节假日
             
         Returns:
-            list: 成功抓取的数据列表
+            list: 成功抓取的数据列表，按日期升序排列
         """
-        logger.info(f"开始抓取日期范围: {start_date} 到 {end_date}")
+        return sorted(self.iter_date_range(
+            start_date, end_date,
+            concurrency=concurrency,
+            rate=rate,
+            business_days_only=business_days_only
+        ))
+    
+    def iter_date_range(self, start_date: str, end_date: str,
+                        concurrency: int = BACKFILL_CONCURRENCY,
+                        rate: float = BACKFILL_RATE,
+                        business_days_only: bool = True,
+                        on_outcome: Optional[OutcomeCallback] = None) -> Iterator[Tuple[str, float, str]]:
+        """抓取指定日期范围的数据，逐条产出结果，参数同 scrape_date_range 和 iter_dates"""
+        logger.info(f"开始抓取日期范围: {start_date} 到 {end_date} (并发 {concurrency}, 限速 {rate}/秒)")
         
-        start_obj = datetime.strptime(start_date, "%Y-%m-%d")
-        end_obj = datetime.strptime(end_date, "%Y-%m-%d")
+        dates = self.plan_dates(start_date, end_date, business_days_only)
+        if business_days_only:
+            logger.info(f"已跳过非营业日，实际需要抓取 {len(dates)} 天")
         
-        results = []
-        current_date = start_obj
+        return self.iter_dates(dates, concurrency=concurrency, rate=rate, on_outcome=on_outcome)
+    
+    def scrape_dates(self, dates: List[str],
+                     concurrency: int = BACKFILL_CONCURRENCY,
+                     rate: float = BACKFILL_RATE,
+                     on_outcome: Optional[OutcomeCallback] = None) -> list:
+        """
+        抓取指定的日期列表
         
-        while current_date <= end_obj:
-            current_date_str = current_date.strftime("%Y-%m-%d")
-            
+        Args:
+            dates: 日期列表 (YYYY-MM-DD)，按日期升序
+            concurrency: 并发抓取的线程数
+            rate: 所有线程共享的请求速率上限（次/秒）
+            on_outcome: 见 iter_dates
+        
+        Returns:
+            list: 成功抓取的数据列表，按日期升序排列
+        """
+        return sorted(self.iter_dates(dates, concurrency=concurrency, rate=rate, on_outcome=on_outcome))
+    
+    def iter_dates(self, dates: List[str],
+                   concurrency: int = BACKFILL_CONCURRENCY,
+                   rate: float = BACKFILL_RATE,
+                   on_outcome: Optional[OutcomeCallback] = None) -> Iterator[Tuple[str, float, str]]:
+        """
+        抓取指定的日期列表，每个日期完成后立即产出 (date, rate_sell, source)
+        
+        结果按完成顺序产出（大致从最新日期到最早日期），同时提交给线程池的日期
+        最多为并发数的两倍，抓取结果不会在内存中累积。提前关闭生成器或调用方被
+        中断 (Ctrl-C) 时，尚未开始的日期会被取消。concurrency 和 rate 作为 Historico
+        数据源自适应控制器的上限，服务端变慢或出错时实际并发数和速率会低于上限，
+        熔断期间的日期直接记为失败。
+        
+        Args:
+            dates: 日期列表 (YYYY-MM-DD)，按日期升序
+            concurrency: 并发抓取的线程数上限
+            rate: 所有线程共享的请求速率上限（次/秒），<= 0 表示不限速
+            on_outcome: 每个日期完成时调用 on_outcome(date, status, result)，
+                status 为 ok / missing / failed；在消费生成器的线程中调用，
+                可用于记录检查点和更新进度
+        """
+        workers = max(1, concurrency)
+        ensure_pool_size(self.session, workers)
+        controller = self.historico_source.controller
+        if controller is not None:
+            # 控制器按本次的参数设置上限，并负责所有线程共享的限速
+            controller.configure(workers, rate)
+            limiter = RateLimiter(0)
+        else:
+            limiter = RateLimiter(rate)
+        lookup = HarvestLookup()
+        
+        def fetch_one(date_str: str) -> Tuple[str, Optional[Tuple[str, float, str]]]:
             try:
-                result = self.historico_source.scrape(current_date_str)
-                if result:
-                    results.append(result)
-                    logger.info(f"成功抓取 {current_date_str}: {result[1]}")
-                else:
-                    logger.warning(f"抓取 {current_date_str} 失败")
+                # 已被之前页面覆盖的日期直接查表，不再发送请求
+                if not lookup.covers(date_str):
+                    limiter.acquire()
+                    rows = self.historico_source.scrape_rows(date_str)
+                    if rows is None:
+                        logger.warning(f"抓取 {date_str} 失败")
+                        return OUTCOME_FAILED, None
+                    lookup.add_rows(rows)
+                
+                rate_sell = lookup.get(date_str)
+                if rate_sell is not None:
+                    logger.info(f"成功抓取 {date_str}: {rate_sell}")
+                    return OUTCOME_OK, (date_str, rate_sell, SOURCE_HISTORICO)
+                
+                logger.warning(f"页面中没有 {date_str} 的报价")
+                return OUTCOME_MISSING, None
             except Exception as e:
-                logger.error(f"抓取 {current_date_str} 时发生异常: {e}")
-            
-            current_date += timedelta(days=1)
+                logger.error(f"抓取 {date_str} 时发生异常: {e}")
+                return OUTCOME_FAILED, None
+        
+        # 从最新日期往前抓取：页面通常还会列出查询日期之前几天的报价，
+        # 倒序处理时后续日期更容易命中查找表
+        queued = reversed(dates)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        in_flight = {}
+        succeeded = 0
+        
+        def submit_next():
+            date_str = next(queued, None)
+            if date_str is not None:
+                in_flight[executor.submit(fetch_one, date_str)] = date_str
+        
+        try:
+            for _ in range(workers * 2):
+                submit_next()
             
-            # 避免请求过于频繁
-            time.sleep(0.5)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=in_flight.get, reverse=True):
+                    date_str = in_flight.pop(future)
+                    submit_next()
+                    
+                    status, result = future.result()
+                    if on_outcome:
+                        on_outcome(date_str, status, result)
+                    if result:
+                        succeeded += 1
+                        yield result
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        logger.info(f"日期范围抓取完成，成功 {len(results)} 条")
-        return results
+        logger.info(f"抓取完成，成功 {succeeded}/{len(dates)} 条")
@@ -0,0 +1,209 @@
+"""
+SQLite 存储模块
+使用 WAL 模式，日期为主键，支持 UI 和定时任务同时读写
+"""
+
+import os
+import sqlite3
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from constants import RATES_DB
+from storage import BaseRateStorage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rates (
+    date TEXT PRIMARY KEY,
+    rate_sell REAL NOT NULL,
+    source TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rates_source ON rates(source);
+CREATE INDEX IF NOT EXISTS idx_rates_fetched_at ON rates(fetched_at);
+"""
+
+UPSERT_SQL = """
+INSERT INTO rates (date, rate_sell, source, fetched_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(date) DO UPDATE SET
+    rate_sell = excluded.rate_sell,
+    source = excluded.source,
+    fetched_at = excluded.fetched_at
+"""
+
+# SQLite 单条语句的参数上限较低，IN 查询分批执行
+QUERY_CHUNK_SIZE = 500
+
+
+class SqliteRateStorage(BaseRateStorage):
+    """SQLite 汇率数据存储"""
+    
+    def __init__(self, db_path: str = RATES_DB):
+        self.db_path = db_path
+        
+        data_dir = os.path.dirname(db_path)
+        if data_dir and not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+            logger.info(f"创建数据目录: {data_dir}")
+        
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+    
+    @contextmanager
+    def _connect(self):
+        """打开连接，正常结束时提交事务；每次操作使用独立连接，可跨线程和进程使用"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    
+    def version(self) -> Optional[tuple]:
+        """数据版本标记：数据库文件和 WAL 文件的 (大小, 修改时间)"""
+        signature = []
+        for path in (self.db_path, f"{self.db_path}-wal"):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        return tuple(signature) or None
+    
+    def add_rates(self, records: Iterable[Tuple[str, float, str]]) -> List[dict]:
+        """
+        批量添加汇率数据，在一个事务中完成
+        
+        Returns:
+            List[dict]: 与输入顺序一致的逐条结果，status 含义同 RateStorage.add_rates
+        """
+        records = list(records)
+        outcomes, latest = self._plan_batch(records)
+        
+        if not latest:
+            return outcomes
+        
+        fetched_at = datetime.now().isoformat()
+        rows = [
+            (date, float(records[position][1]), records[position][2], fetched_at)
+            for date, position in latest.items()
+        ]
+        
+        try:
+            with self._connect() as conn:
+                existing = self._existing_dates(conn, list(latest))
+                conn.executemany(UPSERT_SQL, rows)
+        except sqlite3.Error as e:
+            logger.error(f"批量写入 SQLite 失败: {e}")
+            for position in latest.values():
+                outcomes[position].update(status='failed', reason=str(e))
+            return outcomes
+        
+        for date, position in latest.items():
+            outcomes[position]['status'] = 'updated' if date in existing else 'added'
+        
+        logger.info(f"批量写入完成: 新增 {len(latest) - len(existing)} 条，更新 {len(existing)} 条，共 {len(records)} 条输入")
+        return outcomes
+    
+    def _existing_dates(self, conn: sqlite3.Connection, dates: List[str]) -> set:
+        """查询已存在的日期"""
+        existing = set()
+        for start in range(0, len(dates), QUERY_CHUNK_SIZE):
+            chunk = dates[start:start + QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(f"SELECT date FROM rates WHERE date IN ({placeholders})", chunk)
+            existing.update(row['date'] for row in cursor)
+        return existing
+    
+    def get_recent_rates(self, limit: int = 10) -> List[dict]:
+        """获取最近写入的汇率数据（fetched_at 索引），fetched_at 与 CSV 后端一样转换为 datetime"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "SELECT * FROM rates ORDER BY fetched_at DESC LIMIT ?", (limit,)
+                )
+                records = [dict(row) for row in cursor]
+            for record in records:
+                record['fetched_at'] = datetime.fromisoformat(record['fetched_at'])
+            return records
+        except sqlite3.Error as e:
+            logger.error(f"读取最近汇率数据失败: {e}")
+            return []
+    
+    def get_latest_rate(self) -> Optional[dict]:
+        """获取日期最新的一条数据（主键倒序取第一条）"""
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT date, rate_sell, source FROM rates ORDER BY date DESC LIMIT 1"
+                ).fetchone()
+                return dict(row) if row else None
+        except sqlite3.Error as e:
+            logger.error(f"读取最新汇率失败: {e}")
+            return None
+    
+    def get_all_rates(self) -> List[dict]:
+        """获取所有汇率数据，最新日期在前"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute("SELECT * FROM rates ORDER BY date DESC")
+                return [dict(row) for row in cursor]
+        except sqlite3.Error as e:
+            logger.error(f"读取所有汇率数据失败: {e}")
+            return []
+    
+    def get_date_range(self, start_date: str, end_date: str) -> List[dict]:
+        """获取指定日期范围内的汇率数据（主键范围查询）"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.execute(
+                    "SELECT * FROM rates WHERE date BETWEEN ? AND ? ORDER BY date",
+                    (start_date, end_date)
+                )
+                return [dict(row) for row in cursor]
+        except sqlite3.Error as e:
+            logger.error(f"读取日期范围数据失败: {e}")
+            return []
+    
+    def get_stats(self) -> dict:
+        """获取存储统计信息"""
+        try:
+            with self._connect() as conn:
+                total, start, end = conn.execute(
+                    "SELECT COUNT(*), MIN(date), MAX(date) FROM rates"
+                ).fetchone()
+                if total == 0:
+                    return {
+                        'total_records': 0,
+                        'date_range': None,
+                        'sources': {}
+                    }
+                
+                cursor = conn.execute(
+                    "SELECT source, COUNT(*) AS count FROM rates GROUP BY source ORDER BY count DESC"
+                )
+                return {
+                    'total_records': total,
+                    'date_range': {
+                        'start': start,
+                        'end': end
+                    },
+                    'sources': {row['source']: row['count'] for row in cursor}
+                }
+        except sqlite3.Error as e:
+            logger.error(f"获取统计信息失败: {e}")
+            return {}
+    
+    def _import_rows(self, rows: Dict[str, Tuple[str, float, str, str]]):
+        """在一个事务中写入导入的数据，已存在的日期会被覆盖"""
+        with self._connect() as conn:
+            conn.executemany(UPSERT_SQL, rows.values())
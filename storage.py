@@ -1,46 +1,388 @@
 """
-CSV 存储模块
-负责数据的存储、验证和去重
+存储模块
+定义存储后端接口，默认使用 CSV 文件存储，负责数据的存储、验证和去重
 """
 
 import os
+import io
 import csv
+import time
+import shutil
 import logging
+import tempfile
+import functools
+import threading
+from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Tuple, Optional
-import pandas as pd
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Container, ContextManager, Dict, Iterable, List, Tuple, Optional
 
-from constants import DATA_DIR, RATES_CSV, MIN_RATE
+from rate_stats import RateStats
+from constants import (
+    DATA_DIR, RATES_CSV, RATES_HISTORY_CSV, MIN_RATE, STORAGE_BACKEND,
+    STORAGE_APPEND_ONLY, COMPACT_THRESHOLD, READ_CACHE_MAX_BYTES, WRITE_BATCH_SIZE,
+    WRITE_FLUSH_INTERVAL
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from rate_index import RateIndex
+    from business_calendar import BusinessCalendar
 
 logger = logging.getLogger(__name__)
 
+# 同一进程中指向同一 CSV 文件的所有 RateStorage 实例共用一把锁
+_file_locks: Dict[str, threading.RLock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: str) -> threading.RLock:
+    """按文件的真实路径取得共用的可重入锁"""
+    key = os.path.realpath(path)
+    with _file_locks_guard:
+        return _file_locks.setdefault(key, threading.RLock())
+
+
+def _locked(method):
+    """持有实例的文件锁调用方法"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class BaseRateStorage(ABC):
+    """
+    存储后端基类
+    
+    定义所有后端共同的读写接口，并提供数据校验。子类必须实现 add_rates
+    和各查询方法，缺少任何一个时创建实例就会报错。
+    """
+    
+    def add_rate(self, date: str, rate_sell: float, source: str) -> bool:
+        """
+        添加汇率数据，同一日期已存在时更新
+        
+        Returns:
+            bool: 是否成功添加
+        """
+        outcome = self.add_rates([(date, rate_sell, source)])[0]
+        return outcome['status'] in ('added', 'updated')
+    
+    @abstractmethod
+    def add_rates(self, records: Iterable[Tuple[str, float, str]]) -> List[dict]:
+        """批量添加汇率数据，返回与输入顺序一致的逐条结果"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_recent_rates(self, limit: int = 10) -> List[dict]:
+        """获取最近写入的汇率数据"""
+        raise NotImplementedError
+    
+    def import_csv(self, csv_path: str = RATES_CSV) -> int:
+        """
+        从 CSV 文件导入数据，保留原有的 fetched_at
+        
+        同一日期在 CSV 中出现多次时以最后一行为准，已存在的日期会被覆盖。
+        
+        Returns:
+            int: 导入的记录数
+        """
+        rows = self._read_import_csv(csv_path)
+        self._import_rows(rows)
+        logger.info(f"已从 {csv_path} 导入 {len(rows)} 条记录")
+        return len(rows)
+    
+    def _import_rows(self, rows: Dict[str, Tuple[str, float, str, str]]):
+        """
+        写入 import_csv 读到的数据 (date -> (date, rate_sell, source, fetched_at))
+        
+        可选实现：只有可作为迁移目标的后端需要，其他后端调用 import_csv 时报错。
+        """
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_all_rates(self) -> List[dict]:
+        """获取所有汇率数据，最新日期在前"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_date_range(self, start_date: str, end_date: str) -> List[dict]:
+        """获取指定日期范围内的汇率数据"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def get_stats(self) -> dict:
+        """获取存储统计信息"""
+        raise NotImplementedError
+    
+    def version(self) -> Optional[tuple]:
+        """
+        数据版本标记，数据变化后随之改变，可作为查询结果的缓存键
+        
+        Returns:
+            Optional[tuple]: 无法判断时返回 None，调用方不应缓存
+        """
+        return None
+    
+    def find_missing_dates(
+        self,
+        start_date: str,
+        end_date: str,
+        business_days_only: bool = True,
+        calendar: Optional["BusinessCalendar"] = None
+    ) -> List[str]:
+        """
+        查找日期范围内存储中缺失的日期
+        
+        Args:
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            business_days_only: 只检查营业日
+            calendar: 营业日历，默认使用 BusinessCalendar()
+        
+        Returns:
+            List[str]: 缺失的日期，按日期升序
+        """
+        if calendar is None:
+            from business_calendar import BusinessCalendar
+            calendar = BusinessCalendar()
+        
+        stored = self._stored_dates(start_date, end_date)
+        return [day for day in calendar.dates(start_date, end_date, business_days_only) if day not in stored]
+    
+    def _stored_dates(self, start_date: str, end_date: str) -> Container[str]:
+        """日期范围内已存储的日期，返回支持 in 查询的容器"""
+        return {row['date'] for row in self.get_date_range(start_date, end_date)}
+    
+    def get_latest_rate(self) -> Optional[dict]:
+        """获取日期最新的一条数据 (date, rate_sell, source)，无数据时返回 None"""
+        rows = self.get_all_rates()
+        if not rows:
+            return None
+        return {'date': rows[0]['date'], 'rate_sell': float(rows[0]['rate_sell']), 'source': rows[0]['source']}
+    
+    def get_rate(self, date: str) -> Optional[float]:
+        """查询单个日期的卖出价，不存在时返回 None"""
+        rows = self.get_date_range(date, date)
+        return float(rows[0]['rate_sell']) if rows else None
+    
+    def get_rates(self, start_date: str, end_date: str) -> List[Tuple[str, float]]:
+        """查询日期范围内的 (日期, 卖出价)，按日期升序"""
+        rows = self.get_date_range(start_date, end_date)
+        return sorted((row['date'], float(row['rate_sell'])) for row in rows)
+    
+    def _plan_batch(self, records: List[Tuple[str, float, str]]) -> Tuple[List[dict], Dict[str, int]]:
+        """
+        校验一批记录并确定每个日期最终写入的记录
+        
+        Returns:
+            (outcomes, latest): outcomes 与输入顺序一致，校验失败的记录 status 为
+                invalid，被同批后续记录覆盖的为 superseded，其余尚未设置 status，
+                由后端写入后设置为 added/updated/failed；
+                latest 为 date -> 输入中最后一条有效记录的位置
+        """
+        outcomes = []
+        latest = {}
+        
+        for position, (date, rate_sell, source) in enumerate(records):
+            outcome = {'date': date, 'rate_sell': rate_sell, 'source': source}
+            reason = self._validate(date, rate_sell)
+            if reason:
+                logger.warning(f"{reason}, 拒绝写入")
+                outcome.update(status='invalid', reason=reason)
+            else:
+                if date in latest:
+                    outcomes[latest[date]].update(status='superseded', reason=f"被第 {position + 1} 条记录覆盖")
+                latest[date] = position
+            outcomes.append(outcome)
+        
+        return outcomes, latest
+    
+    def _read_import_csv(self, csv_path: str) -> Dict[str, Tuple[str, float, str, str]]:
+        """读取待导入的 CSV，跳过无效行，同一日期以最后一行为准"""
+        rows = {}
+        with open(csv_path, newline='', encoding='utf-8-sig') as f:
+            for record in csv.DictReader(f):
+                try:
+                    rate_sell = float(record['rate_sell'])
+                except (TypeError, ValueError):
+                    logger.warning(f"汇率值无效: {record['rate_sell']}, 跳过")
+                    continue
+                
+                reason = self._validate(record['date'], rate_sell)
+                if reason:
+                    logger.warning(f"{reason}, 跳过")
+                    continue
+                
+                rows[record['date']] = (record['date'], rate_sell, record['source'], record['fetched_at'])
+        return rows
+    
+    def _validate(self, date: str, rate_sell: float) -> Optional[str]:
+        """校验单条数据，返回失败原因，通过时返回 None"""
+        if rate_sell is None or rate_sell <= MIN_RATE:
+            return f"汇率值无效: {rate_sell} <= {MIN_RATE}"
+        if not self._is_valid_date(date):
+            return f"日期格式无效: {date}"
+        return None
+    
+    def _is_valid_date(self, date: str) -> bool:
+        """验证日期格式"""
+        try:
+            datetime.strptime(date, "%Y-%m-%d")
+            return True
+        except ValueError:
+            return False
+
 
-class RateStorage:
-    """汇率数据存储管理类"""
+class RateStorage(BaseRateStorage):
+    """
+    CSV 汇率数据存储
+    
+    在内存中维护 日期 -> 数据行 的索引，初始化时加载一次，之后随每次写入
+    同步更新；文件被外部修改（大小、修改时间或 inode 变化）时自动重新加载。
+    
+    追加写入模式下，已有日期的更正也直接追加到文件末尾，读取时同一日期以
+    最后一行为准；旧版本行数达到阈值后压缩为去重快照，旧版本归档为审计记录。
+    
+    每次写入后同步更新旁路的二进制汇率索引 (<csv_path>.idx)，get_rate 和
+    get_rates 通过内存映射的索引二分查找，不解析CSV。
     
-    def __init__(self):
+    各查询方法共享一份解析好的 DataFrame 缓存，文件签名变化或本实例写入
+    后失效，因此同一进程中的重复查询只解析一次CSV。
+    
+    统计信息保存在旁路的摘要文件 (<csv_path>.stats.json) 中，随每次写入增量
+    更新，get_stats 只需读取摘要文件。日期索引在第一次需要时才加载。
+    
+    同一进程中指向同一 CSV 的实例（例如页面和后台回补任务各自的实例）共用
+    一把文件锁：写入、旁路文件的重建和保存以及读取都持有该锁，一个实例读取
+    或重建索引、摘要时不会与另一个实例的写入交错。
+    """
+    
+    HEADERS = ['date', 'rate_sell', 'source', 'fetched_at']
+    INDEX_SUFFIX = ".idx"
+    STATS_SUFFIX = ".stats.json"
+    TAIL_BLOCK_SIZE = 8192  # 从文件末尾向前读取的块大小
+    
+    def __init__(
+        self,
+        csv_path: str = RATES_CSV,
+        append_only: bool = STORAGE_APPEND_ONLY,
+        compact_threshold: int = COMPACT_THRESHOLD,
+        archive_path: Optional[str] = RATES_HISTORY_CSV,
+        cache_max_bytes: int = READ_CACHE_MAX_BYTES
+    ):
+        """
+        Args:
+            csv_path: CSV 文件路径
+            append_only: 是否使用追加写入模式
+            compact_threshold: 旧版本行数达到该值时自动压缩，0 表示不自动压缩
+            archive_path: 压缩时旧版本的归档文件，None 表示直接丢弃
+            cache_max_bytes: 查询缓存的内存上限（字节），数据超出时不缓存，0 表示不缓存
+        """
+        self.csv_path = csv_path
+        self.append_only = append_only
+        self.compact_threshold = compact_threshold
+        self.archive_path = archive_path
+        self._index: Dict[str, List[str]] = {}
+        self._signature = None
+        self._tail_offset = None  # 最后一行数据在文件中的字节偏移
+        self._needs_newline = False
+        self._stale_rows = 0  # 文件中已被新版本取代的行数
+        self._rate_index_file = None
+        self.cache_max_bytes = cache_max_bytes
+        self._frame: Optional["pd.DataFrame"] = None
+        self._frame_signature = None
+        self._stats = RateStats(f"{csv_path}{self.STATS_SUFFIX}")
+        self._lock = _file_lock(csv_path)
+        
         self._ensure_data_dir()
         self._ensure_csv_exists()
     
     def _ensure_data_dir(self):
         """确保数据目录存在"""
-        if not os.path.exists(DATA_DIR):
-            os.makedirs(DATA_DIR)
-            logger.info(f"创建数据目录: {DATA_DIR}")
+        data_dir = os.path.dirname(self.csv_path) or DATA_DIR
+        if not os.path.exists(data_dir):
+            os.makedirs(data_dir)
+            logger.info(f"创建数据目录: {data_dir}")
     
     def _ensure_csv_exists(self):
         """确保CSV文件存在，如果不存在则创建"""
-        if not os.path.exists(RATES_CSV):
+        if not os.path.exists(self.csv_path):
             self._create_csv()
-            logger.info(f"创建CSV文件: {RATES_CSV}")
+            logger.info(f"创建CSV文件: {self.csv_path}")
     
     def _create_csv(self):
         """创建CSV文件并写入表头"""
-        headers = ['date', 'rate_sell', 'source', 'fetched_at']
-        with open(RATES_CSV, 'w', newline='', encoding='utf-8') as f:
+        with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
-            writer.writerow(headers)
+            writer.writerow(self.HEADERS)
+    
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """文件签名 (大小, 修改时间, inode)，用于检测外部修改"""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+    
+    @staticmethod
+    def _handle_signature(f) -> Tuple[int, int, int]:
+        """已打开文件的签名，与 _file_signature 格式相同"""
+        stat = os.fstat(f.fileno())
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
     
+    def version(self) -> Optional[tuple]:
+        """数据版本标记：CSV 文件签名"""
+        return self._file_signature()
+    
+    def _load_index(self):
+        """
+        读取CSV文件并建立日期索引，同一日期出现多次时以最后一行为准
+        
+        签名在读取之前从打开的文件句柄取得：读取过程中文件被其他写入方修改时，
+        签名与之后的文件不一致，下次查询会重新加载，不会把旧数据当作最新。
+        """
+        self._index = {}
+        self._tail_offset = None
+        self._needs_newline = False
+        self._stale_rows = 0
+        self._frame = None
+        
+        try:
+            with open(self.csv_path, 'rb') as f:
+                signature = self._handle_signature(f)
+                data = f.read()
+        except OSError as e:
+            logger.error(f"读取CSV失败: {e}")
+            self._signature = None
+            return
+        
+        reader = csv.reader(io.StringIO(data.decode('utf-8-sig')))
+        next(reader, None)  # 表头
+        for row in reader:
+            if not row:
+                continue
+            if self._index.pop(row[0], None) is not None:
+                self._stale_rows += 1
+            self._index[row[0]] = row
+        
+        if self._index:
+            stripped = data.rstrip(b'\r\n')
+            self._tail_offset = stripped.rfind(b'\n') + 1
+        self._needs_newline = bool(data) and not data.endswith(b'\n')
+        self._signature = signature
+    
+    def _refresh_index(self):
+        """文件被外部修改时重新加载索引"""
+        if self._file_signature() != self._signature:
+            logger.debug(f"检测到 {self.csv_path} 已被修改，重新加载索引")
+            if not os.path.exists(self.csv_path):
+                self._create_csv()
+            self._load_index()
+    
+    @_locked
     def add_rate(self, date: str, rate_sell: float, source: str) -> bool:
         """
         添加汇率数据
@@ -49,82 +391,502 @@ class RateStorage:
             date: 日期 (YYYY-MM-DD)
             rate_sell: 卖出价
             source: 数据源
-            
+        
         Returns:
             bool: 是否成功添加
         """
         # 验证数据
-        if rate_sell <= MIN_RATE:
-            logger.warning(f"汇率值无效: {rate_sell} <= {MIN_RATE}, 拒绝写入")
+        reason = self._validate(date, rate_sell)
+        if reason:
+            logger.warning(f"{reason}, 拒绝写入")
             return False
         
-        if not self._is_valid_date(date):
-            logger.warning(f"日期格式无效: {date}")
-            return False
+        self._refresh_index()
         
-        # 检查是否已存在相同日期的数据
-        if self._date_exists(date):
-            logger.info(f"日期 {date} 已存在，将更新")
-            self._remove_date(date)
-        
-        # 写入新数据
         fetched_at = datetime.now().isoformat()
+        row = [date, str(rate_sell), source, fetched_at]
+        
         try:
-            with open(RATES_CSV, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow([date, rate_sell, source, fetched_at])
+            # 检查是否已存在相同日期的数据
+            if self._date_exists(date):
+                logger.info(f"日期 {date} 已存在，将更新")
+                self._replace_row(row)
+            else:
+                self._append_rows([row])
             logger.info(f"成功添加汇率数据: {date} = {rate_sell} ({source})")
-            return True
         except Exception as e:
             logger.error(f"写入CSV失败: {e}")
+            # 写入失败后以文件内容为准
+            self._load_index()
             return False
+        
+        self._maybe_compact()
+        return True
     
-    def _is_valid_date(self, date: str) -> bool:
-        """验证日期格式"""
+    @_locked
+    def add_rates(self, records: Iterable[Tuple[str, float, str]]) -> List[dict]:
+        """
+        批量添加汇率数据，只写一次文件
+        
+        先校验整批数据，再与已有数据合并（同一日期以最后出现的记录为准），
+        最后写入临时文件并原子重命名，中途崩溃不会留下损坏的CSV。
+        
+        Args:
+            records: (date, rate_sell, source) 记录
+        
+        Returns:
+            List[dict]: 与输入顺序一致的逐条结果，status 取值：
+                added（新增）、updated（覆盖已有日期）、superseded（被同批
+                后续记录覆盖）、invalid（校验失败）、failed（写入失败）
+        """
+        records = list(records)
+        outcomes, latest = self._plan_batch(records)
+        
+        if not latest:
+            return outcomes
+        
+        self._refresh_index()
+        previous_index = dict(self._index)
+        previous_size = os.path.getsize(self.csv_path)
+        fetched_at = datetime.now().isoformat()
+        
+        new_rows = []
+        for date, position in sorted(latest.items(), key=lambda item: item[1]):
+            _, rate_sell, source = records[position]
+            outcomes[position]['status'] = 'updated' if date in self._index else 'added'
+            new_rows.append([date, str(rate_sell), source, fetched_at])
+        
         try:
-            datetime.strptime(date, "%Y-%m-%d")
-            return True
-        except ValueError:
+            if self.append_only:
+                self._append_rows(new_rows)
+            else:
+                for row in new_rows:
+                    self._index.pop(row[0], None)
+                    self._index[row[0]] = row
+                self._write_all()
+        except Exception as e:
+            logger.error(f"批量写入CSV失败: {e}")
+            if self.append_only:
+                # 截掉可能写了一半的追加内容
+                with open(self.csv_path, 'r+b') as f:
+                    f.truncate(previous_size)
+                self._load_index()
+            else:
+                self._index = previous_index
+            for position in latest.values():
+                outcomes[position].update(status='failed', reason=str(e))
+            return outcomes
+        
+        added = sum(1 for o in outcomes if o.get('status') == 'added')
+        updated = sum(1 for o in outcomes if o.get('status') == 'updated')
+        logger.info(f"批量写入完成: 新增 {added} 条，更新 {updated} 条，共 {len(records)} 条输入")
+        self._maybe_compact()
+        return outcomes
+    
+    def _append_rows(
+        self,
+        rows: List[List[str]],
+        replaced: Optional[Dict[str, List[str]]] = None,
+        previous_signature: Optional[Tuple[int, int, int]] = None
+    ):
+        """
+        在文件末尾追加数据行并更新索引，已有日期的旧行计为旧版本
+        
+        写入前后的签名都从打开的文件句柄取得。写入前的文件与内存索引不一致
+        （已被其他写入方修改）时不做增量更新，写入后重新加载索引并重建旁路文件。
+        
+        Args:
+            rows: 数据行
+            replaced: 调用前已从文件和索引中移除的旧行 (date -> 旧行)，用于更新统计摘要
+            previous_signature: 旁路文件对应的写入前签名，默认为当前内存索引的签名
+        """
+        if previous_signature is None:
+            previous_signature = self._signature
+        self._frame = None
+        with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+            modified = self._handle_signature(f) != self._signature
+            if self._needs_newline:
+                f.write('\n')
+                self._needs_newline = False
+            writer = csv.writer(f)
+            for row in rows:
+                offset = f.tell()
+                writer.writerow(row)
+            f.flush()
+            signature = self._handle_signature(f)
+        
+        if modified:
+            logger.debug(f"写入前 {self.csv_path} 已被修改，重新加载索引")
+            self._load_index()
+            self._sync_rate_index(rows, None)
+            self._sync_stats()
+            return
+        
+        changes = []
+        for row in rows:
+            old_row = self._index.pop(row[0], None)
+            if old_row is not None:
+                self._stale_rows += 1
+            elif replaced:
+                old_row = replaced.get(row[0])
+            self._index[row[0]] = row
+            changes.append((old_row, row))
+        self._tail_offset = offset
+        self._signature = signature
+        self._sync_rate_index(rows, previous_signature)
+        self._sync_stats(changes, previous_signature)
+    
+    def _replace_row(self, row: List[str]):
+        """替换已存在日期的数据行，更新后的行移到文件末尾"""
+        if self.append_only:
+            self._append_rows([row])
+            return
+        
+        date = row[0]
+        last_date = next(reversed(self._index))
+        
+        if date == last_date and self._tail_offset is not None:
+            # 要更新的正好是最后一行：截断后重新追加，无需重写整个文件
+            previous_signature = self._signature
+            with open(self.csv_path, 'r+b') as f:
+                f.truncate(self._tail_offset)
+                self._signature = self._handle_signature(f)
+            old_row = self._index.pop(date)
+            self._needs_newline = False
+            self._append_rows([row], replaced={date: old_row}, previous_signature=previous_signature)
+            return
+        
+        del self._index[date]
+        self._index[date] = row
+        self._write_all()
+    
+    def _write_all(self):
+        """用内存索引重写整个文件（写临时文件后原子重命名）"""
+        self._frame = None
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.csv_path) or '.', prefix=f"{os.path.basename(self.csv_path)}.", suffix=".tmp"
+        )
+        try:
+            with open(fd, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.HEADERS)
+                writer.writerows(self._index.values())
+                f.flush()
+                os.fsync(f.fileno())
+                # 重命名不改变大小、修改时间和 inode，替换后的文件签名即临时文件的签名
+                signature = self._handle_signature(f)
+            if os.path.exists(self.csv_path):
+                shutil.copymode(self.csv_path, tmp_path)
+            os.replace(tmp_path, self.csv_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        self._tail_offset = self._last_row_offset()
+        self._needs_newline = False
+        self._stale_rows = 0
+        self._signature = signature
+        self._sync_rate_index()
+        self._sync_stats()
+    
+    def _sync_stats(self, changes: Optional[List[Tuple[Optional[List[str]], List[str]]]] = None, previous_signature=None):
+        """
+        写入后更新统计摘要
+        
+        摘要与写入前的文件一致时只应用本次的 (旧行, 新行) 变更，否则从内存索引重新计算。
+        """
+        if not self._stats.loaded:
+            self._stats.load()
+        
+        if changes is not None and self._stats.is_current(previous_signature):
+            for old_row, new_row in changes:
+                self._stats.apply(old_row, new_row)
+        else:
+            self._stats.rebuild(self._index.values())
+        self._stats.save(self._signature)
+    
+    @_locked
+    def _ensure_stats(self):
+        """确保统计摘要与CSV一致，过期时从数据重新计算"""
+        if not self._stats.loaded:
+            self._stats.load()
+        if not self._stats.is_current(self._file_signature()):
+            logger.debug(f"统计摘要已过期，重新计算: {self._stats.path}")
+            self._refresh_index()
+            self._sync_stats()
+    
+    @_locked
+    def verify_stats(self) -> bool:
+        """重新读取CSV，核对统计摘要是否与数据一致"""
+        self._load_index()
+        expected = RateStats(self._stats.path)
+        expected.rebuild(self._index.values())
+        
+        actual_loaded = self._stats.load()
+        if not actual_loaded or self._stats.signature != self._signature:
+            logger.warning("统计摘要不存在或已过期")
+            return False
+        if self._stats.summary() != expected.summary():
+            logger.warning(f"统计摘要与数据不一致: 摘要 {self._stats.summary()}，实际 {expected.summary()}")
             return False
+        return True
+    
+    @_locked
+    def rebuild_stats(self):
+        """重新读取CSV并重建统计摘要"""
+        self._load_index()
+        self._sync_stats()
+        logger.info(f"统计摘要已重建: 共 {self._stats.total_records} 条记录")
+    
+    def _sync_rate_index(self, rows: Optional[List[List[str]]] = None, previous_signature=None):
+        """
+        写入后更新汇率索引
+        
+        追加写入且索引与写入前的文件一致时只增量更新新写入的行；重写整个
+        文件后只让索引失效，下次查询时再从内存索引重建。索引更新失败不影响
+        CSV写入。
+        """
+        if rows is None:
+            if self._rate_index_file is not None:
+                self._rate_index_file.close()
+            return
+        
+        try:
+            if not self._rate_index.loaded:
+                self._rate_index.load()
+            if (
+                previous_signature is None
+                or self._rate_index.signature != previous_signature
+                or not self._rate_index.upsert([(row[0], row[1]) for row in rows], self._signature)
+            ):
+                self._rebuild_rate_index()
+        except Exception as e:
+            logger.warning(f"更新汇率索引失败: {e}")
+            self._rate_index.close()
+    
+    @property
+    def _rate_index(self) -> "RateIndex":
+        """二进制汇率索引，第一次使用时才导入（依赖 numpy）"""
+        if self._rate_index_file is None:
+            from rate_index import RateIndex
+            self._rate_index_file = RateIndex(f"{self.csv_path}{self.INDEX_SUFFIX}")
+        return self._rate_index_file
+    
+    def _rebuild_rate_index(self):
+        """从内存索引重建汇率索引"""
+        self._rate_index.build(((row[0], row[1]) for row in self._index.values()), self._signature)
+    
+    @_locked
+    def _ensure_rate_index(self):
+        """
+        确保汇率索引与CSV一致
+        
+        只比较索引文件头中的签名和CSV的文件签名，一致时直接使用索引，
+        不解析CSV；不一致时先重新映射磁盘上的索引（可能已被其他进程更新），
+        仍然过期才加载日期索引并重建。
+        """
+        signature = self._file_signature()
+        if self._rate_index.loaded and self._rate_index.signature == signature:
+            return
+        if self._rate_index.load() and self._rate_index.signature == signature:
+            return
+        
+        self._refresh_index()
+        logger.debug(f"汇率索引已过期，重新建立: {self._rate_index.path}")
+        self._rebuild_rate_index()
+    
+    def _maybe_compact(self):
+        """旧版本行数达到阈值时自动压缩"""
+        if self.compact_threshold and self._stale_rows >= self.compact_threshold:
+            logger.info(f"旧版本行数达到 {self._stale_rows}，开始压缩")
+            self.compact()
+    
+    @_locked
+    def compact(self) -> Optional[int]:
+        """
+        压缩数据文件：每个日期只保留最新版本，写入快照后原子替换
+        
+        设置了 archive_path 时，被取代的旧版本先追加到归档文件。
+        
+        Returns:
+            Optional[int]: 移除的旧版本行数，失败时返回 None
+        """
+        self._refresh_index()
+        
+        try:
+            with open(self.csv_path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # 表头
+                rows = [row for row in reader if row]
+            
+            last_position = {row[0]: position for position, row in enumerate(rows)}
+            superseded = [row for position, row in enumerate(rows) if last_position[row[0]] != position]
+            
+            if superseded and self.archive_path:
+                self._archive_rows(superseded)
+            self._write_all()
+        except Exception as e:
+            logger.error(f"压缩CSV失败: {e}")
+            self._load_index()
+            return None
+        
+        logger.info(f"压缩完成: 移除 {len(superseded)} 条旧版本，保留 {len(self._index)} 条")
+        return len(superseded)
+    
+    def _archive_rows(self, rows: List[List[str]]):
+        """将旧版本追加到归档文件"""
+        is_new = not os.path.exists(self.archive_path) or os.path.getsize(self.archive_path) == 0
+        with open(self.archive_path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(self.HEADERS)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def _last_row_offset(self) -> Optional[int]:
+        """计算最后一行数据的字节偏移"""
+        if not self._index:
+            return None
+        last_row = io.StringIO()
+        csv.writer(last_row).writerow(next(reversed(self._index.values())))
+        return os.path.getsize(self.csv_path) - len(last_row.getvalue().encode('utf-8'))
     
     def _date_exists(self, date: str) -> bool:
-        """检查日期是否已存在"""
+        """检查日期是否已存在（O(1) 索引查询）"""
+        return date in self._index
+    
+    @_locked
+    def _stored_dates(self, start_date: str, end_date: str) -> Container[str]:
+        """直接使用内存日期索引，不读取CSV"""
+        self._refresh_index()
+        return self._index.keys()
+    
+    @_locked
+    def get_latest_rate(self) -> Optional[dict]:
+        """获取日期最新的一条数据（读取统计摘要，不解析CSV）"""
         try:
-            df = pd.read_csv(RATES_CSV)
-            return date in df['date'].values
-        except Exception:
-            return False
+            self._ensure_stats()
+            return dict(self._stats.latest) if self._stats.latest else None
+        except Exception as e:
+            logger.error(f"读取最新汇率失败: {e}")
+            return None
     
-    def _remove_date(self, date: str):
-        """移除指定日期的数据"""
+    @_locked
+    def get_rate(self, date: str) -> Optional[float]:
+        """查询单个日期的卖出价（内存映射索引，不解析CSV）"""
         try:
-            df = pd.read_csv(RATES_CSV)
-            df = df[df['date'] != date]
-            df.to_csv(RATES_CSV, index=False)
+            self._ensure_rate_index()
+            return self._rate_index.lookup(date)
         except Exception as e:
-            logger.error(f"移除日期 {date} 失败: {e}")
+            logger.error(f"查询汇率失败: {e}")
+            return None
     
-    def get_recent_rates(self, limit: int = 10) -> List[Tuple]:
-        """获取最近的汇率数据"""
+    @_locked
+    def get_rates(self, start_date: str, end_date: str) -> List[Tuple[str, float]]:
+        """查询日期范围内的 (日期, 卖出价)，按日期升序（内存映射索引，不解析CSV）"""
         try:
-            df = pd.read_csv(RATES_CSV)
-            if df.empty:
-                return []
+            self._ensure_rate_index()
+            return self._rate_index.lookup_range(start_date, end_date)
+        except Exception as e:
+            logger.error(f"查询汇率失败: {e}")
+            return []
+    
+    def _tail_records(self, limit: int) -> List[dict]:
+        """
+        从文件末尾向前按块读取，返回最后 limit 个不同日期的最新记录（最新的在前）
+        
+        只适用于按写入顺序排列的文件；数据行中不能包含换行符。
+        """
+        records = []
+        seen = set()
+        
+        with open(self.csv_path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            partial = b''
             
-            # 按fetched_at排序，获取最新的数据
-            df['fetched_at'] = pd.to_datetime(df['fetched_at'])
-            df = df.sort_values('fetched_at', ascending=False)
+            while position > 0 and len(records) < limit:
+                step = min(self.TAIL_BLOCK_SIZE, position)
+                position -= step
+                f.seek(position)
+                lines = (f.read(step) + partial).split(b'\n')
+                # 块的第一行可能不完整，留到读取前一块时再处理
+                partial = lines.pop(0) if position > 0 else b''
+                
+                for line in reversed(lines):
+                    text = line.decode('utf-8-sig').strip('\r')
+                    if not text:
+                        continue
+                    row = next(csv.reader([text]))
+                    if row == self.HEADERS or row[0] in seen:
+                        continue
+                    seen.add(row[0])
+                    records.append({
+                        'date': row[0],
+                        'rate_sell': float(row[1]),
+                        'source': row[2],
+                        'fetched_at': row[3]
+                    })
+                    if len(records) >= limit:
+                        break
+        
+        return records
+    
+    def _read_frame(self) -> "pd.DataFrame":
+        """
+        读取CSV，同一日期出现多次时以最后一行为准
+        
+        结果在文件签名不变时直接复用缓存，调用方不能修改返回的 DataFrame。
+        """
+        signature = self._file_signature()
+        if self._frame is not None and signature == self._frame_signature:
+            return self._frame
+        
+        import pandas as pd
+        
+        df = pd.read_csv(
+            self.csv_path,
+            dtype={'date': str, 'rate_sell': 'float64', 'source': 'category', 'fetched_at': str}
+        )
+        df = df.drop_duplicates('date', keep='last')
+        
+        self._frame = None
+        if self.cache_max_bytes and df.memory_usage(deep=True).sum() <= self.cache_max_bytes:
+            self._frame = df
+            self._frame_signature = signature
+        return df
+    
+    @_locked
+    def get_recent_rates(self, limit: int = 10) -> List[Tuple]:
+        """
+        获取最近的汇率数据
+        
+        文件按写入顺序排列时从文件末尾向前读取最后几行，否则读取整个文件排序。
+        """
+        try:
+            self._ensure_stats()
+            if self._stats.append_order:
+                records = self._tail_records(limit)
+            else:
+                df = self._read_frame()
+                if df.empty:
+                    return []
+                
+                # 按fetched_at排序（ISO 格式字符串的顺序即时间顺序），获取最新的数据
+                records = df.sort_values('fetched_at', ascending=False).head(limit).to_dict('records')
             
-            recent_data = df.head(limit)
-            return recent_data.to_dict('records')
+            for record in records:
+                record['fetched_at'] = datetime.fromisoformat(record['fetched_at'])
+            return records
         except Exception as e:
             logger.error(f"读取最近汇率数据失败: {e}")
             return []
     
+    @_locked
     def get_all_rates(self) -> List[Tuple]:
         """获取所有汇率数据"""
         try:
-            df = pd.read_csv(RATES_CSV)
+            df = self._read_frame()
             if df.empty:
                 return []
             
@@ -136,10 +898,11 @@ class RateStorage:
             logger.error(f"读取所有汇率数据失败: {e}")
             return []
     
+    @_locked
     def get_date_range(self, start_date: str, end_date: str) -> List[Tuple]:
         """获取指定日期范围内的汇率数据"""
         try:
-            df = pd.read_csv(RATES_CSV)
+            df = self._read_frame()
             if df.empty:
                 return []
             
@@ -152,26 +915,104 @@ class RateStorage:
             logger.error(f"读取日期范围数据失败: {e}")
             return []
     
+    @_locked
     def get_stats(self) -> dict:
-        """获取存储统计信息"""
+        """获取存储统计信息（读取统计摘要，摘要过期时从数据重新计算）"""
         try:
-            df = pd.read_csv(RATES_CSV)
-            if df.empty:
-                return {
-                    'total_records': 0,
-                    'date_range': None,
-                    'sources': {}
-                }
-            
-            stats = {
-                'total_records': len(df),
-                'date_range': {
-                    'start': df['date'].min(),
-                    'end': df['date'].max()
-                },
-                'sources': df['source'].value_counts().to_dict()
-            }
-            return stats
+            self._ensure_stats()
+            return self._stats.as_stats()
         except Exception as e:
             logger.error(f"获取统计信息失败: {e}")
             return {}
+
+def create_storage(backend: str = STORAGE_BACKEND, **kwargs) -> BaseRateStorage:
+    """
+    按名称创建存储后端
+    
+    Args:
+        backend: csv、sqlite 或 parquet
+        **kwargs: 传给后端构造函数的参数
+    """
+    if backend == "csv":
+        return RateStorage(**kwargs)
+    if backend == "sqlite":
+        from sqlite_storage import SqliteRateStorage
+        return SqliteRateStorage(**kwargs)
+    if backend == "parquet":
+        from parquet_storage import ParquetRateStorage
+        return ParquetRateStorage(**kwargs)
+    raise ValueError(f"未知的存储后端: {backend}，可选: csv, sqlite, parquet")
+
+
+class BatchWriter:
+    """
+    微批写入器
+    
+    逐条接收抓取结果，缓冲达到 batch_size 条或距上次写入超过 flush_interval 秒时
+    调用一次 add_rates，数据在回补过程中陆续落盘，内存中最多保留一批。
+    """
+    
+    SUCCESS_STATUSES = ('added', 'updated')
+    
+    def __init__(self, storage: BaseRateStorage,
+                 batch_size: int = WRITE_BATCH_SIZE,
+                 flush_interval: float = WRITE_FLUSH_INTERVAL,
+                 lock: Optional[ContextManager] = None):
+        """
+        Args:
+            lock: 写入时持有的锁，多个线程共享同一数据文件时使用
+        """
+        self.storage = storage
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.lock = lock
+        self.counts = {'added': 0, 'updated': 0, 'superseded': 0, 'invalid': 0, 'failed': 0}
+        self._buffer: List[Tuple[str, float, str]] = []
+        self._flushed_at = time.monotonic()
+    
+    def __enter__(self) -> "BatchWriter":
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.flush()
+    
+    @property
+    def written(self) -> int:
+        """成功写入的条数"""
+        return self.counts['added'] + self.counts['updated']
+    
+    @property
+    def rejected(self) -> int:
+        """校验失败或写入失败的条数"""
+        return self.counts['invalid'] + self.counts['failed']
+    
+    def add(self, record: Tuple[str, float, str]):
+        """缓冲一条 (date, rate_sell, source)，满足条件时写入"""
+        self._buffer.append(record)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+        elif self.flush_interval > 0 and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+    
+    def write_all(self, records: Iterable[Tuple[str, float, str]]) -> dict:
+        """写入一个可迭代对象（如抓取生成器）中的所有数据，返回各状态的条数"""
+        for record in records:
+            self.add(record)
+        self.flush()
+        return dict(self.counts)
+    
+    def flush(self):
+        """写入缓冲中的数据"""
+        self._flushed_at = time.monotonic()
+        if not self._buffer:
+            return
+        
+        batch, self._buffer = self._buffer, []
+        with self.lock or nullcontext():
+            outcomes = self.storage.add_rates(batch)
+        for outcome in outcomes:
+            status = outcome.get('status', 'failed')
+            self.counts[status] = self.counts.get(status, 0) + 1
+            if status in ('invalid', 'failed'):
+                logger.warning(f"保存 {outcome['date']} 数据失败: {outcome.get('reason')}")
+        logger.info(f"已写入一批 {len(batch)} 条，累计成功 {self.written} 条")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+生成离线 HTML 样例页面
+模拟完整尺寸的 BNA 页面（导航、脚本、多个表格），输出结果是确定的，
+修改后重新运行并提交生成的文件，同时更新 CORPUS_VERSION。
+
+用法: python tests/fixtures/generate_pages.py
+"""
+
+import os
+import json
+import random
+from datetime import date, timedelta
+
+CORPUS_VERSION = 1
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+CURRENCIES = [
+    "Dolar U.S.A", "Euro", "Real *", "Libra Esterlina", "Franco Suizo",
+    "Yenes", "Dolar Canadiense", "Dolar Australiano", "Corona Danesa",
+    "Corona Noruega", "Corona Sueca", "Yuan", "Peso Chileno", "Peso Uruguayo",
+]
+
+
+def ar_number(value: float) -> str:
+    """阿根廷数字格式：1.292,5000"""
+    integer, decimal = f"{value:.4f}".split(".")
+    groups = []
+    while len(integer) > 3:
+        groups.insert(0, integer[-3:])
+        integer = integer[:-3]
+    groups.insert(0, integer)
+    return ".".join(groups) + "," + decimal
+
+
+def page_shell(title: str, body: str, rng: random.Random) -> str:
+    """页面外壳：头部资源、导航菜单、页脚和脚本，让页面接近真实尺寸"""
+    styles = "\n".join(
+        f'    <link rel="stylesheet" href="/Content/css/module{i}.css?v={rng.randint(1000, 9999)}">'
+        for i in range(40)
+    )
+    menu = "\n".join(
+        f'        <li class="menu-item"><a href="/Personas/Seccion{i}" title="Sección {i}">'
+        f'<span class="icon icon-{i}"></span>Sección {i} &amp; servicios</a>'
+        f'<ul class="submenu">' + "".join(
+            f'<li><a href="/Personas/Seccion{i}/Item{j}">Item {j}</a></li>' for j in range(12)
+        ) + '</ul></li>'
+        for i in range(60)
+    )
+    script = "\n".join(
+        f'    var config{i} = {{"id": {i}, "label": "<tr><td>placeholder {i}</td></tr>", "enabled": true}};'
+        for i in range(200)
+    )
+    footer = "\n".join(
+        f'        <p class="legal">Banco de la Nación Argentina - Texto legal {i}. '
+        f'{"Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3}</p>'
+        for i in range(80)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="es">
+<head>
+    <meta charset="utf-8">
+    <title>{title}</title>
+{styles}
+    <script type="text/javascript">
+{script}
+    </script>
+</head>
+<body>
+    <header>
+        <ul class="menu">
+{menu}
+        </ul>
+    </header>
+    <main>
+{body}
+    </main>
+    <footer>
+{footer}
+    </footer>
+</body>
+</html>
+"""
+
+
+def quote_table(caption: str, rates: dict, table_id: str) -> str:
+    """报价表格：货币 / 买入 / 卖出"""
+    rows = "\n".join(
+        f'                <tr>\n'
+        f'                    <td class="tit">{name}</td>\n'
+        f'                    <td>{ar_number(buy)}</td>\n'
+        f'                    <td>{ar_number(sell)}</td>\n'
+        f'                </tr>'
+        for name, (buy, sell) in rates.items()
+    )
+    return f"""        <div class="tab-pane" id="{table_id}">
+            <table class="table cotizacion">
+                <thead>
+                    <tr><th class="fechaCot">{caption}</th><th>Compra</th><th>Venta</th></tr>
+                </thead>
+                <tbody>
+{rows}
+                </tbody>
+            </table>
+        </div>"""
+
+
+def valorhoy_page(rng: random.Random, fecha: str, usd_sell: float, include_usd: bool = True) -> str:
+    """ValorHoy 页面：日期 + 多个报价表格，第一张表为 Divisas"""
+    def rates(usd):
+        table = {}
+        for name in CURRENCIES:
+            if name == "Dolar U.S.A":
+                if include_usd:
+                    table[name] = (usd - 20, usd)
+                continue
+            base = rng.uniform(1, 1600)
+            table[name] = (base, base * 1.02)
+        return table
+    
+    body = f"""        <div class="legal">Cotizaciones</div>
+        <div class="fecha">Fecha: {fecha}</div>
+{quote_table("Divisas", rates(usd_sell), "divisas")}
+{quote_table("Billetes", rates(usd_sell + 15), "billetes")}"""
+    return page_shell("Cotización divisas - BNA", body, rng)
+
+
+def historico_page(rng: random.Random, start: date, days: int, usd_base: float) -> tuple:
+    """Historico 页面：每个营业日一组货币行，第四列为日期"""
+    rows = []
+    expected = {}
+    current = start
+    rate = usd_base
+    while len(expected) < days:
+        if current.weekday() < 5:
+            rate = round(rate + rng.uniform(-5, 8), 4)
+            day_text = f"{current.day}/{current.month}/{current.year}"
+            for name in CURRENCIES:
+                sell = rate if name == "Dolar U.S.A" else round(rng.uniform(1, 1600), 4)
+                rows.append(
+                    f'                <tr><td>{name}</td><td>{ar_number(sell - 20)}</td>'
+                    f'<td>{ar_number(sell)}</td><td>{day_text}</td></tr>'
+                )
+            expected[current.isoformat()] = rate
+        current += timedelta(days=1)
+    
+    body = f"""        <div id="cotizacionesCercanas">
+            <table class="table table-bordered cotizacion">
+                <thead><tr><th>Moneda</th><th>Compra</th><th>Venta</th><th>Fecha</th></tr></thead>
+                <tbody>
+{chr(10).join(rows)}
+                </tbody>
+            </table>
+        </div>"""
+    return historico_shell(rng, body), expected
+
+
+def historico_shell(rng: random.Random, body: str) -> str:
+    return page_shell("Histórico de cotizaciones - BNA", body, rng)
+
+
+def main():
+    rng = random.Random(20250805)
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    
+    pages = {}
+    
+    def write(name: str, html: str, kind: str, expected):
+        with open(os.path.join(PAGES_DIR, name), "w", encoding="utf-8", newline="\n") as f:
+            f.write(html)
+        pages[name] = {"kind": kind, "expected": expected}
+    
+    write("valorhoy_full.html", valorhoy_page(rng, "05/08/2025", 1330.0),
+          "valorhoy", ["2025-08-05", 1330.0])
+    write("valorhoy_single_digit_date.html", valorhoy_page(rng, "5/8/2025", 1331.5),
+          "valorhoy", ["2025-08-05", 1331.5])
+    write("valorhoy_no_usd.html", valorhoy_page(rng, "05/08/2025", 1330.0, include_usd=False),
+          "valorhoy", None)
+    
+    html, expected = historico_page(rng, date(2025, 7, 1), 25, 1250.0)
+    write("historico_full.html", html, "historico", expected)
+    write("historico_empty.html", historico_shell(rng, '        <div id="cotizacionesCercanas"></div>'),
+          "historico", {})
+    
+    manifest = {"corpus_version": CORPUS_VERSION, "pages": pages}
+    with open(os.path.join(PAGES_DIR, "manifest.json"), "w", encoding="utf-8", newline="\n") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    
+    print(f"已生成 {len(pages)} 个样例页面: {PAGES_DIR}")
+
+
+if __name__ == "__main__":
+    main()
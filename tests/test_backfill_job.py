@@ -0,0 +1,118 @@
+"""
+后台回补任务单元测试
+"""
+
+import time
+import threading
+from unittest.mock import Mock, patch
+
+import pytest
+
+from backfill_job import BackfillJob, JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED
+from storage import RateStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return RateStorage(csv_path=str(tmp_path / "rates.csv"))
+
+
+def make_scraper(scrape_rows):
+    """创建 Historico 数据源被替换的抓取器"""
+    with patch('scraper.ValorHoySource'), patch('scraper.HistoricoSource') as mock_historico:
+        mock_historico.return_value.scrape_rows.side_effect = scrape_rows
+        from scraper import ScraperManager
+        return ScraperManager()
+
+
+class TestBackfillJob:
+    """测试后台回补任务"""
+    
+    def test_runs_in_background_and_reports_progress(self, storage):
+        """测试任务在后台线程中边抓取边写入，并汇总各日期结果"""
+        release = threading.Event()
+        
+        def scrape_rows(date_str):
+            release.wait(5)
+            if date_str == "2025-08-05":
+                return None
+            if date_str == "2025-08-04":
+                return {}
+            return {date_str: 1300.0}
+        
+        job = BackfillJob(
+            make_scraper(scrape_rows), storage, "2025-08-01", "2025-08-07",
+            missing_only=False, rate=0, batch_size=1
+        ).start()
+        
+        # start() 立即返回，任务仍在运行
+        assert job.running
+        release.set()
+        job.join(5)
+        
+        progress = job.snapshot()
+        assert progress['state'] == JOB_COMPLETED
+        assert progress['total'] == 5
+        assert (progress['done'], progress['ok'], progress['missing'], progress['failed']) == (5, 3, 1, 1)
+        assert progress['written'] == 3
+        assert progress['eta'] is None
+        assert storage.get_rate("2025-08-07") == 1300.0
+    
+    def test_eta(self, storage):
+        """测试按已完成日期的平均耗时估计剩余时间"""
+        job = BackfillJob(make_scraper(lambda d: {d: 1300.0}), storage, "2025-08-01", "2025-08-07")
+        job.state = "running"
+        job._started_at = time.monotonic() - 10
+        job.total = 5
+        job.counts['ok'] = 2
+        
+        assert job.snapshot()['eta'] == pytest.approx(15, abs=0.5)
+    
+    def test_cancel_keeps_written_rows(self, storage):
+        """测试取消后不再抓取剩余日期，已抓取的数据已写入"""
+        calls = []
+        
+        def scrape_rows(date_str):
+            calls.append(date_str)
+            time.sleep(0.02)
+            return {date_str: 1300.0}
+        
+        job = BackfillJob(
+            make_scraper(scrape_rows), storage, "2025-01-01", "2025-06-30",
+            missing_only=False, rate=0, batch_size=1000
+        ).start()
+        while job.snapshot()['done'] < 3:
+            time.sleep(0.01)
+        job.cancel()
+        job.join(5)
+        
+        progress = job.snapshot()
+        assert progress['state'] == JOB_CANCELLED
+        assert len(calls) < progress['total']
+        assert progress['written'] == progress['ok']
+        assert storage.get_stats()['total_records'] == progress['ok']
+    
+    def test_missing_only_plans_gaps(self, storage):
+        """测试只抓取存储中缺失的日期"""
+        storage.add_rates([("2025-08-01", 1300.0, "bna_divisas_historico")])
+        calls = []
+        
+        job = BackfillJob(
+            make_scraper(lambda d: calls.append(d) or {d: 1310.0}), storage, "2025-08-01", "2025-08-04", rate=0
+        ).start()
+        job.join(5)
+        
+        assert job.snapshot()['total'] == 1
+        assert calls == ["2025-08-04"]
+    
+    def test_failure_is_reported(self):
+        """测试任务异常时记录错误"""
+        broken = Mock()
+        broken.find_missing_dates.side_effect = OSError("磁盘错误")
+        
+        job = BackfillJob(make_scraper(lambda d: {}), broken, "2025-08-01", "2025-08-04").start()
+        job.join(5)
+        
+        progress = job.snapshot()
+        assert progress['state'] == JOB_FAILED
+        assert progress['error'] == "磁盘错误"
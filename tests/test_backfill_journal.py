@@ -0,0 +1,99 @@
+"""
+回补检查点日志单元测试
+"""
+
+import json
+
+import pytest
+
+from backfill_journal import BackfillJournal
+
+
+class TestBackfillJournal:
+    """测试回补检查点日志"""
+    
+    @pytest.fixture
+    def path(self, tmp_path):
+        return str(tmp_path / "data" / "backfill_journal.jsonl")
+    
+    def test_record_writes_each_outcome_immediately(self, path):
+        """测试每条结果写入后立即可读"""
+        journal = BackfillJournal(path)
+        journal.start("2025-08-01", "2025-08-05")
+        journal.record("2025-08-05", "ok", ("2025-08-05", 1320.0, "bna_divisas_historico"))
+        journal.record("2025-08-04", "failed")
+        
+        with open(path, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        
+        assert lines[0]['start'] == "2025-08-01"
+        assert lines[1:] == [
+            {'date': "2025-08-05", 'status': "ok", 'rate_sell': 1320.0, 'source': "bna_divisas_historico"},
+            {'date': "2025-08-04", 'status': "failed"},
+        ]
+        journal.close()
+    
+    def test_resume_restores_progress(self, path):
+        """测试续跑时恢复已完成的日期和已抓取的汇率"""
+        journal = BackfillJournal(path)
+        journal.start("2025-08-01", "2025-08-05")
+        journal.record("2025-08-05", "ok", ("2025-08-05", 1320.0, "bna_divisas_historico"))
+        journal.record("2025-08-04", "missing")
+        journal.record("2025-08-01", "failed")
+        journal.close()
+        
+        resumed = BackfillJournal(path)
+        assert resumed.resume("2025-08-01", "2025-08-05")
+        assert resumed.completed() == {"2025-08-05", "2025-08-04"}
+        assert resumed.counts() == {'ok': 1, 'missing': 1, 'failed': 1}
+        
+        # 失败的日期重试成功后以最后一行为准
+        resumed.record("2025-08-01", "ok", ("2025-08-01", 1300.0, "bna_divisas_historico"))
+        resumed.close()
+        
+        reloaded = BackfillJournal(path)
+        assert reloaded.resume("2025-08-01", "2025-08-05")
+        assert reloaded.results() == [
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-05", 1320.0, "bna_divisas_historico"),
+        ]
+        reloaded.close()
+    
+    def test_resume_skips_truncated_line(self, path):
+        """测试进程被终止时写了一半的行被跳过"""
+        journal = BackfillJournal(path)
+        journal.start("2025-08-01", "2025-08-05")
+        journal.record("2025-08-05", "missing")
+        journal.close()
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('{"date": "2025-08-04", "sta')
+        
+        resumed = BackfillJournal(path)
+        assert resumed.resume("2025-08-01", "2025-08-05")
+        assert resumed.completed() == {"2025-08-05"}
+        resumed.record("2025-08-04", "missing")
+        resumed.close()
+        
+        reloaded = BackfillJournal(path)
+        assert reloaded.resume("2025-08-01", "2025-08-05")
+        assert reloaded.completed() == {"2025-08-05", "2025-08-04"}
+        reloaded.close()
+    
+    def test_resume_rejects_other_range(self, path):
+        """测试日期范围或参数不同的日志不能续跑"""
+        journal = BackfillJournal(path)
+        assert not journal.resume("2025-08-01", "2025-08-05")
+        
+        journal.start("2025-08-01", "2025-08-05")
+        journal.close()
+        
+        assert not BackfillJournal(path).resume("2025-08-01", "2025-08-31")
+        assert not BackfillJournal(path).resume("2025-08-01", "2025-08-05", business_days_only=False)
+    
+    def test_remove(self, path):
+        """测试完成后删除日志"""
+        journal = BackfillJournal(path)
+        journal.start("2025-08-01", "2025-08-05")
+        journal.remove()
+        
+        assert not BackfillJournal(path).resume("2025-08-01", "2025-08-05")
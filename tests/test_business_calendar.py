@@ -0,0 +1,59 @@
+"""
+营业日历单元测试
+"""
+
+import pytest
+
+from business_calendar import BusinessCalendar
+
+
+class TestBusinessCalendar:
+    """测试阿根廷银行营业日历"""
+    
+    @pytest.fixture
+    def calendar(self):
+        """不加载覆盖文件的日历"""
+        return BusinessCalendar(holidays_file=None)
+    
+    def test_weekends_are_not_business_days(self, calendar):
+        """测试周末不是营业日"""
+        assert not calendar.is_business_day("2025-06-14")  # 周六
+        assert not calendar.is_business_day("2025-06-15")  # 周日
+        assert calendar.is_business_day("2025-06-13")
+    
+    def test_fixed_and_easter_holidays(self, calendar):
+        """测试固定节假日和复活节相关节假日"""
+        assert calendar.is_holiday("2025-07-09")  # 独立日
+        assert calendar.is_holiday("2025-03-03")  # 狂欢节
+        assert calendar.is_holiday("2025-03-04")
+        assert calendar.is_holiday("2025-04-18")  # 耶稣受难日
+    
+    def test_movable_holidays(self, calendar):
+        """测试可移动节假日按规则平移"""
+        # 2025-06-17 为周二，提前到周一
+        assert calendar.is_holiday("2025-06-16")
+        assert not calendar.is_holiday("2025-06-17")
+        # 2025-11-20 为周四，顺延到下周一
+        assert calendar.is_holiday("2025-11-24")
+        assert not calendar.is_holiday("2025-11-20")
+    
+    def test_business_days_range(self, calendar):
+        """测试营业日列表"""
+        days = calendar.business_days("2025-08-11", "2025-08-17")
+        # 2025-08-15 为旅游性非工作日，16/17 为周末
+        assert days == ["2025-08-11", "2025-08-12", "2025-08-13", "2025-08-14"]
+    
+    def test_override_file(self, tmp_path):
+        """测试节假日覆盖文件可新增和撤销节假日"""
+        override = tmp_path / "holidays.csv"
+        override.write_text(
+            "date,name,closed\n"
+            "2025-08-13,Cierre extraordinario,1\n"
+            "2025-08-15,,0\n",
+            encoding="utf-8"
+        )
+        
+        calendar = BusinessCalendar(holidays_file=str(override))
+        
+        assert not calendar.is_business_day("2025-08-13")
+        assert calendar.is_business_day("2025-08-15")
@@ -0,0 +1,85 @@
+"""
+时间序列降采样单元测试
+"""
+
+import numpy as np
+import pytest
+
+from downsample import downsample, lttb, minmax
+
+
+def naive_lttb(x, y, threshold):
+    """逐点实现的参考版本"""
+    n = len(x)
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for b in range(threshold - 2):
+        lo = int(np.floor(b * bucket_size)) + 1
+        hi = int(np.floor((b + 1) * bucket_size)) + 1
+        next_hi = int(np.floor((b + 2) * bucket_size)) + 1
+        if b == threshold - 3:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x = np.mean(x[hi:next_hi])
+            avg_y = np.mean(y[hi:next_hi])
+        best, best_area = lo, -1.0
+        for i in range(lo, hi):
+            area = abs((x[a] - avg_x) * (y[i] - y[a]) - (x[a] - x[i]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = i, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+class TestDownsample:
+    """测试降采样"""
+    
+    @pytest.fixture
+    def series(self):
+        rng = np.random.default_rng(0)
+        x = np.arange(5000, dtype=np.float64)
+        y = np.cumsum(rng.normal(size=5000)) + 1000
+        return x, y
+    
+    def test_lttb_matches_reference(self, series):
+        """测试向量化实现与逐点实现一致"""
+        x, y = series
+        indices = lttb(x, y, 200)
+        
+        assert len(indices) == 200
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert np.all(np.diff(indices) > 0)
+        np.testing.assert_array_equal(indices, naive_lttb(x, y, 200))
+    
+    def test_short_series_unchanged(self):
+        """测试点数不超过目标时原样返回"""
+        x = np.arange(10)
+        np.testing.assert_array_equal(lttb(x, x, 50), np.arange(10))
+        np.testing.assert_array_equal(minmax(x, 50), np.arange(10))
+    
+    def test_minmax_keeps_extremes(self, series):
+        """测试每个桶的最小值和最大值都被保留"""
+        x, y = series
+        y[1234] = 5000.0
+        y[4321] = -5000.0
+        indices = minmax(y, 100)
+        
+        assert len(indices) <= 202
+        assert np.all(np.diff(indices) > 0)
+        assert {0, 1234, 4321, len(y) - 1} <= set(indices.tolist())
+        for bucket in range(100):
+            lo, hi = bucket * 50, (bucket + 1) * 50
+            chosen = indices[(indices >= lo) & (indices < hi)]
+            assert y[chosen].min() == y[lo:hi].min()
+            assert y[chosen].max() == y[lo:hi].max()
+    
+    def test_downsample_methods(self, series):
+        """测试按方法分派并限制点数"""
+        x, y = series
+        assert len(downsample(x, y, 500, "lttb")) == 500
+        assert len(downsample(x, y, 500, "minmax")) <= 500
+        with pytest.raises(ValueError):
+            downsample(x, y, 500, "mean")
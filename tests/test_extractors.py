@@ -0,0 +1,169 @@
+"""
+页面提取器单元测试
+快速提取器的结果必须与 BeautifulSoup 完整解析一致
+"""
+
+import os
+import json
+
+import pytest
+from unittest.mock import Mock, patch
+
+from extractors import FastExtractor, SoupExtractor, BaseExtractor, StreamScanner, get_extractor
+from scraper import ValorHoySource, HistoricoSource
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pages")
+
+with open(os.path.join(PAGES_DIR, "manifest.json"), encoding="utf-8") as _f:
+    CORPUS = json.load(_f)["pages"]
+
+
+VALORHOY_HTML = """
+<html>
+<head><script>var x = "<tr>";</script></head>
+<body>
+    <div class="fecha">Fecha: 5/8/2025</div>
+    <h3>Dolar U.S.A</h3>
+    <TABLE class="table cotizacion">
+        <THEAD><TR><TH>Moneda</TH><TH>Compra</TH><TH>Venta</TH></TR></THEAD>
+        <TBODY>
+            <TR class="odd">
+                <TD class="tit"><span>Dolar U.S.A</span></TD>
+                <TD>1.290,0000</TD>
+                <TD>1.310,0000</TD>
+            </TR>
+            <TR><TD>Euro &amp; Co</TD><TD>1.400,00</TD><TD>1.500,00</TD></TR>
+        </TBODY>
+    </TABLE>
+</body>
+</html>
+"""
+
+HISTORICO_HTML = """
+<table>
+    <tr><th>Moneda</th><th>Compra</th><th>Venta</th><th>Fecha</th></tr>
+    <tr><td>Dolar U.S.A</td><td>1.280,0000</td><td>1.300,0000</td><td>11/8/2025</td></tr>
+    <tr><td>Dolar U.S.A</td><td>1.290,0000</td><td>1.310,0000</td><td>12/8/2025</td></tr>
+</table>
+"""
+
+
+class TestExtractors:
+    """测试快速提取器与 BeautifulSoup 结果一致"""
+    
+    @pytest.mark.parametrize("html", [VALORHOY_HTML, HISTORICO_HTML])
+    def test_fast_matches_soup(self, html):
+        """测试两种提取器找到相同的行和日期"""
+        fast, soup = FastExtractor(), SoupExtractor()
+        
+        assert fast.find_rows(html, "Dolar U.S.A") == soup.find_rows(html, "Dolar U.S.A")
+        fast_date, soup_date = fast.find_date_text(html), soup.find_date_text(html)
+        # BeautifulSoup 返回整个文本节点，快速提取器只返回匹配片段
+        assert (fast_date is None) == (soup_date is None)
+        if fast_date:
+            assert fast_date in soup_date
+    
+    def test_fast_extracts_valorhoy_row(self):
+        """测试快速提取器解析带标签和大写标签的行"""
+        rows = FastExtractor().find_rows(VALORHOY_HTML, "Dolar U.S.A")
+        
+        assert rows == [["Dolar U.S.A", "1.290,0000", "1.310,0000"]]
+    
+    def test_unclosed_cells(self):
+        """测试省略 </td> 的单元格"""
+        html = "<table><tr><td>Dolar U.S.A<td>1.280,0000<td>1.300,0000<td>11/8/2025</tr></table>"
+        
+        rows = FastExtractor().find_rows(html, "Dolar U.S.A")
+        
+        assert rows == [["Dolar U.S.A", "1.280,0000", "1.300,0000", "11/8/2025"]]
+    
+    def test_marker_outside_row_is_ignored(self):
+        """测试表格外的标记文本不会被当作数据行"""
+        html = "<table><tr><td>Euro</td></tr></table><h3>Dolar U.S.A</h3>"
+        
+        assert FastExtractor().find_rows(html, "Dolar U.S.A") == []
+    
+    def test_get_extractor(self):
+        """测试按名称创建提取器"""
+        assert isinstance(get_extractor("fast"), FastExtractor)
+        with pytest.raises(ValueError):
+            get_extractor("unknown")
+
+    def test_incomplete_extractor_cannot_be_created(self):
+        """测试未实现全部接口的提取器在创建时就报错"""
+        class DateOnlyExtractor(BaseExtractor):
+            def find_date_text(self, html):
+                return None
+        
+        with pytest.raises(TypeError):
+            DateOnlyExtractor()
+
+
+class TestCorpus:
+    """使用完整尺寸样例页面验证每个提取器的解析结果"""
+    
+    @pytest.mark.parametrize("extractor_name", ["fast", "soup"])
+    @pytest.mark.parametrize("page_name", sorted(CORPUS))
+    def test_corpus_page(self, page_name, extractor_name):
+        """测试样例页面解析结果与清单一致"""
+        info = CORPUS[page_name]
+        with open(os.path.join(PAGES_DIR, page_name), encoding="utf-8") as f:
+            html = f.read()
+        extractor = get_extractor(extractor_name)
+        
+        if info["kind"] == "valorhoy":
+            result = ValorHoySource()._parse_page(html, extractor)
+            expected = tuple(info["expected"]) if info["expected"] else None
+        else:
+            result = HistoricoSource()._parse_rows(html, extractor)
+            expected = info["expected"]
+        
+        assert result == expected
+
+
+class TestStreamScanner:
+    """测试流式扫描器"""
+    
+    def test_ready_only_after_date_and_complete_row(self):
+        """测试日期和完整的标记行都出现后才提示解析"""
+        scanner = StreamScanner("Dolar U.S.A")
+        
+        assert not scanner.feed("<div>Fecha: 5/8/20")
+        assert not scanner.feed("25</div><table><tr><td>Dolar U.")
+        assert not scanner.feed("S.A</td><td>1,0</td><td>2,0</td>")
+        assert scanner.feed("</tr><tr>")
+        assert scanner.date_seen
+    
+    def test_marker_outside_row_reports_again_for_real_row(self):
+        """测试标记先出现在标题中时，真正的数据行读完后会再次提示"""
+        scanner = StreamScanner("Dolar U.S.A")
+        
+        assert scanner.feed("Fecha: 5/8/2025<h3>Dolar U.S.A</h3><table><tr>")
+        assert not scanner.feed("<td>Euro</td>")
+        assert scanner.feed("<td>Dolar U.S.A</td><td>1</td><td>2</td></tr>")
+
+
+class TestExtractorFallback:
+    """测试快速提取失败时退回 BeautifulSoup"""
+    
+    @patch('scraper.requests.Session')
+    def test_fallback_to_soup(self, mock_session):
+        """测试主提取器找不到数据时使用备用提取器"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = VALORHOY_HTML.encode('utf-8')
+        
+        mock_session_instance = Mock()
+        mock_session_instance.get.return_value = mock_response
+        mock_session.return_value = mock_session_instance
+        
+        broken = Mock(spec=BaseExtractor)
+        broken.name = "broken"
+        broken.find_date_text.return_value = None
+        broken.find_rows.return_value = []
+        
+        scraper = ValorHoySource(extractor=broken)
+        result = scraper.scrape()
+        
+        assert result == ("2025-08-05", 1310.0, "bna_divisas_valorhoy")
+        broken.find_date_text.assert_called_once()
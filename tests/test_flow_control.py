@@ -0,0 +1,193 @@
+"""
+自适应流量控制与熔断器单元测试
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from flow_control import (
+    AdaptiveController, CircuitBreaker, CircuitOpenError,
+    CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+)
+from scraper import HistoricoSource
+
+
+def make_controller(**kwargs):
+    params = dict(
+        max_concurrency=8,
+        max_rate=0,
+        latency_target=1.0,
+        breaker=CircuitBreaker("test", failure_threshold=3, min_samples=100, reset_timeout=0.2),
+    )
+    params.update(kwargs)
+    return AdaptiveController("test", **params)
+
+
+def run_request(controller, failed=False):
+    started = controller.acquire()
+    controller.release(started, failed)
+
+
+class TestAdaptiveController:
+    """测试 AIMD 调整"""
+    
+    def test_multiplicative_decrease_once_per_congestion(self):
+        """测试失败时并发数和速率减半，同一批请求只减一次"""
+        controller = make_controller(max_rate=8.0, rate_step=0)
+        in_flight = [controller.acquire() for _ in range(4)]
+        
+        controller.release(in_flight[0], True)
+        assert controller.limit == 4
+        assert controller.rate == 4.0
+        
+        # 在减小之前发出的请求再失败不再重复减小
+        controller.release(in_flight[1], True)
+        assert controller.limit == 4
+        assert controller.rate == 4.0
+        
+        for started in in_flight[2:]:
+            controller.release(started, False)
+        run_request(controller, failed=True)
+        assert int(controller.limit) == 2
+        assert controller.rate == 2.0
+    
+    def test_additive_increase_up_to_max(self):
+        """测试成功请求使并发数每轮加一，且不超过上限"""
+        controller = make_controller(max_concurrency=4)
+        controller.limit = 2.0
+        
+        run_request(controller)
+        run_request(controller)
+        assert controller.limit == pytest.approx(2.9, abs=0.01)
+        
+        for _ in range(50):
+            run_request(controller)
+        assert controller.limit == 4
+    
+    def test_slow_request_counts_as_congestion(self):
+        """测试耗时超过目标时同样减小"""
+        controller = make_controller(latency_target=0.05)
+        started = controller.acquire()
+        time.sleep(0.08)
+        controller.release(started, False)
+        
+        assert controller.limit == 4
+        assert controller.breaker.state == CIRCUIT_CLOSED
+    
+    def test_configure_sets_limits(self):
+        """测试按调用参数调整上限，已降低的值只截断不提升"""
+        controller = make_controller(max_concurrency=1, max_rate=2.0)
+        controller.configure(8, 0)
+        assert controller.limit == 8
+        assert controller.rate == 0
+        
+        controller.configure(4, 10.0)
+        assert controller.limit == 4
+        assert controller.rate == 10.0
+        
+        run_request(controller, failed=True)
+        controller.configure(16, 20.0)
+        assert controller.limit == 2
+        assert controller.rate == 5.0
+    
+    def test_concurrency_gate(self):
+        """测试并发数达到上限时等待名额"""
+        controller = make_controller(max_concurrency=2)
+        first = controller.acquire()
+        controller.acquire()
+        acquired = threading.Event()
+        
+        def third():
+            controller.acquire()
+            acquired.set()
+        
+        thread = threading.Thread(target=third, daemon=True)
+        thread.start()
+        assert not acquired.wait(0.2)
+        
+        controller.release(first, False)
+        assert acquired.wait(1.0)
+        assert controller.snapshot()['in_flight'] == 2
+
+
+class TestCircuitBreaker:
+    """测试熔断器"""
+    
+    def test_opens_after_failure_burst(self):
+        """测试连续失败后打开，请求直接被拒绝"""
+        controller = make_controller()
+        for _ in range(3):
+            run_request(controller, failed=True)
+        
+        assert controller.breaker.state == CIRCUIT_OPEN
+        assert controller.limit == 1
+        with pytest.raises(CircuitOpenError):
+            controller.acquire()
+    
+    def test_opens_on_error_rate(self):
+        """测试窗口内错误率过高时打开"""
+        breaker = CircuitBreaker("test", failure_threshold=100, error_rate=0.5, min_samples=4)
+        controller = make_controller(breaker=breaker)
+        for failed in (True, False, True, False, True):
+            run_request(controller, failed)
+        
+        assert breaker.state == CIRCUIT_OPEN
+    
+    def test_half_open_probe_closes(self):
+        """测试到期后只放行一个探测请求，成功后关闭"""
+        controller = make_controller()
+        for _ in range(3):
+            run_request(controller, failed=True)
+        time.sleep(0.25)
+        
+        probe = controller.acquire()
+        assert controller.breaker.state == CIRCUIT_HALF_OPEN
+        assert not controller.breaker.allow()
+        
+        controller.release(probe, False)
+        assert controller.breaker.state == CIRCUIT_CLOSED
+        run_request(controller)
+    
+    def test_failed_probe_reopens(self):
+        """测试探测失败后重新打开"""
+        controller = make_controller()
+        for _ in range(3):
+            run_request(controller, failed=True)
+        time.sleep(0.25)
+        
+        run_request(controller, failed=True)
+        assert controller.breaker.state == CIRCUIT_OPEN
+        with pytest.raises(CircuitOpenError):
+            controller.acquire()
+    
+    def test_requests_before_open_are_ignored(self):
+        """测试熔断前发出的请求在半开状态下完成时不影响状态"""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.2)
+        straggler = time.monotonic()
+        breaker.record(time.monotonic(), True, 1.0, 1)
+        time.sleep(0.25)
+        
+        assert breaker.allow()
+        probe = time.monotonic()
+        assert breaker.record(straggler, False, 0.0, 1) is None
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert breaker.record(probe, False, 0.0, 1) == CIRCUIT_CLOSED
+
+
+class TestSourceIntegration:
+    """测试数据源请求经过控制器"""
+    
+    def test_server_errors_trip_breaker(self):
+        """测试服务端持续 503 时熔断，之后不再发送请求"""
+        session = Mock()
+        session.get.return_value = Mock(status_code=503, text="busy")
+        source = HistoricoSource(session=session, controller=make_controller())
+        
+        for _ in range(5):
+            assert source._make_request("https://www.bna.com.ar/") is None
+        
+        assert session.get.call_count == 3
+        assert source.controller.snapshot()['state'] == CIRCUIT_OPEN
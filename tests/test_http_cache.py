@@ -0,0 +1,160 @@
+"""
+HTTP 缓存单元测试
+"""
+
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+
+from constants import HISTORICO_URL, HISTORICO_CACHE_TTL, HISTORICO_PAST_CACHE_TTL
+from http_cache import HttpCache
+from scraper import BaseScraper, HistoricoSource
+
+
+def make_response(status_code, content=b"", headers=None):
+    """构造模拟响应"""
+    response = Mock()
+    response.status_code = status_code
+    response.content = content
+    response.headers = headers or {}
+    response.encoding = "utf-8"
+    return response
+
+
+class TestHttpCache:
+    """测试磁盘缓存"""
+    
+    def test_store_and_get(self, tmp_path):
+        """测试保存后可以读回内容和校验头"""
+        cache = HttpCache(cache_dir=str(tmp_path))
+        key = cache.make_key("https://example.com/page", {"fecha": "01/08/2025"})
+        cache.store(key, "https://example.com/page",
+                    make_response(200, b"<html>ok</html>", {"ETag": '"abc"'}))
+        
+        # 重新加载索引，确认已持久化
+        cache = HttpCache(cache_dir=str(tmp_path))
+        entry = cache.get(key)
+        
+        assert entry is not None
+        assert cache.conditional_headers(entry) == {"If-None-Match": '"abc"'}
+        assert cache.build_response(entry, key).content == b"<html>ok</html>"
+    
+    def test_is_fresh(self, tmp_path):
+        """测试缓存有效期"""
+        cache = HttpCache(cache_dir=str(tmp_path))
+        entry = {"stored_at": 0}
+        
+        assert not cache.is_fresh(entry, 60)
+        assert cache.is_fresh(entry, float('inf'))
+    
+    def test_lru_eviction(self, tmp_path):
+        """测试超出大小上限时淘汰最久未访问的条目"""
+        cache = HttpCache(cache_dir=str(tmp_path), max_bytes=25)
+        for name in ("a", "b"):
+            cache.store(name, f"https://example.com/{name}", make_response(200, b"x" * 10))
+        
+        # 访问 a 之后，b 成为最久未访问的条目
+        cache.get("a")
+        cache.store("c", "https://example.com/c", make_response(200, b"x" * 10))
+        
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+
+
+class TestCachedRequest:
+    """测试 BaseScraper 的条件请求"""
+    
+    @patch('scraper.requests.Session')
+    def test_fresh_entry_skips_network(self, mock_session, tmp_path):
+        """测试有效期内不发送请求"""
+        mock_session_instance = Mock()
+        mock_session_instance.get.return_value = make_response(200, b"page")
+        mock_session.return_value = mock_session_instance
+        
+        scraper = BaseScraper(cache=HttpCache(cache_dir=str(tmp_path)))
+        scraper._make_request("https://example.com/page", cache_ttl=float('inf'))
+        response = scraper._make_request("https://example.com/page", cache_ttl=float('inf'))
+        
+        assert response.content == b"page"
+        assert mock_session_instance.get.call_count == 1
+    
+    @patch('scraper.requests.Session')
+    def test_not_modified_served_from_cache(self, mock_session, tmp_path):
+        """测试过期后发送条件请求，304 时使用缓存内容"""
+        mock_session_instance = Mock()
+        mock_session_instance.get.side_effect = [
+            make_response(200, b"page", {"ETag": '"v1"', "Last-Modified": "Fri, 01 Aug 2025 00:00:00 GMT"}),
+            make_response(304),
+        ]
+        mock_session.return_value = mock_session_instance
+        
+        scraper = BaseScraper(cache=HttpCache(cache_dir=str(tmp_path)))
+        scraper._make_request("https://example.com/page")
+        response = scraper._make_request("https://example.com/page")
+        
+        assert response.status_code == 200
+        assert response.content == b"page"
+        headers = mock_session_instance.get.call_args_list[1].kwargs["headers"]
+        assert headers == {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Fri, 01 Aug 2025 00:00:00 GMT",
+        }
+
+
+HISTORICO_PAGE = b"""
+<table>
+    <tr><th>Moneda</th><th>Compra</th><th>Venta</th><th>Fecha</th></tr>
+    <tr><td>Dolar U.S.A</td><td>1.280,0000</td><td>1.300,0000</td><td>11/8/2025</td></tr>
+</table>
+"""
+
+
+class TestHistoricoCaching:
+    """测试 Historico 页面只在解析成功后缓存"""
+    
+    def make_source(self, tmp_path, *responses):
+        session = Mock()
+        session.get.side_effect = list(responses)
+        return HistoricoSource(cache=HttpCache(cache_dir=str(tmp_path)), session=session), session
+    
+    def test_page_with_rows_cached(self, tmp_path):
+        """测试解析出报价的历史页面永久缓存"""
+        source, session = self.make_source(tmp_path, make_response(200, HISTORICO_PAGE))
+        
+        assert source.scrape_rows("2025-08-11") == {"2025-08-11": 1300.0}
+        assert source.scrape_rows("2025-08-11") == {"2025-08-11": 1300.0}
+        assert session.get.call_count == 1
+    
+    def test_empty_page_not_cached(self, tmp_path):
+        """测试没有报价的页面不缓存，下次重新请求"""
+        source, session = self.make_source(
+            tmp_path,
+            make_response(200, b"<html>sin datos</html>"),
+            make_response(200, HISTORICO_PAGE),
+        )
+        
+        assert source.scrape_rows("2025-08-11") == {}
+        assert source.scrape_rows("2025-08-11") == {"2025-08-11": 1300.0}
+        assert session.get.call_count == 2
+    
+    def test_cached_empty_page_discarded(self, tmp_path):
+        """测试已缓存的空页面被丢弃"""
+        source, session = self.make_source(tmp_path, make_response(200, HISTORICO_PAGE))
+        key = source.cache.make_key(HISTORICO_URL, {'fecha': "11/08/2025", 'filtroDolar': '1', 'id': 'monedas'})
+        source.cache.store(key, HISTORICO_URL, make_response(200, b"<html>sin datos</html>"))
+        
+        assert source.scrape_rows("2025-08-11") == {}
+        assert source.cache.get(key) is None
+        assert source.scrape_rows("2025-08-11") == {"2025-08-11": 1300.0}
+    
+    def test_recent_dates_use_short_ttl(self, tmp_path):
+        """测试最近几天的页面按当日有效期缓存"""
+        source, session = self.make_source(tmp_path, make_response(200, HISTORICO_PAGE))
+        recent = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        
+        with patch.object(source, '_make_request', return_value=None) as mock_request:
+            source.scrape_rows(recent)
+            source.scrape_rows("2025-08-11")
+        
+        assert mock_request.call_args_list[0].kwargs['cache_ttl'] == HISTORICO_CACHE_TTL
+        assert mock_request.call_args_list[1].kwargs['cache_ttl'] == HISTORICO_PAST_CACHE_TTL
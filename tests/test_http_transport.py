@@ -0,0 +1,163 @@
+"""
+共享 HTTP 传输单元测试
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from constants import RETRY_STATUS_CODES
+from http_transport import JitterRetry, create_session, ensure_pool_size
+from scraper import ScraperManager
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """按顺序返回预设的 (状态码, 响应头) 列表，之后一直返回 200"""
+    
+    script = []
+    hits = []
+    
+    def do_GET(self):
+        self.hits.append(time.monotonic())
+        status, headers = self.script.pop(0) if self.script else (200, {})
+        body = b"ok" if status == 200 else b"busy"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    ScriptedHandler.script = []
+    ScriptedHandler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_test_retry(**kwargs):
+    params = dict(
+        total=3,
+        allowed_methods=frozenset({'GET'}),
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=0.05,
+        raise_on_status=False,
+        max_backoff=0.2,
+    )
+    params.update(kwargs)
+    return JitterRetry(**params)
+
+
+class TestJitterRetry:
+    """测试重试策略"""
+    
+    def test_full_jitter_bounds(self):
+        """测试退避时间在 0 到 min(上限, base * 2^(n-1)) 之间"""
+        retry = make_test_retry(total=10, backoff_factor=1.0, max_backoff=4.0)
+        assert retry.get_backoff_time() == 0
+        
+        waits = []
+        for attempt in range(1, 6):
+            retry = retry.increment(method="GET", url="/", error=requests.exceptions.ConnectionError())
+            wait = retry.get_backoff_time()
+            assert 0 <= wait <= min(4.0, 2 ** (attempt - 1))
+            # 同一状态重复读取得到同一个值
+            assert retry.get_backoff_time() == wait
+            waits.append(wait)
+        assert len(set(waits)) > 1
+    
+    def test_retries_server_errors(self, server):
+        """测试 503 后重试成功"""
+        ScriptedHandler.script = [(503, {}), (502, {})]
+        session = create_session(2, retry=make_test_retry())
+        
+        response = session.get(server, timeout=5)
+        
+        assert response.status_code == 200
+        assert len(ScriptedHandler.hits) == 3
+    
+    def test_honours_retry_after(self, server):
+        """测试 429 按 Retry-After 等待"""
+        ScriptedHandler.script = [(429, {"Retry-After": "1"})]
+        session = create_session(1, retry=make_test_retry())
+        
+        response = session.get(server, timeout=5)
+        
+        assert response.status_code == 200
+        assert ScriptedHandler.hits[1] - ScriptedHandler.hits[0] >= 0.9
+    
+    def test_deadline_stops_retries(self, server):
+        """测试等待会超出总时限时不再重试，直接返回最后一个响应"""
+        ScriptedHandler.script = [(503, {"Retry-After": "30"})]
+        session = create_session(1, retry=make_test_retry(deadline=2.0))
+        
+        started = time.monotonic()
+        response = session.get(server, timeout=5)
+        
+        assert response.status_code == 503
+        assert time.monotonic() - started < 2.0
+        assert len(ScriptedHandler.hits) == 1
+    
+    def test_exhausted_returns_last_response(self, server):
+        """测试重试次数用完后返回最后一个响应"""
+        ScriptedHandler.script = [(503, {})] * 5
+        session = create_session(1, retry=make_test_retry(total=2))
+        
+        response = session.get(server, timeout=5)
+        
+        assert response.status_code == 503
+        assert len(ScriptedHandler.hits) == 3
+
+
+class TestSharedSession:
+    """测试共享会话"""
+    
+    def test_pool_matches_concurrency(self):
+        """测试连接池大小与并发数一致"""
+        session = create_session(6)
+        adapter = session.get_adapter("https://www.bna.com.ar/")
+        
+        assert adapter._pool_connections == 6
+        assert adapter._pool_maxsize == 6
+        assert isinstance(adapter.max_retries, JitterRetry)
+        assert session.get_adapter("http://example.com/") is adapter
+    
+    def test_ensure_pool_size_grows_pool(self):
+        """测试并发数超过连接池时扩大连接池，重试策略不变"""
+        session = create_session(1)
+        retry = session.get_adapter("https://www.bna.com.ar/").max_retries
+        
+        ensure_pool_size(session, 8)
+        adapter = session.get_adapter("https://www.bna.com.ar/")
+        assert adapter.pool_size == 8
+        assert adapter.max_retries is retry
+        
+        ensure_pool_size(session, 4)
+        assert session.get_adapter("https://www.bna.com.ar/") is adapter
+    
+    def test_sources_share_session(self):
+        """测试所有数据源共用一个会话"""
+        manager = ScraperManager(pool_size=3)
+        
+        assert manager.valorhoy_source.session is manager.session
+        assert manager.historico_source.session is manager.session
+        assert manager.session.get_adapter("https://www.bna.com.ar/")._pool_maxsize == 3
+    
+    def test_request_exception_returns_none(self):
+        """测试重试耗尽后的异常不向上抛出"""
+        manager = ScraperManager()
+        with patch.object(manager.session, "get", side_effect=requests.exceptions.RetryError("gave up")):
+            assert manager.historico_source._make_request("https://www.bna.com.ar/") is None
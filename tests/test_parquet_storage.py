@@ -0,0 +1,105 @@
+"""
+Parquet 存储模块单元测试
+使用临时目录中的分区文件
+"""
+
+import csv
+from datetime import datetime
+
+import pytest
+from unittest.mock import patch
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from parquet_storage import ParquetRateStorage
+
+
+class TestParquetRateStorage:
+    """测试 Parquet 存储"""
+    
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return ParquetRateStorage(root_dir=str(tmp_path / "rates_parquet"))
+    
+    @pytest.fixture
+    def filled(self, storage):
+        storage.add_rates([
+            ("2025-06-30", 1200.0, "bna_divisas_historico"),
+            ("2025-07-01", 1250.0, "bna_divisas_historico"),
+            ("2025-07-31", 1280.0, "bna_divisas_valorhoy"),
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+        ])
+        return storage
+    
+    def test_month_partitions_and_schema(self, filled):
+        """测试按年月分区并使用带类型的列"""
+        assert filled._partitions() == [(2025, 6), (2025, 7), (2025, 8)]
+        
+        schema = pq.read_schema(filled._partition_path((2025, 7)))
+        assert schema.field('date').type == pa.date32()
+        assert schema.field('rate_sell').type == pa.float64()
+        assert pa.types.is_dictionary(schema.field('source').type)
+    
+    def test_add_rates_outcomes(self, filled):
+        """测试更新已有日期和同批覆盖"""
+        outcomes = filled.add_rates([
+            ("2025-07-01", 1251.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+            ("2025-08-04", 1311.0, "bna_divisas_historico"),
+            ("2025-08-05", -1, "bna_divisas_historico"),
+        ])
+        
+        assert [o['status'] for o in outcomes] == ['updated', 'superseded', 'added', 'invalid']
+        rows = filled.get_date_range("2025-07-01", "2025-08-31")
+        assert [(r['date'], r['rate_sell']) for r in rows] == [
+            ("2025-07-01", 1251.0), ("2025-07-31", 1280.0), ("2025-08-01", 1300.0), ("2025-08-04", 1311.0),
+        ]
+    
+    def test_date_range_prunes_partitions(self, filled):
+        """测试范围查询只打开重叠的分区并只读取需要的列"""
+        with patch('parquet_storage.pq.read_table', wraps=pq.read_table) as mock_read_table:
+            rows = filled.get_date_range("2025-07-15", "2025-07-31", columns=['date', 'rate_sell'])
+        
+        assert rows == [{'date': "2025-07-31", 'rate_sell': 1280.0}]
+        assert mock_read_table.call_count == 1
+        assert mock_read_table.call_args[0][0] == filled._partition_path((2025, 7))
+    
+    def test_stats_and_all_rates(self, filled, storage):
+        """测试统计信息和全部数据"""
+        stats = filled.get_stats()
+        assert stats['total_records'] == 4
+        assert stats['date_range'] == {'start': "2025-06-30", 'end': "2025-08-01"}
+        assert stats['sources'] == {'bna_divisas_historico': 3, 'bna_divisas_valorhoy': 1}
+        
+        assert [r['date'] for r in filled.get_all_rates()] == ["2025-08-01", "2025-07-31", "2025-07-01", "2025-06-30"]
+        assert len(filled.get_recent_rates(2)) == 2
+    
+    def test_empty_store(self, storage):
+        assert storage.get_stats() == {'total_records': 0, 'date_range': None, 'sources': {}}
+        assert storage.get_all_rates() == []
+        assert storage.get_date_range("2025-01-01", "2025-12-31") == []
+    
+    def test_import_csv(self, storage, tmp_path):
+        """测试从 CSV 导入并保留抓取时间"""
+        csv_path = str(tmp_path / "rates.csv")
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['date', 'rate_sell', 'source', 'fetched_at'])
+            writer.writerow(['2025-07-31', '1280.0', 'bna_divisas_historico', '2025-08-01T10:00:00'])
+            writer.writerow(['2025-08-01', '1300.0', 'bna_divisas_valorhoy', '2025-08-01T12:00:00'])
+        
+        assert storage.import_csv(csv_path) == 2
+        assert storage._partitions() == [(2025, 7), (2025, 8)]
+        assert storage.get_recent_rates(1)[0]['fetched_at'] == datetime(2025, 8, 1, 12, 0)
+    
+    def test_find_missing_dates(self, filled):
+        """测试缺失日期检测"""
+        assert filled.find_missing_dates("2025-07-29", "2025-08-04") == ["2025-07-29", "2025-07-30", "2025-08-04"]
+    
+    def test_version_changes_after_write(self, filled):
+        """测试写入后版本标记变化"""
+        before = filled.version()
+        filled.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        assert filled.version() != before
+        assert filled.version() == filled.version()
@@ -0,0 +1,187 @@
+"""
+解析器性能基准测试
+使用 tests/fixtures/pages 中的完整尺寸样例页面，统计每个提取器的单页解析
+耗时、内存分配峰值和吞吐量，超过已保存基线的容忍倍数时测试失败。
+
+默认的 pytest 运行会跳过（pytest.ini 中的 -m "not benchmark"），需要显式选择:
+
+运行并查看报告:   pytest -m benchmark tests/test_parser_benchmark.py -s
+更新基线:         BENCH_UPDATE_BASELINE=1 pytest -m benchmark tests/test_parser_benchmark.py
+调整容忍倍数:     BENCH_TOLERANCE=5 pytest -m benchmark tests/test_parser_benchmark.py
+"""
+
+import os
+import json
+import time
+import statistics
+import tracemalloc
+
+import pytest
+
+from extractors import EXTRACTORS, get_extractor
+from scraper import BaseScraper, ValorHoySource, HistoricoSource
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGES_DIR = os.path.join(FIXTURES_DIR, "pages")
+BASELINE_PATH = os.path.join(FIXTURES_DIR, "benchmark_baseline.json")
+
+TOLERANCE = float(os.environ.get("BENCH_TOLERANCE", "3.0"))
+UPDATE_BASELINE = os.environ.get("BENCH_UPDATE_BASELINE") == "1"
+
+# 每个提取器的计时轮数，BeautifulSoup 较慢，轮数少一些
+ROUNDS = {"fast": 30, "soup": 3}
+
+pytestmark = pytest.mark.benchmark
+
+
+def load_manifest() -> dict:
+    with open(os.path.join(PAGES_DIR, "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_page(name: str) -> str:
+    with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def calibrate() -> float:
+    """
+    测量一段固定纯 Python 负载的耗时
+    
+    基线和本次运行各自记录校准耗时，按比例换算后再比较，
+    抵消不同机器之间的速度差异。
+    """
+    def workload():
+        total = 0
+        text = "1.292,5000 " * 50
+        for i in range(20000):
+            total += len(text.split(",")) + i % 7
+        return total
+    
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        workload()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure(func, rounds: int) -> dict:
+    """测量函数的中位耗时和内存分配峰值"""
+    func()  # 预热
+    
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    median = statistics.median(timings)
+    return {
+        "seconds": median,
+        "peak_bytes": peak,
+        "per_second": 1 / median if median > 0 else float("inf"),
+    }
+
+
+@pytest.fixture(scope="module")
+def bench(request):
+    """收集本模块的测量结果，结束时输出报告并按需更新基线"""
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            baseline = json.load(f)
+    
+    state = {
+        "baseline": baseline,
+        "calibration": calibrate(),
+        "results": {},
+    }
+    yield state
+    
+    reporter = request.config.pluginmanager.get_plugin("terminalreporter")
+    if reporter is not None:
+        reporter.write_line("")
+        reporter.write_line(f"{'基准项':<45}{'耗时(ms)':>12}{'峰值内存(KB)':>16}{'吞吐(次/秒)':>14}")
+        for name, result in sorted(state["results"].items()):
+            reporter.write_line(
+                f"{name:<45}{result['seconds'] * 1000:>12.3f}"
+                f"{result['peak_bytes'] / 1024:>16.1f}{result['per_second']:>14.1f}"
+            )
+    
+    if UPDATE_BASELINE:
+        data = {
+            "corpus_version": load_manifest()["corpus_version"],
+            "calibration_seconds": state["calibration"],
+            "results": {name: result["seconds"] for name, result in sorted(state["results"].items())},
+        }
+        with open(BASELINE_PATH, "w", encoding="utf-8", newline="\n") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def check_regression(bench: dict, name: str, result: dict):
+    """与基线比较，超过容忍倍数时失败"""
+    bench["results"][name] = result
+    if UPDATE_BASELINE:
+        return
+    
+    baseline = bench["baseline"]
+    baseline_seconds = baseline.get("results", {}).get(name)
+    if baseline_seconds is None:
+        pytest.skip(f"基线中没有 {name}，请使用 BENCH_UPDATE_BASELINE=1 生成")
+    
+    if baseline.get("corpus_version") != load_manifest()["corpus_version"]:
+        pytest.skip("样例页面版本与基线不一致，请重新生成基线")
+    
+    speed_ratio = bench["calibration"] / baseline["calibration_seconds"]
+    limit = baseline_seconds * speed_ratio * TOLERANCE
+    assert result["seconds"] <= limit, (
+        f"{name} 性能回退: {result['seconds'] * 1000:.3f}ms > "
+        f"{limit * 1000:.3f}ms (基线 {baseline_seconds * 1000:.3f}ms x 机器系数 {speed_ratio:.2f} x {TOLERANCE})"
+    )
+
+
+PAGE_CASES = [
+    (extractor_name, page_name)
+    for extractor_name in EXTRACTORS
+    for page_name in sorted(load_manifest()["pages"])
+]
+
+
+@pytest.mark.parametrize("extractor_name,page_name", PAGE_CASES)
+def test_page_parse_benchmark(bench, extractor_name, page_name):
+    """单页解析耗时"""
+    info = load_manifest()["pages"][page_name]
+    html = load_page(page_name)
+    extractor = get_extractor(extractor_name)
+    
+    if info["kind"] == "valorhoy":
+        source = ValorHoySource()
+        parse = lambda: source._parse_page(html, extractor)
+    else:
+        source = HistoricoSource()
+        parse = lambda: source._parse_rows(html, extractor)
+    
+    result = measure(parse, ROUNDS[extractor_name])
+    check_regression(bench, f"{extractor_name}/{page_name}", result)
+
+
+def test_parse_rate_value_benchmark(bench):
+    """汇率值解析耗时（每 1000 次调用）"""
+    scraper = BaseScraper()
+    samples = ["1.292,5000", "1292.50", " 1.234,5678 ", "invalid", "0", "1.330,0000"] * 166 + ["1.1,1"] * 4
+    
+    def parse_all():
+        for sample in samples:
+            scraper._parse_rate_value(sample)
+    
+    result = measure(parse_all, 20)
+    check_regression(bench, "parse_rate_value/1000", result)
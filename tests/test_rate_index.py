@@ -0,0 +1,66 @@
+"""
+汇率二进制索引单元测试
+"""
+
+import pytest
+
+from rate_index import RateIndex, HEADER, RECORD_DTYPE
+
+SIGNATURE = (100, 1, 1)
+
+
+class TestRateIndex:
+    """测试内存映射索引"""
+    
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = RateIndex(str(tmp_path / "rates.csv.idx"))
+        index.build([
+            ("2025-08-04", 1310.0),
+            ("2025-08-01", "1300.0"),
+            ("2025-08-05", 1320.0),
+        ], SIGNATURE)
+        return index
+    
+    def test_lookup(self, index):
+        """测试单日查询"""
+        assert index.lookup("2025-08-01") == 1300.0
+        assert index.lookup("2025-08-05") == 1320.0
+        assert index.lookup("2025-08-02") is None
+        assert index.lookup("2030-01-01") is None
+    
+    def test_lookup_range(self, index):
+        """测试范围查询按日期升序"""
+        assert index.lookup_range("2025-08-02", "2025-08-31") == [("2025-08-04", 1310.0), ("2025-08-05", 1320.0)]
+        assert index.lookup_range("2025-07-01", "2025-07-31") == []
+    
+    def test_fixed_width_layout(self, index):
+        """测试文件为文件头加定长记录"""
+        assert RECORD_DTYPE.itemsize == 12
+        with open(index.path, 'rb') as f:
+            assert len(f.read()) == HEADER.size + 3 * RECORD_DTYPE.itemsize
+    
+    def test_upsert_overwrite_and_append(self, index):
+        """测试原地覆盖已有日期并追加更晚的日期"""
+        assert index.upsert([("2025-08-04", 1312.0), ("2025-08-06", 1330.0)], (200, 2, 1))
+        
+        reopened = RateIndex(index.path)
+        assert reopened.load()
+        assert reopened.signature == (200, 2, 1)
+        assert len(reopened) == 4
+        assert reopened.lookup("2025-08-04") == 1312.0
+        assert reopened.lookup("2025-08-06") == 1330.0
+    
+    def test_upsert_insert_requires_rebuild(self, index):
+        """测试在中间插入日期时要求重建"""
+        assert not index.upsert([("2025-08-02", 1305.0)], (200, 2, 1))
+        assert index.signature == SIGNATURE
+        assert index.lookup("2025-08-02") is None
+    
+    def test_invalid_file(self, tmp_path):
+        """测试文件不存在或格式不符时无法加载"""
+        path = tmp_path / "rates.csv.idx"
+        assert not RateIndex(str(path)).load()
+        
+        path.write_bytes(b"not an index" * 4)
+        assert not RateIndex(str(path)).load()
@@ -7,7 +7,7 @@ import pytest
 from unittest.mock import Mock, patch
 from bs4 import BeautifulSoup
 
-from scraper import ValorHoySource, HistoricoSource, BaseScraper
+from scraper import ValorHoySource, HistoricoSource, BaseScraper, RateLimiter
 
 
 class TestBaseScraper:
@@ -35,6 +35,25 @@ class TestBaseScraper:
         
         result = scraper._parse_rate_value("0")
         assert result is None
+    
+    def test_streamed_error_reads_preview_and_closes(self):
+        """测试流式请求返回错误时只读取开头用于日志，并关闭响应归还连接"""
+        consumed = []
+        
+        def iter_content(chunk_size=None):
+            for _ in range(100):
+                consumed.append(chunk_size)
+                yield b"x" * chunk_size
+        
+        response = Mock(status_code=503)
+        response.iter_content.side_effect = iter_content
+        session = Mock()
+        session.get.return_value = response
+        scraper = BaseScraper(session=session)
+        
+        assert scraper._make_request("https://www.bna.com.ar/", stream=True) is None
+        assert len(consumed) == 1
+        response.close.assert_called_once()
 
 
 class TestValorHoySource:
@@ -141,6 +160,41 @@ class TestValorHoySource:
         assert result is None
 
 
+    @patch('scraper.requests.Session')
+    def test_streaming_stops_after_dollar_row(self, mock_session):
+        """测试流式读取在找到美元行后提前关闭连接"""
+        page = (
+            "<html><body><div>Fecha: 15/12/2024</div><table>"
+            "<tr><td>Dolar U.S.A</td><td>1.290,0000</td><td>1.292,5000</td></tr>"
+            + "<tr><td>Otra</td><td>1,0</td><td>2,0</td></tr>" * 2000
+            + "</table></body></html>"
+        ).encode('utf-8')
+        chunk_size = 256
+        chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+        consumed = []
+        
+        def iter_content(chunk_size=None):
+            for chunk in chunks:
+                consumed.append(chunk)
+                yield chunk
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.iter_content.side_effect = iter_content
+        
+        mock_session_instance = Mock()
+        mock_session_instance.get.return_value = mock_response
+        mock_session.return_value = mock_session_instance
+        
+        scraper = ValorHoySource(streaming=True)
+        result = scraper.scrape()
+        
+        assert result == ("2024-12-15", 1292.5, "bna_divisas_valorhoy")
+        assert len(consumed) < len(chunks) // 10
+        mock_response.close.assert_called_once()
+        assert mock_session_instance.get.call_args.kwargs["stream"] is True
+
+
 class TestHistoricoSource:
     """测试 Historico 数据源"""
     
@@ -207,6 +261,40 @@ class TestHistoricoSource:
         
         assert result is None
     
+    @patch('scraper.requests.Session')
+    def test_scrape_rows_harvests_all_dates(self, mock_session):
+        """测试一次请求解析出页面中所有日期的数据"""
+        html = """
+        <html>
+        <body>
+            <table>
+                <tr><th>Moneda</th><th>Compra</th><th>Venta</th><th>Fecha</th></tr>
+                <tr><td>Dolar U.S.A</td><td>1.280,0000</td><td>1.300,0000</td><td>11/8/2025</td></tr>
+                <tr><td>Dolar U.S.A</td><td>1.290,0000</td><td>1.310,0000</td><td>12/08/2025</td></tr>
+                <tr><td>Euro</td><td>1.400,0000</td><td>1.450,0000</td><td>12/08/2025</td></tr>
+                <tr><td>Dolar U.S.A</td><td>1.295,0000</td><td>1.315,0000</td><td>2025-08-13</td></tr>
+            </table>
+        </body>
+        </html>
+        """
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.content = html.encode('utf-8')
+        
+        mock_session_instance = Mock()
+        mock_session_instance.get.return_value = mock_response
+        mock_session.return_value = mock_session_instance
+        
+        scraper = HistoricoSource()
+        rows = scraper.scrape_rows("2025-08-13")
+        
+        assert rows == {
+            "2025-08-11": 1300.0,
+            "2025-08-12": 1310.0,
+            "2025-08-13": 1315.0,
+        }
+        assert scraper.scrape("2025-08-12") == ("2025-08-12", 1310.0, "bna_divisas_historico")
+    
     def test_invalid_date_format(self):
         """测试无效日期格式"""
         scraper = HistoricoSource()
@@ -260,6 +348,187 @@ class TestScraperManager:
         mock_valorhoy_instance.scrape.assert_called_once()
         mock_historico_instance.scrape.assert_called_once()
 
+    
+    @patch('scraper.ValorHoySource')
+    @patch('scraper.HistoricoSource')
+    def test_scrape_date_range_concurrent_keeps_order(self, mock_historico, mock_valorhoy):
+        """测试并发回补结果保持日期顺序"""
+        import time as time_module
+        
+        def fake_scrape_rows(date_str):
+            # 越早的日期返回越慢，确保完成顺序与提交顺序不同
+            time_module.sleep(0.05 if date_str.endswith("01") else 0)
+            if date_str == "2024-12-03":
+                return None
+            return {date_str: 1000.0}
+        
+        mock_historico_instance = Mock()
+        mock_historico_instance.scrape_rows.side_effect = fake_scrape_rows
+        mock_historico.return_value = mock_historico_instance
+        
+        from scraper import ScraperManager
+        manager = ScraperManager()
+        
+        results = manager.scrape_date_range(
+            "2024-12-01", "2024-12-05", concurrency=4, rate=0, business_days_only=False
+        )
+        
+        assert [r[0] for r in results] == ["2024-12-01", "2024-12-02", "2024-12-04", "2024-12-05"]
+        assert mock_historico_instance.scrape_rows.call_count == 5
+    
+    @patch('scraper.ValorHoySource')
+    @patch('scraper.HistoricoSource')
+    def test_scrape_date_range_skips_non_business_days(self, mock_historico, mock_valorhoy):
+        """测试回补跳过周末和节假日"""
+        mock_historico_instance = Mock()
+        mock_historico_instance.scrape_rows.side_effect = lambda d: {d: 1000.0}
+        mock_historico.return_value = mock_historico_instance
+        
+        from scraper import ScraperManager
+        manager = ScraperManager()
+        
+        # 2024-12-21/22 为周末，2024-12-25 为圣诞节
+        results = manager.scrape_date_range("2024-12-20", "2024-12-26", rate=0)
+        
+        assert [r[0] for r in results] == ["2024-12-20", "2024-12-23", "2024-12-24", "2024-12-26"]
+        assert mock_historico_instance.scrape_rows.call_count == 4
+    
+    @patch('scraper.ValorHoySource')
+    @patch('scraper.HistoricoSource')
+    def test_scrape_date_range_reuses_harvested_rows(self, mock_historico, mock_valorhoy):
+        """测试页面中已包含的日期不再重复请求"""
+        # 每个页面包含查询日期及之前两个营业日
+        pages = {
+            "2025-08-14": {"2025-08-12": 1310.0, "2025-08-13": 1320.0, "2025-08-14": 1330.0},
+            "2025-08-11": {"2025-08-07": 1280.0, "2025-08-08": 1290.0, "2025-08-11": 1300.0},
+        }
+        mock_historico_instance = Mock()
+        mock_historico_instance.scrape_rows.side_effect = lambda d: pages.get(d, {})
+        mock_historico.return_value = mock_historico_instance
+        
+        from scraper import ScraperManager
+        manager = ScraperManager()
+        
+        results = manager.scrape_date_range("2025-08-08", "2025-08-14", rate=0)
+        
+        assert results == [
+            ("2025-08-08", 1290.0, "bna_divisas_historico"),
+            ("2025-08-11", 1300.0, "bna_divisas_historico"),
+            ("2025-08-12", 1310.0, "bna_divisas_historico"),
+            ("2025-08-13", 1320.0, "bna_divisas_historico"),
+            ("2025-08-14", 1330.0, "bna_divisas_historico"),
+        ]
+        requested = [c.args[0] for c in mock_historico_instance.scrape_rows.call_args_list]
+        assert requested == ["2025-08-14", "2025-08-11"]
+
+    @patch('scraper.ValorHoySource')
+    @patch('scraper.HistoricoSource')
+    def test_scrape_dates_reports_outcomes(self, mock_historico, mock_valorhoy):
+        """测试每个日期完成时回调 ok / missing / failed"""
+        pages = {
+            "2025-08-14": {"2025-08-13": 1320.0, "2025-08-14": 1330.0},
+            "2025-08-12": {"2025-08-08": 1290.0},
+        }
+        mock_historico_instance = Mock()
+        mock_historico_instance.scrape_rows.side_effect = lambda d: pages.get(d)
+        mock_historico.return_value = mock_historico_instance
+        
+        from scraper import ScraperManager
+        manager = ScraperManager()
+        
+        outcomes = {}
+        results = manager.scrape_dates(
+            ["2025-08-11", "2025-08-12", "2025-08-13", "2025-08-14"],
+            rate=0,
+            on_outcome=lambda date, status, result: outcomes.setdefault(date, (status, result))
+        )
+        
+        assert results == [
+            ("2025-08-13", 1320.0, "bna_divisas_historico"),
+            ("2025-08-14", 1330.0, "bna_divisas_historico"),
+        ]
+        assert outcomes == {
+            "2025-08-14": ("ok", ("2025-08-14", 1330.0, "bna_divisas_historico")),
+            "2025-08-13": ("ok", ("2025-08-13", 1320.0, "bna_divisas_historico")),
+            "2025-08-12": ("missing", None),
+            "2025-08-11": ("failed", None),
+        }
+
+    @patch('scraper.ValorHoySource')
+    @patch('scraper.HistoricoSource')
+    def test_iter_dates_yields_before_run_finishes(self, mock_historico, mock_valorhoy):
+        """测试生成器逐条产出结果，提前关闭时不再抓取剩余日期"""
+        mock_historico_instance = Mock()
+        mock_historico_instance.scrape_rows.side_effect = lambda d: {d: 1000.0}
+        mock_historico.return_value = mock_historico_instance
+        
+        from scraper import ScraperManager
+        manager = ScraperManager()
+        
+        dates = [f"2024-12-{day:02d}" for day in range(1, 21)]
+        results = manager.iter_dates(dates, rate=0)
+        
+        assert next(results) == ("2024-12-20", 1000.0, "bna_divisas_historico")
+        assert mock_historico_instance.scrape_rows.call_count < len(dates)
+        
+        results.close()
+        assert mock_historico_instance.scrape_rows.call_count <= 3
+
+    def test_iter_dates_concurrency_not_capped_by_manager(self):
+        """测试调用方的并发数和速率不受管理器构造参数限制"""
+        import threading
+        import time as time_module
+        from scraper import ScraperManager
+        
+        lock = threading.Lock()
+        active = [0, 0]  # 当前并发数, 峰值
+        
+        def slow_get(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                active[1] = max(active[1], active[0])
+            time_module.sleep(0.1)
+            with lock:
+                active[0] -= 1
+            return Mock(status_code=200, content=b"<html></html>")
+        
+        manager = ScraperManager()
+        manager.historico_source.session = Mock(get=Mock(side_effect=slow_get))
+        
+        dates = [f"2024-12-{day:02d}" for day in range(2, 10)]
+        start = time_module.monotonic()
+        manager.scrape_dates(dates, concurrency=8, rate=0)
+        
+        assert active[1] == 8
+        assert time_module.monotonic() - start < 1.0
+
+
+class TestRateLimiter:
+    """测试令牌桶限速器"""
+    
+    def test_acquire_respects_rate(self):
+        """测试令牌不足时会等待"""
+        import time as time_module
+        
+        limiter = RateLimiter(rate=20)
+        start = time_module.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        elapsed = time_module.monotonic() - start
+        
+        # 首个令牌立即可用，其余 4 个每个约 50ms
+        assert elapsed >= 0.18
+    
+    def test_unlimited_rate(self):
+        """测试 rate <= 0 时不限速"""
+        import time as time_module
+        
+        limiter = RateLimiter(rate=0)
+        start = time_module.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        assert time_module.monotonic() - start < 0.1
+
 
 if __name__ == "__main__":
     pytest.main([__file__])
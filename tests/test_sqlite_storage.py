@@ -0,0 +1,142 @@
+"""
+SQLite 存储模块单元测试
+使用临时目录中的数据库文件
+"""
+
+import csv
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from storage import RateStorage, create_storage
+from sqlite_storage import SqliteRateStorage
+
+
+class TestSqliteRateStorage:
+    """测试 SQLite 存储"""
+    
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return SqliteRateStorage(db_path=str(tmp_path / "rates.db"))
+    
+    def test_wal_mode(self, storage):
+        """测试数据库使用 WAL 日志模式"""
+        conn = sqlite3.connect(storage.db_path)
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        finally:
+            conn.close()
+    
+    def test_add_and_update(self, storage):
+        """测试新增和更新同一日期"""
+        assert storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        assert storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        assert storage.add_rate("2025-08-01", 1305.0, "bna_divisas_valorhoy")
+        
+        rows = storage.get_all_rates()
+        assert [(r['date'], r['rate_sell'], r['source']) for r in rows] == [
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+            ("2025-08-01", 1305.0, "bna_divisas_valorhoy"),
+        ]
+    
+    def test_add_rates_batch(self, storage):
+        """测试批量写入的逐条结果"""
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        outcomes = storage.add_rates([
+            ("2025-08-01", 1301.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+            ("2025-08-05", 0, "bna_divisas_historico"),
+            ("2025-08-04", 1311.0, "bna_divisas_historico"),
+        ])
+        
+        assert [o['status'] for o in outcomes] == ['updated', 'superseded', 'invalid', 'added']
+        assert [r['rate_sell'] for r in storage.get_date_range("2025-08-01", "2025-08-31")] == [1301.0, 1311.0]
+    
+    def test_stats(self, storage):
+        """测试统计信息"""
+        assert storage.get_stats() == {'total_records': 0, 'date_range': None, 'sources': {}}
+        
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+            ("2025-08-05", 1320.0, "bna_divisas_valorhoy"),
+        ])
+        
+        stats = storage.get_stats()
+        assert stats['total_records'] == 3
+        assert stats['date_range'] == {'start': "2025-08-01", 'end': "2025-08-05"}
+        assert stats['sources'] == {'bna_divisas_historico': 2, 'bna_divisas_valorhoy': 1}
+    
+    def test_import_csv(self, storage, tmp_path):
+        """测试从 CSV 导入并保留抓取时间"""
+        csv_path = str(tmp_path / "rates.csv")
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['date', 'rate_sell', 'source', 'fetched_at'])
+            writer.writerow(['2025-08-01', '1300.0', 'bna_divisas_historico', '2025-08-02T10:00:00'])
+            writer.writerow(['2025-08-04', 'abc', 'bna_divisas_historico', '2025-08-05T10:00:00'])
+            writer.writerow(['2025-08-05', '1320.0', 'bna_divisas_valorhoy', '2025-08-05T12:00:00'])
+        
+        assert storage.import_csv(csv_path) == 2
+        
+        rows = storage.get_recent_rates(5)
+        assert [(r['date'], r['fetched_at']) for r in rows] == [
+            ("2025-08-05", datetime(2025, 8, 5, 12, 0)),
+            ("2025-08-01", datetime(2025, 8, 2, 10, 0)),
+        ]
+    
+    def test_find_missing_dates(self, storage):
+        """测试缺失日期检测"""
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-05", 1320.0, "bna_divisas_historico"),
+        ])
+        assert storage.find_missing_dates("2025-08-01", "2025-08-06") == ["2025-08-04", "2025-08-06"]
+    
+    def test_version_changes_after_write(self, storage):
+        """测试写入后版本标记变化"""
+        before = storage.version()
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        assert storage.version() != before
+        assert storage.version() == storage.version()
+
+
+class TestBackendConsistency:
+    """测试 CSV 和 SQLite 后端返回相同的数据类型"""
+    
+    def test_same_types(self, tmp_path):
+        """测试各查询方法返回的字段类型一致"""
+        backends = [
+            RateStorage(csv_path=str(tmp_path / "rates.csv")),
+            SqliteRateStorage(db_path=str(tmp_path / "rates.db")),
+        ]
+        for storage in backends:
+            storage.add_rates([
+                ("2025-08-01", 1300.0, "bna_divisas_historico"),
+                ("2025-08-04", 1310.0, "bna_divisas_valorhoy"),
+            ])
+        
+        def types(records):
+            return [{key: type(value) for key, value in record.items()} for record in records]
+        
+        csv_storage, sqlite_storage = backends
+        assert types(sqlite_storage.get_recent_rates(5)) == types(csv_storage.get_recent_rates(5))
+        assert types(sqlite_storage.get_all_rates()) == types(csv_storage.get_all_rates())
+        assert types(sqlite_storage.get_date_range("2025-08-01", "2025-08-31")) == \
+            types(csv_storage.get_date_range("2025-08-01", "2025-08-31"))
+        assert types([sqlite_storage.get_latest_rate()]) == types([csv_storage.get_latest_rate()])
+        assert isinstance(sqlite_storage.get_recent_rates(1)[0]['fetched_at'], datetime)
+
+
+class TestCreateStorage:
+    """测试存储后端选择"""
+    
+    def test_backends(self, tmp_path):
+        assert isinstance(create_storage('csv', csv_path=str(tmp_path / "rates.csv")), RateStorage)
+        assert isinstance(create_storage('sqlite', db_path=str(tmp_path / "rates.db")), SqliteRateStorage)
+    
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_storage('mongodb')
@@ -0,0 +1,96 @@
+"""
+CLI 启动性能基准测试
+在子进程中冷启动 main.py，统计每个命令的总耗时和模块导入耗时，
+查询类命令不能导入较重的依赖，总耗时超过预算时测试失败。
+
+与解析器基准一样标记为 benchmark，默认的 pytest 运行会跳过，需要显式选择:
+
+运行并查看报告:   pytest -m benchmark tests/test_startup_benchmark.py -s
+调整预算 (毫秒):  STARTUP_BUDGET_MS=2000 pytest -m benchmark tests/test_startup_benchmark.py
+"""
+
+import os
+import re
+import sys
+import time
+import statistics
+import subprocess
+
+import pytest
+
+from storage import RateStorage
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1000"))
+ROUNDS = 3
+
+# 查询类命令不应导入的模块
+HEAVY_MODULES = {"pandas", "numpy", "requests", "bs4", "dateutil", "streamlit", "pyarrow"}
+
+COMMANDS = {
+    "help": ["--help"],
+    "status": ["status"],
+    "latest": ["latest"],
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope="module")
+def workdir(tmp_path_factory):
+    """准备带数据文件和摘要文件的工作目录"""
+    path = tmp_path_factory.mktemp("startup")
+    storage = RateStorage(csv_path=str(path / "data" / "rates.csv"))
+    storage.add_rates([(f"2025-07-{day:02d}", 1200.0 + day, "bna_divisas_historico") for day in range(1, 32)])
+    storage.get_stats()
+    return path
+
+
+def run_command(args, cwd) -> dict:
+    """冷启动一次命令，返回耗时和导入的顶层模块"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN_PY, *args],
+        cwd=cwd,
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - start
+    
+    modules = set()
+    import_us = 0
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        modules.add(name.split(".")[0])
+        if len(indent) <= 1:  # 顶层导入
+            import_us += cumulative
+    
+    return {
+        'returncode': result.returncode,
+        'wall': wall,
+        'import': import_us / 1e6,
+        'modules': modules,
+    }
+
+
+@pytest.mark.parametrize("name", list(COMMANDS))
+def test_startup_budget(name, workdir):
+    """测试命令冷启动耗时和导入的模块"""
+    runs = [run_command(COMMANDS[name], workdir) for _ in range(ROUNDS)]
+    
+    assert all(run['returncode'] == 0 for run in runs)
+    
+    heavy = HEAVY_MODULES & runs[0]['modules']
+    assert not heavy, f"{name} 导入了较重的依赖: {sorted(heavy)}"
+    
+    wall_ms = statistics.median(run['wall'] for run in runs) * 1000
+    import_ms = statistics.median(run['import'] for run in runs) * 1000
+    print(f"\n[startup] {name:<8} 总耗时 {wall_ms:8.1f} ms  导入 {import_ms:8.1f} ms  预算 {BUDGET_MS:.0f} ms")
+    
+    assert wall_ms <= BUDGET_MS, f"{name} 启动耗时 {wall_ms:.1f} ms 超过预算 {BUDGET_MS:.0f} ms"
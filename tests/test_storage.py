@@ -0,0 +1,595 @@
+"""
+存储模块单元测试
+使用临时目录中的 CSV 文件
+"""
+
+import os
+import io
+import csv
+import time
+import threading
+
+import pytest
+import pandas as pd
+from datetime import datetime
+from unittest.mock import patch
+
+from storage import BaseRateStorage, BatchWriter, RateStorage
+
+
+def read_rows(path):
+    """读取 CSV 数据行（不含表头）"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))[1:]
+
+
+class TestBaseRateStorage:
+    """测试存储后端接口"""
+    
+    def test_incomplete_backend_cannot_be_created(self):
+        """测试未实现全部接口的后端在创建时就报错"""
+        class WriteOnlyStorage(BaseRateStorage):
+            def add_rates(self, records):
+                return []
+        
+        with pytest.raises(TypeError):
+            WriteOnlyStorage()
+
+
+class TestRateStorage:
+    """测试 CSV 存储"""
+    
+    @pytest.fixture
+    def csv_path(self, tmp_path):
+        return str(tmp_path / "rates.csv")
+    
+    def test_add_and_update(self, csv_path):
+        """测试新增和更新同一日期"""
+        storage = RateStorage(csv_path=csv_path)
+        
+        assert storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        assert storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        assert storage.add_rate("2025-08-01", 1305.0, "bna_divisas_valorhoy")
+        
+        rows = read_rows(csv_path)
+        assert [(r[0], r[1], r[2]) for r in rows] == [
+            ("2025-08-04", "1310.0", "bna_divisas_historico"),
+            ("2025-08-01", "1305.0", "bna_divisas_valorhoy"),
+        ]
+    
+    def test_version_changes_after_write(self, csv_path):
+        """测试写入后版本标记变化"""
+        storage = RateStorage(csv_path=csv_path)
+        before = storage.version()
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        assert storage.version() != before
+        assert storage.version() == RateStorage(csv_path=csv_path).version()
+    
+    def test_update_last_row_in_place(self, csv_path):
+        """测试更新最后一行时不重写整个文件"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        
+        with patch.object(RateStorage, '_write_all') as mock_write_all:
+            assert storage.add_rate("2025-08-04", 1312.0, "bna_divisas_valorhoy")
+            mock_write_all.assert_not_called()
+        
+        rows = read_rows(csv_path)
+        assert [(r[0], r[1]) for r in rows] == [("2025-08-01", "1300.0"), ("2025-08-04", "1312.0")]
+    
+    def test_duplicate_check_does_not_read_file(self, csv_path):
+        """测试重复检查使用内存索引，不再读取文件"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        with patch('pandas.read_csv') as mock_read_csv:
+            storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+            storage.add_rate("2025-08-01", 1301.0, "bna_divisas_historico")
+            mock_read_csv.assert_not_called()
+    
+    def test_external_modification_reloads_index(self, csv_path):
+        """测试文件被外部修改后重新加载索引"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        # 另一个进程追加了一行
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["2025-08-04", "1310.0", "bna_divisas_historico", "2025-08-05T00:00:00"])
+        
+        storage.add_rate("2025-08-04", 1311.0, "bna_divisas_historico")
+        
+        rows = read_rows(csv_path)
+        assert [(r[0], r[1]) for r in rows] == [("2025-08-01", "1300.0"), ("2025-08-04", "1311.0")]
+    
+    def test_modification_during_load_is_detected(self, csv_path):
+        """测试读取CSV期间文件被修改时，旧索引不会被当作最新"""
+        RateStorage(csv_path=csv_path).add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        storage = RateStorage(csv_path=csv_path)
+        string_io = io.StringIO
+        
+        def append_during_read(text):
+            with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(["2025-08-04", "1310.0", "bna_divisas_historico", "2025-08-05T00:00:00"])
+            return string_io(text)
+        
+        with patch('storage.io.StringIO', side_effect=append_during_read):
+            storage._load_index()
+        
+        assert "2025-08-04" in storage._stored_dates("2025-08-01", "2025-08-31")
+    
+    def test_modification_before_append_reloads(self, csv_path):
+        """测试检查之后、追加之前文件被修改时重新加载索引和摘要"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["2025-08-04", "1310.0", "manual", "2025-08-05T00:00:00"])
+        with patch.object(storage, '_refresh_index'):
+            storage.add_rate("2025-08-05", 1320.0, "bna_divisas_historico")
+        
+        assert storage.get_stats()['total_records'] == 3
+        assert storage.get_rate("2025-08-04") == 1310.0
+        assert storage.verify_stats()
+    
+    def test_add_rates_batch(self, csv_path):
+        """测试批量写入的合并规则和逐条结果"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        outcomes = storage.add_rates([
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+            ("2025-08-01", 1301.0, "bna_divisas_historico"),
+            ("2025-08-05", 0, "bna_divisas_historico"),
+            ("2025-08-04", 1311.0, "bna_divisas_valorhoy"),
+        ])
+        
+        assert [o['status'] for o in outcomes] == ['superseded', 'updated', 'invalid', 'added']
+        rows = read_rows(csv_path)
+        assert [(r[0], r[1], r[2]) for r in rows] == [
+            ("2025-08-01", "1301.0", "bna_divisas_historico"),
+            ("2025-08-04", "1311.0", "bna_divisas_valorhoy"),
+        ]
+    
+    def test_add_rates_single_atomic_write(self, csv_path):
+        """测试批量写入只写一次，通过临时文件原子替换"""
+        storage = RateStorage(csv_path=csv_path)
+        records = [(f"2025-07-{day:02d}", 1200.0 + day, "bna_divisas_historico") for day in range(1, 29)]
+        
+        with patch('storage.os.replace', wraps=os.replace) as mock_replace:
+            storage.add_rates(records)
+            csv_replaces = [call.args for call in mock_replace.call_args_list if call.args[1] == csv_path]
+            assert len(csv_replaces) == 1
+            assert csv_replaces[0][0].endswith(".tmp")
+        
+        assert len(read_rows(csv_path)) == 28
+    
+    def test_add_rates_failed_write_keeps_file(self, csv_path):
+        """测试写入失败时原文件保持不变"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        with patch('storage.os.replace', side_effect=OSError("disk full")):
+            outcomes = storage.add_rates([("2025-08-04", 1310.0, "bna_divisas_historico")])
+        
+        assert outcomes[0]['status'] == 'failed'
+        assert [r[0] for r in read_rows(csv_path)] == ["2025-08-01"]
+        assert not storage._date_exists("2025-08-04")
+    
+    def test_invalid_values_rejected(self, csv_path):
+        """测试无效数据被拒绝"""
+        storage = RateStorage(csv_path=csv_path)
+        
+        assert not storage.add_rate("2025-08-01", 0, "bna_divisas_historico")
+        assert not storage.add_rate("01/08/2025", 1300.0, "bna_divisas_historico")
+        assert read_rows(csv_path) == []
+
+
+class TestAppendOnlyStorage:
+    """测试追加写入模式和压缩"""
+    
+    @pytest.fixture
+    def paths(self, tmp_path):
+        return str(tmp_path / "rates.csv"), str(tmp_path / "history.csv")
+    
+    def test_corrections_are_appended(self, paths):
+        """测试更正以新版本追加，读取时以最后一行为准"""
+        csv_path, archive_path = paths
+        storage = RateStorage(csv_path=csv_path, append_only=True, compact_threshold=0, archive_path=archive_path)
+        
+        with patch.object(RateStorage, '_write_all') as mock_write_all:
+            assert storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+            assert storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+            assert storage.add_rate("2025-08-01", 1305.0, "bna_divisas_valorhoy")
+            outcomes = storage.add_rates([("2025-08-04", 1311.0, "bna_divisas_historico")])
+            mock_write_all.assert_not_called()
+        
+        assert outcomes[0]['status'] == 'updated'
+        assert [r[1] for r in read_rows(csv_path)] == ["1300.0", "1310.0", "1305.0", "1311.0"]
+        
+        rates = {r['date']: r['rate_sell'] for r in storage.get_all_rates()}
+        assert rates == {"2025-08-01": 1305.0, "2025-08-04": 1311.0}
+        assert storage.get_stats()['total_records'] == 2
+        
+        # 重新打开时索引同样以最后一行为准
+        reopened = RateStorage(csv_path=csv_path, append_only=True, compact_threshold=0)
+        reopened._refresh_index()
+        assert reopened._stale_rows == 2
+        assert reopened._index["2025-08-01"][1] == "1305.0"
+    
+    def test_compact_archives_old_versions(self, paths):
+        """测试压缩写出去重快照并归档旧版本"""
+        csv_path, archive_path = paths
+        storage = RateStorage(csv_path=csv_path, append_only=True, compact_threshold=0, archive_path=archive_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        storage.add_rate("2025-08-01", 1305.0, "bna_divisas_valorhoy")
+        
+        assert storage.compact() == 1
+        assert [(r[0], r[1]) for r in read_rows(csv_path)] == [("2025-08-04", "1310.0"), ("2025-08-01", "1305.0")]
+        assert [(r[0], r[1]) for r in read_rows(archive_path)] == [("2025-08-01", "1300.0")]
+        
+        # 压缩后可以继续追加
+        assert storage.add_rate("2025-08-05", 1320.0, "bna_divisas_historico")
+        assert len(read_rows(csv_path)) == 3
+    
+    def test_threshold_triggers_compaction(self, paths):
+        """测试旧版本达到阈值时自动压缩"""
+        csv_path, archive_path = paths
+        storage = RateStorage(csv_path=csv_path, append_only=True, compact_threshold=2, archive_path=archive_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        storage.add_rate("2025-08-01", 1301.0, "bna_divisas_historico")
+        assert len(read_rows(csv_path)) == 2
+        
+        storage.add_rate("2025-08-01", 1302.0, "bna_divisas_historico")
+        assert [r[1] for r in read_rows(csv_path)] == ["1302.0"]
+        assert len(read_rows(archive_path)) == 2
+        assert storage._stale_rows == 0
+
+
+class TestRateLookup:
+    """测试通过汇率索引查询"""
+    
+    @pytest.fixture
+    def csv_path(self, tmp_path):
+        return str(tmp_path / "rates.csv")
+    
+    def test_lookup_does_not_parse_csv(self, csv_path):
+        """测试单日和范围查询不解析CSV"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+        ])
+        storage.add_rate("2025-08-05", 1320.0, "bna_divisas_valorhoy")
+        
+        with patch('pandas.read_csv') as mock_read_csv:
+            assert storage.get_rate("2025-08-04") == 1310.0
+            assert storage.get_rate("2025-08-02") is None
+            assert storage.get_rates("2025-08-02", "2025-08-05") == [("2025-08-04", 1310.0), ("2025-08-05", 1320.0)]
+            mock_read_csv.assert_not_called()
+    
+    def test_appends_update_index_incrementally(self, csv_path):
+        """测试追加写入时增量更新索引"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        assert storage.get_rate("2025-08-01") == 1300.0
+        
+        with patch('rate_index.RateIndex.build') as mock_build:
+            storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+            storage.add_rate("2025-08-04", 1311.0, "bna_divisas_historico")
+            assert storage.get_rate("2025-08-04") == 1311.0
+            mock_build.assert_not_called()
+    
+    def test_new_process_does_not_parse_csv(self, csv_path):
+        """测试新进程中索引与CSV一致时直接使用索引，不解析CSV"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+        ])
+        storage.get_rate("2025-08-01")
+        
+        reopened = RateStorage(csv_path=csv_path)
+        with patch.object(RateStorage, '_load_index') as mock_load_index:
+            assert reopened.get_rate("2025-08-04") == 1310.0
+            assert reopened.get_rates("2025-08-01", "2025-08-31") == [("2025-08-01", 1300.0), ("2025-08-04", 1310.0)]
+            mock_load_index.assert_not_called()
+    
+    def test_external_modification_rebuilds_index(self, csv_path):
+        """测试CSV被外部修改后重建索引"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        assert storage.get_rate("2025-08-01") == 1300.0
+        
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["2025-07-31", "1290.0", "manual", "2025-08-01T00:00:00"])
+        
+        assert storage.get_rate("2025-07-31") == 1290.0
+        assert RateStorage(csv_path=csv_path).get_rate("2025-08-01") == 1300.0
+
+
+class TestReadCache:
+    """测试查询缓存"""
+    
+    @pytest.fixture
+    def storage(self, tmp_path):
+        storage = RateStorage(csv_path=str(tmp_path / "rates.csv"))
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_valorhoy"),
+        ])
+        return storage
+    
+    def test_getters_share_one_read(self, storage):
+        """测试多个查询只解析一次CSV"""
+        with patch('pandas.read_csv', wraps=pd.read_csv) as mock_read_csv:
+            stats = storage.get_stats()
+            recent = storage.get_recent_rates(5)
+            storage.get_all_rates()
+            storage.get_date_range("2025-08-01", "2025-08-31")
+            assert mock_read_csv.call_count == 1
+        
+        assert stats['sources'] == {'bna_divisas_historico': 1, 'bna_divisas_valorhoy': 1}
+        assert sorted(r['date'] for r in recent) == ["2025-08-01", "2025-08-04"]
+        assert isinstance(recent[0]['fetched_at'], datetime)
+        assert isinstance(storage._read_frame()['fetched_at'].iloc[0], str)
+    
+    def test_own_write_invalidates(self, storage):
+        """测试本实例写入后缓存失效"""
+        assert storage.get_stats()['total_records'] == 2
+        storage.add_rate("2025-08-05", 1320.0, "bna_divisas_historico")
+        assert storage.get_stats()['total_records'] == 3
+        
+        storage.add_rate("2025-08-01", 1301.0, "bna_divisas_historico")
+        assert storage.get_stats()['sources'] == {'bna_divisas_historico': 2, 'bna_divisas_valorhoy': 1}
+    
+    def test_external_write_invalidates(self, storage):
+        """测试其他进程写入后缓存失效"""
+        assert storage.get_stats()['total_records'] == 2
+        RateStorage(csv_path=storage.csv_path).add_rate("2025-08-05", 1320.0, "bna_divisas_historico")
+        assert storage.get_stats()['total_records'] == 3
+    
+    def test_memory_bound(self, tmp_path):
+        """测试数据超出内存上限时不缓存"""
+        storage = RateStorage(csv_path=str(tmp_path / "rates.csv"), cache_max_bytes=1)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        with patch('pandas.read_csv', wraps=pd.read_csv) as mock_read_csv:
+            storage.get_all_rates()
+            storage.get_all_rates()
+            assert mock_read_csv.call_count == 2
+
+
+class TestStatsSummary:
+    """测试统计摘要"""
+    
+    @pytest.fixture
+    def csv_path(self, tmp_path):
+        return str(tmp_path / "rates.csv")
+    
+    def test_writes_maintain_summary(self, csv_path):
+        """测试各写入路径增量维护摘要"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-04", 1310.0, "bna_divisas_historico"),
+        ])
+        storage.add_rate("2025-08-05", 1320.0, "bna_divisas_valorhoy")
+        storage.add_rate("2025-08-01", 1301.0, "bna_divisas_valorhoy")
+        storage.add_rate("2025-08-05", 1321.0, "bna_divisas_valorhoy")
+        
+        reopened = RateStorage(csv_path=csv_path)
+        with patch.object(RateStorage, '_load_index') as mock_load_index, \
+                patch('pandas.read_csv') as mock_read_csv:
+            stats = reopened.get_stats()
+            mock_load_index.assert_not_called()
+            mock_read_csv.assert_not_called()
+        
+        assert stats['total_records'] == 3
+        assert stats['date_range'] == {'start': "2025-08-01", 'end': "2025-08-05"}
+        assert stats['sources'] == {'bna_divisas_valorhoy': 2, 'bna_divisas_historico': 1}
+        assert stats['latest'] == {'date': "2025-08-05", 'rate_sell': 1321.0, 'source': "bna_divisas_valorhoy"}
+        assert stats['last_fetched_at'] == max(row[3] for row in read_rows(csv_path))
+        assert reopened.verify_stats()
+    
+    def test_update_last_row_keeps_summary(self, csv_path):
+        """测试更新最后一行（截断后重新追加）时摘要不重复计数"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2024-01-02", 1300.0, "a")
+        storage.add_rate("2024-01-03", 1310.0, "a")
+        storage.add_rate("2024-01-03", 1311.0, "b")
+        
+        stats = storage.get_stats()
+        assert stats['total_records'] == 2
+        assert stats['sources'] == {'a': 1, 'b': 1}
+        assert storage.verify_stats()
+    
+    def test_external_modification_recomputes(self, csv_path):
+        """测试CSV被外部修改后重新计算摘要"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["2025-08-04", "1310.0", "manual", "2025-08-04T00:00:00"])
+        
+        stats = RateStorage(csv_path=csv_path).get_stats()
+        assert stats['total_records'] == 2
+        assert stats['sources'] == {'bna_divisas_historico': 1, 'manual': 1}
+    
+    def test_verify_and_rebuild(self, csv_path):
+        """测试检测并修复与数据不一致的摘要"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        
+        storage._stats.total_records = 5
+        storage._stats.save(storage._signature)
+        assert not storage.verify_stats()
+        
+        storage.rebuild_stats()
+        assert storage.verify_stats()
+        assert storage.get_stats()['total_records'] == 1
+
+
+class TestConcurrentInstances:
+    """测试页面和后台任务各自的实例同时读写同一个CSV"""
+    
+    def test_reads_while_job_writes(self, tmp_path, caplog):
+        """测试页面反复查询时后台实例写入，查询结果一致且不产生错误"""
+        csv_path = str(tmp_path / "rates.csv")
+        page = RateStorage(csv_path=csv_path)
+        job = RateStorage(csv_path=csv_path)
+        days = [f"2024-{month:02d}-{day:02d}" for month in range(1, 13) for day in range(1, 29)]
+        done = threading.Event()
+        
+        def write():
+            try:
+                # 按日期倒序分批写入：每批都插到已有日期之前，索引需要重建
+                for start in range(len(days), 0, -12):
+                    job.add_rates([(day, 1000.0 + index, "job") for index, day in enumerate(days) if start - 12 <= index < start])
+                    job.add_rate(days[-1], 2000.0 + start, "job")
+            finally:
+                done.set()
+        
+        replace = os.replace
+        
+        def slow_replace(src, dst):
+            # 模拟慢速磁盘，放大写临时文件和重命名之间的时间窗口
+            time.sleep(0.002)
+            replace(src, dst)
+        
+        counts = []
+        with patch('os.replace', slow_replace):
+            writer = threading.Thread(target=write)
+            writer.start()
+            while not done.is_set():
+                rates = page.get_rates(days[0], days[-1])
+                stats = page.get_stats()
+                assert [day for day, _ in rates] == sorted(day for day, _ in rates)
+                assert all(rate == 1000.0 + days.index(day) for day, rate in rates if day != days[-1])
+                counts.append((len(rates), stats['total_records']))
+            writer.join()
+        
+        assert [count for count, _ in counts] == sorted(count for count, _ in counts)
+        assert [total for _, total in counts] == sorted(total for _, total in counts)
+        assert not [record for record in caplog.records if record.levelname == "ERROR"]
+        assert len(page.get_rates(days[0], days[-1])) == len(days)
+        assert page.get_stats()['total_records'] == len(days)
+        assert page.verify_stats()
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+class TestRecentRates:
+    """测试从文件末尾读取最近数据"""
+    
+    @pytest.fixture
+    def csv_path(self, tmp_path):
+        return str(tmp_path / "rates.csv")
+    
+    def test_tail_read_across_blocks(self, csv_path):
+        """测试跨块读取并跳过旧版本"""
+        storage = RateStorage(csv_path=csv_path, append_only=True, compact_threshold=0)
+        for day in range(1, 21):
+            storage.add_rate(f"2025-07-{day:02d}", 1200.0 + day, "bna_divisas_historico")
+        storage.add_rate("2025-07-20", 1250.0, "bna_divisas_valorhoy")
+        storage.add_rate("2025-07-05", 1255.0, "bna_divisas_valorhoy")
+        
+        with patch.object(RateStorage, 'TAIL_BLOCK_SIZE', 16), \
+                patch('pandas.read_csv') as mock_read_csv:
+            recent = storage.get_recent_rates(3)
+            mock_read_csv.assert_not_called()
+        
+        assert [(r['date'], r['rate_sell']) for r in recent] == [
+            ("2025-07-05", 1255.0), ("2025-07-20", 1250.0), ("2025-07-19", 1219.0),
+        ]
+        assert isinstance(recent[0]['fetched_at'], datetime)
+        assert len(storage.get_recent_rates(100)) == 20
+    
+    def test_out_of_order_file_uses_full_read(self, csv_path):
+        """测试文件不是按写入顺序排列时读取整个文件"""
+        storage = RateStorage(csv_path=csv_path)
+        storage.add_rate("2025-08-01", 1300.0, "bna_divisas_historico")
+        storage.add_rate("2025-08-04", 1310.0, "bna_divisas_historico")
+        
+        with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(["2025-07-31", "1290.0", "manual", "2020-01-01T00:00:00"])
+        
+        with patch.object(RateStorage, '_tail_records') as mock_tail:
+            recent = storage.get_recent_rates(2)
+            mock_tail.assert_not_called()
+        
+        assert [r['date'] for r in recent] == ["2025-08-04", "2025-08-01"]
+
+
+class TestMissingDates:
+    """测试缺失日期检测"""
+    
+    def test_find_missing_business_days(self, tmp_path):
+        """测试只返回缺失的营业日，不读取CSV"""
+        storage = RateStorage(csv_path=str(tmp_path / "rates.csv"))
+        storage.add_rates([
+            ("2025-08-01", 1300.0, "bna_divisas_historico"),
+            ("2025-08-05", 1320.0, "bna_divisas_historico"),
+            ("2025-08-07", 1330.0, "bna_divisas_historico"),
+        ])
+        
+        with patch('pandas.read_csv') as mock_read_csv:
+            missing = storage.find_missing_dates("2025-07-31", "2025-08-10")
+            mock_read_csv.assert_not_called()
+        
+        # 08-02/03、08-09/10 为周末
+        assert missing == ["2025-07-31", "2025-08-04", "2025-08-06", "2025-08-08"]
+        assert "2025-08-02" in storage.find_missing_dates("2025-08-01", "2025-08-03", business_days_only=False)
+
+
+class TestBatchWriter:
+    """测试微批写入"""
+    
+    @pytest.fixture
+    def storage(self, tmp_path):
+        return RateStorage(csv_path=str(tmp_path / "rates.csv"))
+    
+    def test_flushes_in_batches(self, storage):
+        """测试达到批次大小时写入，剩余数据在结束时写入"""
+        records = [(f"2025-08-{day:02d}", 1300.0 + day, "bna_divisas_historico") for day in range(1, 6)]
+        
+        with patch.object(storage, 'add_rates', wraps=storage.add_rates) as mock_add:
+            with BatchWriter(storage, batch_size=2, flush_interval=0) as writer:
+                for record in records[:4]:
+                    writer.add(record)
+                # 写入已在进行中，数据已在存储中
+                assert mock_add.call_count == 2
+                assert storage.get_rate("2025-08-04") == 1304.0
+                writer.add(records[4])
+            
+            assert [len(c.args[0]) for c in mock_add.call_args_list] == [2, 2, 1]
+        
+        assert writer.written == 5
+        assert storage.get_stats()['total_records'] == 5
+    
+    def test_write_all_consumes_generator(self, storage):
+        """测试逐条消费生成器并统计结果"""
+        def generate():
+            yield ("2025-08-01", 1300.0, "bna_divisas_historico")
+            yield ("2025-08-02", -1.0, "bna_divisas_historico")
+            yield ("2025-08-01", 1301.0, "bna_divisas_historico")
+        
+        counts = BatchWriter(storage, batch_size=1, flush_interval=0).write_all(generate())
+        
+        assert counts['added'] == 1
+        assert counts['updated'] == 1
+        assert counts['invalid'] == 1
+        assert storage.get_rate("2025-08-01") == 1301.0
+    
+    def test_flush_interval(self, storage):
+        """测试距上次写入超过时间间隔时提前写入"""
+        writer = BatchWriter(storage, batch_size=100, flush_interval=30)
+        writer.add(("2025-08-01", 1300.0, "bna_divisas_historico"))
+        assert storage.get_rate("2025-08-01") is None
+        
+        with patch('storage.time.monotonic', return_value=writer._flushed_at + 31):
+            writer.add(("2025-08-04", 1310.0, "bna_divisas_historico"))
+        
+        assert storage.get_rate("2025-08-01") == 1300.0
+        assert writer.written == 2
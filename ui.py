@@ -4,12 +4,19 @@ Streamlit Web 界面
 """
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+import time
 import logging
+import threading
 
 from scraper import ScraperManager
-from storage import RateStorage
+from storage import create_storage
+from http_cache import HttpCache
+from downsample import downsample, METHOD_LTTB, METHOD_MINMAX
+from flow_control import CIRCUIT_CLOSED
+from backfill_job import BackfillJob, JOB_PENDING, JOB_RUNNING, JOB_COMPLETED, JOB_CANCELLED, JOB_FAILED
 
 # 配置页面
 st.set_page_config(
@@ -22,15 +29,25 @@ st.set_page_config(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+JOB_POLL_INTERVAL = 1.0  # 有任务运行时页面刷新间隔（秒）
+
+JOB_LABELS = {
+    JOB_PENDING: "等待中",
+    JOB_RUNNING: "运行中",
+    JOB_COMPLETED: "已完成",
+    JOB_CANCELLED: "已取消",
+    JOB_FAILED: "失败",
+}
+
 def main():
     st.title("💱 BNA 阿根廷兑美元汇率抓取器")
     st.markdown("---")
     
     # 初始化组件
     if 'scraper' not in st.session_state:
-        st.session_state.scraper = ScraperManager()
+        st.session_state.scraper = ScraperManager(cache=HttpCache())
     if 'storage' not in st.session_state:
-        st.session_state.storage = RateStorage()
+        st.session_state.storage = create_storage()
     
     # 侧边栏
     with st.sidebar:
@@ -52,12 +69,23 @@ def main():
             max_value=end_date
         )
         
+        business_days_only = st.checkbox(
+            "跳过周末和银行节假日",
+            value=True
+        )
+        
+        missing_only = st.checkbox(
+            "只抓取缺失的日期",
+            value=True,
+            help="取消勾选时重新抓取范围内的所有日期"
+        )
+        
         # 回补按钮
         if st.button("🚀 开始回补", type="primary"):
             if start_date_input > end_date_input:
                 st.error("开始日期不能晚于结束日期")
             else:
-                run_backfill(start_date_input, end_date_input)
+                run_backfill(start_date_input, end_date_input, business_days_only, missing_only)
     
     # 主界面
     col1, col2 = st.columns([2, 1])
@@ -75,54 +103,106 @@ def main():
         if st.button("🔄 刷新状态"):
             st.rerun()
     
+    # 汇率走势
+    display_rate_chart()
+    
+    # 回补任务进度
+    display_jobs()
+    
     # 数据表格
     display_recent_data()
 
-def run_backfill(start_date, end_date):
-    """执行数据回补"""
+    # 有任务在运行时定时刷新页面，读取最新进度和已写入的数据
+    if any(job.running for job in backfill_jobs()):
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
+@st.cache_resource
+def backfill_jobs():
+    """进程内所有会话共享的回补任务列表，刷新页面后仍能看到运行中的任务"""
+    return []
+
+@st.cache_resource
+def storage_write_lock():
+    """页面和后台任务写入存储时共用的锁"""
+    return threading.Lock()
+
+def run_backfill(start_date, end_date, business_days_only=True, missing_only=True):
+    """在后台启动回补任务，页面不等待任务完成"""
     start_str = start_date.strftime("%Y-%m-%d")
     end_str = end_date.strftime("%Y-%m-%d")
     
-    st.info(f"开始回补数据: {start_str} 到 {end_str}")
+    # 任务使用独立的存储实例：页面每次刷新都会读取 session_state 中的实例，
+    # 读取时可能重新加载内存索引，不能与后台线程的写入共用同一个对象
+    job = BackfillJob(
+        st.session_state.scraper,
+        create_storage(),
+        start_str, end_str,
+        business_days_only=business_days_only,
+        missing_only=missing_only,
+        write_lock=storage_write_lock()
+    ).start()
+    backfill_jobs().append(job)
     
-    # 创建进度条
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    st.success(f"已在后台开始回补: {start_str} 到 {end_str}")
     
-    try:
-        # 计算总天数
-        total_days = (end_date - start_date).days + 1
-        current_day = 0
-        
-        # 执行抓取
-        results = st.session_state.scraper.scrape_date_range(start_str, end_str)
-        
-        if not results:
-            st.warning("没有抓取到任何数据")
-            return
+def format_seconds(seconds):
+    """秒数格式化为 H:MM:SS"""
+    return str(timedelta(seconds=int(seconds)))
+
+def display_jobs():
+    """显示回补任务的进度，可取消运行中的任务"""
+    jobs = backfill_jobs()
+    if not jobs:
+        return
+    
+    st.header("⏳ 回补任务")
+    
+    for job in reversed(jobs):
+        progress = job.snapshot()
+        label = JOB_LABELS.get(progress['state'], progress['state'])
+        done, total = progress['done'], progress['total']
         
-        # 保存数据
-        success_count = 0
-        for date, rate_sell, source in results:
-            if st.session_state.storage.add_rate(date, rate_sell, source):
-                success_count += 1
-            
-            current_day += 1
-            progress = current_day / total_days
-            progress_bar.progress(progress)
-            status_text.text(f"处理中... {current_day}/{total_days}")
+        col_progress, col_action = st.columns([4, 1])
+        with col_progress:
+            st.progress(
+                done / total if total else 0.0,
+                text=f"{progress['start_date']} 到 {progress['end_date']} · {label} · {done}/{total} 天"
+            )
+            details = [
+                f"成功 {progress['ok']}",
+                f"无报价 {progress['missing']}",
+                f"失败 {progress['failed']}",
+                f"已保存 {progress['written']} 条",
+                f"用时 {format_seconds(progress['elapsed'])}",
+            ]
+            if progress['current_date']:
+                details.append(f"当前 {progress['current_date']}")
+            if progress['eta'] is not None:
+                details.append(f"预计剩余 {format_seconds(progress['eta'])}")
+            flow = progress['flow']
+            if job.running and flow:
+                if flow['state'] == CIRCUIT_CLOSED:
+                    details.append(f"并发 {flow['concurrency']}")
+                    if flow['rate'] > 0:
+                        details.append(f"限速 {flow['rate']:.1f} 次/秒")
+                else:
+                    details.append("数据源熔断中")
+            if progress['error']:
+                details.append(f"错误: {progress['error']}")
+            st.caption(" · ".join(details))
         
-        progress_bar.progress(1.0)
-        status_text.text("完成!")
+        with col_action:
+            if job.running:
+                st.button("取消", key=f"cancel_{job.id}", on_click=job.cancel)
         
-        st.success(f"数据回补完成！成功 {success_count}/{len(results)} 条")
+    if any(not job.running for job in jobs):
+        st.button("🧹 清除已结束的任务", on_click=clear_finished_jobs)
         
-        # 自动刷新
-        st.rerun()
-        
-    except Exception as e:
-        st.error(f"回补过程中发生错误: {str(e)}")
-        logger.error(f"回补错误: {e}")
+def clear_finished_jobs():
+    """从任务列表中移除已结束的任务"""
+    jobs = backfill_jobs()
+    jobs[:] = [job for job in jobs if job.running]
 
 def run_yesterday_scrape():
     """抓取昨天数据"""
@@ -134,7 +214,9 @@ def run_yesterday_scrape():
         if result:
             date, rate_sell, source = result
             
-            if st.session_state.storage.add_rate(date, rate_sell, source):
+            with storage_write_lock():
+                saved = st.session_state.storage.add_rate(date, rate_sell, source)
+            if saved:
                 st.success(f"成功抓取并保存: {date} = {rate_sell} ({source})")
                 st.rerun()
             else:
@@ -146,10 +228,128 @@ def run_yesterday_scrape():
         st.error(f"抓取过程中发生错误: {str(e)}")
         logger.error(f"抓取错误: {e}")
 
+def storage_token(storage):
+    """
+    存储版本标记，作为缓存键的一部分
+    
+    数据写入后版本变化，缓存自动失效；后端无法提供版本时每次重新读取。
+    """
+    version = storage.version()
+    if version is None:
+        version = datetime.now().timestamp()
+    return type(storage).__name__, version
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def load_rates_frame(_storage, token):
+    """
+    读取全部数据，最新日期在前
+    
+    使用 cache_resource 在所有会话间共享同一个 DataFrame，避免 cache_data
+    每次命中时复制整份数据；调用方不能修改返回的对象。
+    """
+    rows = _storage.get_all_rates()
+    return pd.DataFrame(rows, columns=['date', 'rate_sell', 'source', 'fetched_at'])
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_stats(_storage, token):
+    """统计信息"""
+    return _storage.get_stats()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_page(_storage, token, page, page_size):
+    """一页数据，只格式化这一页的 fetched_at"""
+    frame = load_rates_frame(_storage, token)
+    page_df = frame.iloc[page * page_size:(page + 1) * page_size].copy()
+    page_df['fetched_at'] = pd.to_datetime(page_df['fetched_at'], format='ISO8601').dt.strftime('%Y-%m-%d %H:%M:%S')
+    return page_df
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_export(_storage, token, file_format):
+    """生成下载文件内容，只在用户请求下载时调用"""
+    frame = load_rates_frame(_storage, token)
+    if file_format == "JSON":
+        return frame.to_json(orient='records', force_ascii=False, indent=2).encode('utf-8')
+    return frame.to_csv(index=False).encode('utf-8-sig')
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "JSON": ("json", "application/json"),
+}
+
+PAGE_SIZES = [50, 100, 500]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_chart(_storage, token, start_date, end_date, method, points):
+    """
+    查询窗口内的 (日期, 卖出价) 并降采样，每个窗口单独缓存
+    
+    Returns:
+        tuple: (降采样后的 DataFrame, 窗口内的总点数)
+    """
+    rates = _storage.get_rates(start_date, end_date)
+    if not rates:
+        return pd.DataFrame(columns=['date', 'rate_sell']), 0
+    
+    dates = np.array([day for day, _ in rates], dtype='datetime64[D]')
+    values = np.array([value for _, value in rates], dtype=np.float64)
+    indices = downsample(dates.astype(np.int64), values, points, method)
+    return pd.DataFrame({'date': dates[indices], 'rate_sell': values[indices]}), len(rates)
+
+CHART_WINDOWS = {
+    "近 1 个月": 30,
+    "近 3 个月": 91,
+    "近 1 年": 365,
+    "近 5 年": 1826,
+    "全部": None,
+}
+
+CHART_METHODS = {
+    "LTTB（保留形状）": METHOD_LTTB,
+    "最小/最大值（保留极值）": METHOD_MINMAX,
+}
+
+CHART_POINTS = 800  # 图表最多绘制的点数
+
+def display_rate_chart():
+    """显示卖出价走势图，只查询所选窗口并在服务端降采样"""
+    try:
+        storage = st.session_state.storage
+        token = storage_token(storage)
+        stats = load_stats(storage, token)
+        if not stats or not stats.get('date_range'):
+            return
+        
+        st.subheader("📉 卖出价走势")
+        col_window, col_method = st.columns(2)
+        with col_window:
+            window = st.selectbox("时间窗口", list(CHART_WINDOWS), index=2)
+        with col_method:
+            method = st.radio("降采样方法", list(CHART_METHODS), horizontal=True)
+        
+        end_date = stats['date_range']['end']
+        start_date = stats['date_range']['start']
+        days = CHART_WINDOWS[window]
+        if days is not None:
+            window_start = (datetime.strptime(end_date, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+            start_date = max(start_date, window_start)
+        
+        chart_df, total = load_chart(storage, token, start_date, end_date, CHART_METHODS[method], CHART_POINTS)
+        if not total:
+            st.info("所选窗口内暂无数据")
+            return
+        
+        st.line_chart(chart_df, x='date', y='rate_sell')
+        st.caption(f"{start_date} 到 {end_date}，共 {total} 个数据点，绘制 {len(chart_df)} 个")
+    
+    except Exception as e:
+        st.error(f"绘制走势图失败: {str(e)}")
+        logger.error(f"走势图错误: {e}")
+
 def display_stats():
     """显示数据统计信息"""
     try:
-        stats = st.session_state.storage.get_stats()
+        storage = st.session_state.storage
+        stats = load_stats(storage, storage_token(storage))
         
         if not stats or stats['total_records'] == 0:
             st.info("暂无数据")
@@ -185,49 +385,51 @@ def display_stats():
         logger.error(f"统计信息错误: {e}")
 
 def display_recent_data():
-    """显示所有数据表格"""
+    """分页显示数据表格，按需生成下载文件"""
     try:
-        # 获取所有数据用于下载
-        all_data = st.session_state.storage.get_all_rates()
+        storage = st.session_state.storage
+        token = storage_token(storage)
+        total = len(load_rates_frame(storage, token))
         
-        if not all_data:
+        if not total:
             st.info("暂无数据")
             return
         
-        # 转换为DataFrame
-        df_all = pd.DataFrame(all_data)
-        
-        # 格式化fetched_at列
-        if 'fetched_at' in df_all.columns:
-            df_all['fetched_at'] = pd.to_datetime(df_all['fetched_at']).dt.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 按日期排序（最新的在前）
-        if 'date' in df_all.columns:
-            df_all = df_all.sort_values('date', ascending=False)
+        # 分页：只把当前页发送到浏览器
+        col_size, col_page = st.columns(2)
+        with col_size:
+            page_size = st.selectbox("每页条数", PAGE_SIZES, index=0)
+        page_count = (total + page_size - 1) // page_size
+        with col_page:
+            page = st.number_input("页码", min_value=1, max_value=page_count, value=1, step=1)
         
-        # 显示数据表格（限制显示前50条以避免界面过于拥挤）
-        display_limit = min(50, len(df_all))
-        df_display = df_all.head(display_limit)
-        
-        st.subheader(f"📋 数据表格 (显示最近{display_limit}条，共{len(df_all)}条)")
+        st.subheader(f"📋 数据表格 (第 {page}/{page_count} 页，共{total}条)")
         
         st.dataframe(
-            df_display,
+            load_page(storage, token, page - 1, page_size),
             use_container_width=True,
             hide_index=True
         )
         
-        if len(df_all) > display_limit:
-            st.info(f"表格仅显示最近{display_limit}条记录，下载CSV可获取全部{len(df_all)}条数据")
+        # 下载：选择格式后才生成文件内容
+        col_format, col_download = st.columns(2)
+        with col_format:
+            file_format = st.radio("下载格式", list(EXPORT_FORMATS), horizontal=True)
+        extension, mime = EXPORT_FORMATS[file_format]
         
-        # 下载按钮 - 包含所有数据
-        csv = df_all.to_csv(index=False, encoding='utf-8-sig')
-        st.download_button(
-            label=f"📥 下载完整CSV (共{len(df_all)}条记录)",
-            data=csv,
-            file_name=f"exchange_rates_full_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            mime="text/csv"
-        )
+        with col_download:
+            if st.session_state.get('export_request') == (token, file_format):
+                st.download_button(
+                    label=f"📥 下载完整{file_format} (共{total}条记录)",
+                    data=build_export(storage, token, file_format),
+                    file_name=f"exchange_rates_full_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                    mime=mime
+                )
+            else:
+                st.button(
+                    f"📦 生成{file_format}文件 (共{total}条记录)",
+                    on_click=lambda: st.session_state.update(export_request=(token, file_format))
+                )
         
     except Exception as e:
         st.error(f"获取最近数据失败: {str(e)}")